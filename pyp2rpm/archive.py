@@ -1,3 +1,4 @@
+import csv
 import json
 import locale
 import logging
@@ -6,10 +7,12 @@ import re
 import sre_constants
 import sys
 
+from collections import namedtuple, OrderedDict
 from zipfile import ZipFile, ZipInfo
 from tarfile import TarFile, TarInfo
 
-from pyp2rpm import utils
+from pyp2rpm import settings
+from pyp2rpm.core_metadata import CoreMetadata, parse_entry_points
 
 logger = logging.getLogger(__name__)
 
@@ -66,6 +69,133 @@ class ZipWrapper(object):
         return self._wrapped_obj(*args, **kwargs)
 
 
+ArchiveMember = namedtuple('ArchiveMember', [
+    'info', 'name', 'basename', 'suffix', 'dirname', 'is_dir'])
+
+
+class MemberIndex(object):
+    """Index of archive members, built in a single pass over getmembers().
+
+    Keeps member names together with their basenames, suffixes, parent
+    directories and types, so that queries don't have to walk the member
+    list of the archive again. Contents of files captured while the index
+    was built are kept in captured, as long as the index.
+    """
+
+    def __init__(self, members=()):
+        self.members = []
+        self.files = []
+        self.by_name = {}
+        self.by_basename = {}
+        self.by_dirname = {}
+        self.suffixes = set()
+        self.dir_components = set()
+        self.directories = set()
+        self.captured = {}
+        self.captured_size = 0
+        for info in members:
+            self.add(info)
+
+    def add(self, info):
+        """Adds TarInfo or ZipInfo object to the index."""
+        is_tar_dir = isinstance(info, TarInfo) and info.isdir()
+        member = ArchiveMember(info=info,
+                               name=info.name,
+                               basename=os.path.basename(info.name),
+                               suffix=os.path.splitext(info.name)[1],
+                               dirname=os.path.dirname(info.name),
+                               is_dir=is_tar_dir)
+        self.members.append(member)
+        if not is_tar_dir:
+            self.files.append(member)
+        self.by_name.setdefault(member.name, []).append(member)
+        self.by_basename.setdefault(member.basename, []).append(member)
+        self.by_dirname.setdefault(member.dirname, []).append(member)
+        self.suffixes.add(member.suffix)
+        # zipfiles don't list directories themselves, keep all the parent
+        # directory names to be able to find e.g. .egg-info directories
+        self.dir_components.update(member.name.split('/')[:-1])
+        # zipfiles only list directories => have to work around that
+        if isinstance(info, ZipInfo):
+            if member.dirname:
+                self.directories.add(member.dirname)
+        # tarfiles => only match directories
+        elif is_tar_dir:
+            self.directories.add(member.name)
+
+    def capture(self, name, content):
+        """Keeps content of the file unless captured files would take more
+        than settings.ARCHIVE_SCAN_CAPTURE_SIZE bytes.
+        """
+        if (self.captured_size + len(content) <=
+                settings.ARCHIVE_SCAN_CAPTURE_SIZE):
+            self.captured[name] = content
+            self.captured_size += len(content)
+
+    def find(self, name, full_path=False):
+        """Returns list of members with the given name or basename."""
+        if full_path:
+            return self.by_name.get(name, [])
+        return self.by_basename.get(name, [])
+
+    @property
+    def names(self):
+        return [member.name for member in self.members]
+
+    @property
+    def top_directory(self):
+        return os.path.commonprefix(self.names).rstrip('/')
+
+
+class ContentCache(object):
+    """Bounded LRU cache of raw contents of archive members.
+
+    Holds at most max_size bytes, least recently used contents are evicted
+    first. Contents larger than max_size are not cached at all.
+    """
+
+    def __init__(self, max_size=settings.ARCHIVE_CONTENT_CACHE_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._contents = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._contents
+
+    def __len__(self):
+        return len(self._contents)
+
+    def get(self, key):
+        """Returns cached content and marks it as most recently used.
+        Returns:
+            Cached content or None, if there is no such.
+        """
+        try:
+            content = self._contents.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        self._contents[key] = content
+        self.hits += 1
+        return content
+
+    def put(self, key, content):
+        if key in self._contents:
+            self.size -= len(self._contents.pop(key))
+        if len(content) > self.max_size:
+            return
+        while self.size + len(content) > self.max_size:
+            self.size -= len(self._contents.popitem(last=False)[1])
+        self._contents[key] = content
+        self.size += len(content)
+
+    def clear(self):
+        self._contents.clear()
+        self.size = 0
+
+
 class Archive(object):
 
     """Class representing package archive. All the operations must be run using
@@ -75,6 +205,9 @@ class Archive(object):
     archive = Archive('/spam/beans.egg')
     with archive as a:
         a.get_contents_of_file('spam.py')
+
+    The with statements can be nested, the archive is opened by the
+    outermost one only and stays open until it ends.
     """
 
     def __init__(self, local_file):
@@ -82,8 +215,21 @@ class Archive(object):
         self.name = os.path.basename(local_file)
         self.suffix = os.path.splitext(local_file)[1]
         self.handle = None
+        self.index = None
+        # depth of nested with statements
+        self.depth = 0
+        self.content_cache = ContentCache()
+        # parsed wheel metadata files, they don't change between openings
+        self._wheel_metadata = None
+        self._wheel_entry_points = None
+        self._record_paths = None
+        self._record = None
         ZipInfo.name = ZipInfo.filename
 
+    @property
+    def is_compressed_tar(self):
+        return self.suffix in ['.gz', '.bz2', '.tgz', '.xz']
+
     @property
     def is_zip(self):
         return self.suffix in ['.egg', '.zip', '.whl']
@@ -106,6 +252,12 @@ class Archive(object):
                 self.handle = ZipWrapper(self.extractor_cls(self.file))
             else:
                 self.handle = self.extractor_cls.open(self.file)
+            # member table doesn't change, build it only once per instance
+            if self.index is None:
+                if self.is_compressed_tar:
+                    self.index = self.scan()
+                else:
+                    self.index = MemberIndex(self.handle.getmembers())
         except BaseException:
             self.handle = None
             logger.error('Failed to open archive: {0}.'.format(
@@ -113,15 +265,47 @@ class Archive(object):
 
         return self
 
+    def scan(self):
+        """Reads compressed tarball in a single forward pass, builds
+        MemberIndex and captures content of files listed in
+        settings.ARCHIVE_SCAN_FILES on the way, so that the compressed
+        stream doesn't have to be decompressed again to get them. The
+        contents are kept by the index, so they survive closing and
+        reopening of the archive, files bigger than
+        settings.ARCHIVE_SCAN_FILE_SIZE are not captured.
+        Returns:
+            MemberIndex of the archive
+        """
+        index = MemberIndex()
+        # iterating the handle reads the members sequentially, data of the
+        # captured files directly follows their headers => no seeking back
+        for member in self.handle:
+            index.add(member)
+            if (member.isfile() and os.path.basename(member.name) in
+                    settings.ARCHIVE_SCAN_FILES and
+                    member.size <= settings.ARCHIVE_SCAN_FILE_SIZE):
+                index.capture(member.name, self.handle.extractfile(
+                    member).read())
+        return index
+
     def close(self):
         if self.handle:
             self.handle.close()
+            self.handle = None
+        logger.debug('Content cache of {0}: {1} hits, {2} misses.'.format(
+            self.name, self.content_cache.hits, self.content_cache.misses))
+        self.content_cache.clear()
 
     def __enter__(self):
+        self.depth += 1
+        if self.depth > 1:
+            return self
         return self.open()
 
     def __exit__(self, type, value, traceback):  # TODO: handle exceptions here
-        self.close()
+        self.depth -= 1
+        if not self.depth:
+            self.close()
 
     @property
     def extractor_cls(self):
@@ -142,9 +326,8 @@ class Archive(object):
 
         return file_cls
 
-    @utils.memoize_by_args
     # TODO: log if file can't be opened
-    def get_content_of_file(self, name, full_path=False):
+    def get_content_of_file(self, name, full_path=False, raw=False):
         """Returns content of file from archive.
 
         If full_path is set to False and two files with given name exist,
@@ -153,17 +336,21 @@ class Archive(object):
 
         Args:
             name: name of the file to get content of
+            raw: whether to return raw bytes instead of decoded string
         Returns:
             Content of the file with given name or None, if no such.
         """
         if self.handle:
-            for member in self.handle.getmembers():
-                if (full_path and member.name == name) or (
-                        not full_path and os.path.basename(
-                            member.name) == name):
-                    extracted = self.handle.extractfile(member)
-                    return extracted.read().decode(
-                        locale.getpreferredencoding())
+            for member in self.index.find(name, full_path):
+                content = self.index.captured.get(member.name)
+                if content is None:
+                    content = self.content_cache.get(member.name)
+                if content is None:
+                    content = self.handle.extractfile(member.info).read()
+                    self.content_cache.put(member.name, content)
+                if raw:
+                    return content
+                return content.decode(locale.getpreferredencoding())
 
         return None
 
@@ -173,21 +360,35 @@ class Archive(object):
         get_content_of_file.
         """
         if self.handle:
-            for member in self.handle.getmembers():
-                if (full_path and member.name == name or
-                        not full_path and os.path.basename(
-                            member.name) == name):
-                    # TODO handle KeyError exception
-                    self.handle.extract(member, path=directory)
+            for member in self.index.find(name, full_path):
+                # TODO handle KeyError exception
+                self.handle.extract(member.info, path=directory)
 
     def extract_all(self, directory=".", members=None):
         """Extract all member from the archive to the specified working
         directory.
         """
         if self.handle:
+            if self.is_compressed_tar and members is None:
+                # members from the index are ordered by their offsets, so
+                # the extraction is a single forward pass over the stream
+                # without loading the member table again
+                members = [member.info for member in self.index.members]
             self.handle.extractall(path=directory, members=members)
 
-    # TODO: maybe implement this using get_files_re
+    def has_file(self, name):
+        """Finds out if there is a file with given full path in the archive.
+        Args:
+            name: full path of the file inside the archive
+        Returns:
+            True if there is such file, False otherwise (or archive can't
+            be opened)
+        """
+        if self.handle:
+            return any(not member.is_dir
+                       for member in self.index.find(name, full_path=True))
+        return False
+
     def has_file_with_suffix(self, suffixes):
         """Finds out if there is a file with one of suffixes in the archive.
         Args:
@@ -200,15 +401,13 @@ class Archive(object):
             suffixes = [suffixes]
 
         if self.handle:
-            for member in self.handle.getmembers():
-                if os.path.splitext(member.name)[1] in suffixes:
+            if any(suffix in self.index.suffixes for suffix in suffixes):
+                return True
+            # hack for .zip files, where directories are not returned
+            # themselves, therefore we can't find e.g. .egg-info
+            for component in self.index.dir_components:
+                if component.endswith(tuple(suffixes)):
                     return True
-                else:
-                    # hack for .zip files, where directories are not returned
-                    # themselves, therefore we can't find e.g. .egg-info
-                    for suffix in suffixes:
-                        if '{0}/'.format(suffix) in member.name:
-                            return True
 
         return False
 
@@ -237,12 +436,10 @@ class Archive(object):
         found = []
 
         if self.handle:
-            for member in self.handle.getmembers():
-                if isinstance(member, TarInfo) and member.isdir():
-                    pass  # for TarInfo files, filter out directories
-                elif (full_path and compiled_re.search(member.name)) or (
-                    not full_path and compiled_re.search(os.path.basename(
-                        member.name))):
+            # for TarInfo files, directories are not in index.files
+            for member in self.index.files:
+                if compiled_re.search(
+                        member.name if full_path else member.basename):
                     found.append(member.name)
 
         return found
@@ -261,20 +458,11 @@ class Archive(object):
         found = set()
 
         if self.handle:
-            for member in self.handle.getmembers():
-                # zipfiles only list directories => have to work around that
-                if isinstance(member, ZipInfo):
-                    to_match = os.path.dirname(member.name)
-                # tarfiles => only match directories
-                elif isinstance(member, TarInfo) and member.isdir():
-                    to_match = member.name
-                else:
-                    to_match = None
-                if to_match:
-                    if ((full_path and compiled_re.search(to_match)) or (
-                            not full_path and compiled_re.search(
-                                os.path.basename(to_match)))):
-                        found.add(to_match)
+            for to_match in self.index.directories:
+                if ((full_path and compiled_re.search(to_match)) or (
+                        not full_path and compiled_re.search(
+                            os.path.basename(to_match)))):
+                    found.add(to_match)
 
         return list(found)
 
@@ -282,53 +470,113 @@ class Archive(object):
     def top_directory(self):
         """Return the name of the archive topmost directory."""
         if self.handle:
-            return os.path.commonprefix(self.handle.getnames()).rstrip('/')
+            return self.index.top_directory
+
+    @property
+    def dist_info(self):
+        """Returns path of .dist-info directory of a wheel archive or None,
+        if there is no such.
+        """
+        for name in self.get_files_re(r'^[^/]+\.dist-info/METADATA$',
+                                      full_path=True):
+            return os.path.dirname(name)
+
+    def get_dist_info_file(self, name):
+        """Returns decoded content of file in .dist-info directory of a
+        wheel archive or None, if there is no such.
+        """
+        if self.dist_info:
+            content = self.get_content_of_file(
+                '{0}/{1}'.format(self.dist_info, name), full_path=True,
+                raw=True)
+            if content is not None:
+                return content.decode('utf-8', 'replace')
+
+    @property
+    def wheel_metadata(self):
+        """Getter of core metadata of .whl archive, METADATA file is parsed
+        only once per archive.
+        Returns:
+            CoreMetadata object
+        """
+        if self._wheel_metadata is None:
+            content = self.get_dist_info_file('METADATA')
+            if content is None:
+                sys.exit(
+                    'Unable to extract package metadata from .whl archive, '
+                    'there is no .dist-info/METADATA file in it. '
+                    'You may ask the upstream to upload an sdist as well to '
+                    'workaround this problem.')
+            self._wheel_metadata = CoreMetadata(content)
+        return self._wheel_metadata
+
+    @property
+    def wheel_entry_points(self):
+        """Getter of entry points of .whl archive.
+        Returns:
+            dict of entry point groups and lists of entry points from
+            entry_points.txt, empty if there is no such file
+        """
+        if self._wheel_entry_points is None:
+            content = self.get_dist_info_file('entry_points.txt')
+            self._wheel_entry_points = parse_entry_points(content or '')
+        return self._wheel_entry_points
 
     @property
     def json_wheel_metadata(self):
         """Simple getter that get content of metadata.json file in .whl archive
+        Wheels built by wheel >= 0.31 don't contain the file anymore, it is
+        used only for information missing in METADATA.
         Returns:
-            metadata from metadata.json or pydist.json in json format
+            metadata from metadata.json or pydist.json in json format, empty
+            dict if there is no such file
         """
         for meta_file in ("metadata.json", "pydist.json"):
-            try:
-                return json.loads(self.get_content_of_file(meta_file))
-            except TypeError as err:
-                logger.warning(
-                    'Could not extract metadata from {}.'
-                    ' Error: {}'.format(meta_file, err))
-        sys.exit(
-            'Unable to extract package metadata from .whl archive. '
-            'This might be caused by an old .whl format version. '
-            'You may ask the upstream to upload fresh wheels created '
-            'with wheel >= 0.17.0 or to upload an sdist as well to '
-            'workaround this problem.')
+            content = self.get_dist_info_file(meta_file)
+            if content is not None:
+                try:
+                    return json.loads(content)
+                except ValueError as err:
+                    logger.warning(
+                        'Could not extract metadata from {}.'
+                        ' Error: {}'.format(meta_file, err))
+        return {}
 
     def wheel_description(self):
         """Get content of DESCRIPTION file in .whl archive"""
         return self.get_content_of_file('DESCRIPTION.rst')
 
+    @property
+    def record_paths(self):
+        """Getter of paths of files listed in RECORD file of .whl archive,
+        the file is parsed only once per archive.
+        """
+        if self._record_paths is None:
+            content = self.get_dist_info_file('RECORD') or ''
+            self._record_paths = [row[0] for row in csv.reader(
+                content.splitlines()) if row]
+        return self._record_paths
+
     @property
     def record(self):
         """Getter that get content of RECORD file in .whl archive
         Returns:
             dict with keys `modules` and `scripts`
         """
-
-        modules = []
-        scripts = []
-        if self.get_content_of_file('RECORD'):
-            lines = self.get_content_of_file('RECORD').splitlines()
-            for line in lines:
-                if 'dist-info' in line or '/' not in line:
+        if self._record is None:
+            modules = set()
+            scripts = set()
+            for path in self.record_paths:
+                path = path.split('/')
+                if len(path) == 1 or path[0].endswith('.dist-info'):
                     continue
-                elif '.data/scripts' in line:
-                    script = line.split(',', 1)[0]
-                    # strip Name.version.data/scripts/
-                    scripts.append(re.sub('.*/.*/', '', script))
+                elif path[0].endswith('.data'):
+                    if path[1] == 'scripts':
+                        scripts.add(path[-1])
+                    elif path[1] in ('purelib', 'platlib') and len(path) > 3:
+                        modules.add(path[2])
                 else:
-                    # strip everything from first occurance of slash
-                    modules.append(re.sub('/.*', '', line))
-
-        return {'modules': sorted(set(modules)),
-                'scripts': sorted(set(scripts))}
+                    modules.add(path[0])
+            self._record = {'modules': sorted(modules),
+                            'scripts': sorted(scripts)}
+        return self._record
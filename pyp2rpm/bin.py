@@ -132,11 +132,40 @@ class SclizeOption(click.Option):
               help='Enable / disable metadata extraction from virtualenv '
               '(default: enabled).',
               default=True)
+@click.option('--wheel-layout',
+              help='Find out packages, modules and scripts from wheel built '
+              'from the package instead of installing it to virtualenv.',
+              is_flag=True)
+@click.option('--cache / --no-cache',
+              help='Enable / disable caching of metadata extracted from '
+              'the package file, of PyPI responses and of package files in '
+              '"{0}" (default: enabled).'.format(settings.CACHE_DIR),
+              default=True)
+@click.option('--refresh',
+              help='Extract metadata again even if they are cached, '
+              'revalidate cached PyPI responses and update the cache.',
+              is_flag=True)
+@click.option('--cache-ttl',
+              help='Use cached PyPI responses younger than SECONDS without '
+              'asking PyPI whether they changed (default: {0}).'.format(
+                  settings.HTTP_CACHE_TTL),
+              type=int,
+              default=settings.HTTP_CACHE_TTL,
+              metavar='SECONDS')
 @click.option('--autonc/ --no-autonc',
               help='Enable / disable using automatic provides with '
               'a standardized name in dependencies declaration ('
               'default: disabled).',
               default=None)
+@click.option('--repodata',
+              help='Local directory with metadata of an rpm repository '
+              '(containing repodata/) to convert names of dependencies '
+              'according to, instead of repositories configured in dnf. '
+              'With --autonc requirements no package of the repositories '
+              'provides are reported. Can be given multiple times.',
+              type=click.Path(exists=True, file_okay=False),
+              multiple=True,
+              metavar='DIR')
 @click.option('--sclize',
               help='Convert tags and macro definitions to SCL-style using '
               '`spec2scl` module. NOTE: SCL related options can be provided '
@@ -172,8 +201,9 @@ class SclizeOption(click.Option):
               default=None,
               metavar='FILE_NAME')
 @click.argument('package', nargs=1)
-def main(package, v, prerelease, d, s, r, proxy, srpm, p, b, o, t, venv, autonc,
-         sclize, **scl_kwargs):
+def main(package, v, prerelease, d, s, r, proxy, srpm, p, b, o, t, venv,
+         wheel_layout, cache, refresh, cache_ttl, autonc, repodata, sclize,
+         **scl_kwargs):
     """Convert PyPI package to RPM specfile or SRPM.
 
     \b
@@ -209,7 +239,12 @@ def main(package, v, prerelease, d, s, r, proxy, srpm, p, b, o, t, venv, autonc,
                           rpm_name=r,
                           proxy=proxy,
                           venv=venv,
-                          autonc=autonc)
+                          wheel_layout=wheel_layout,
+                          autonc=autonc,
+                          cache=cache,
+                          refresh=refresh,
+                          cache_ttl=cache_ttl,
+                          repodata=repodata)
 
     logger.debug(
         'Convertor: {0} created. Trying to convert.'.format(convertor))
@@ -2,6 +2,9 @@ import sys
 import json
 from distutils.core import Command
 
+# extras which are considered to be build time requirements
+SETUP_REQUIRES_EXTRAS = ['test, docs', 'doc', 'dev']
+
 
 class extract_dist(Command):
     """Custom distutils command to extract metadata form setup function."""
@@ -27,7 +30,7 @@ class extract_dist(Command):
         try:
             for k, v in getattr(
                     self.distribution, 'extras_require', {}).items():
-                if k in ['test, docs', 'doc', 'dev']:
+                if k in SETUP_REQUIRES_EXTRAS:
                     attr = 'setup_requires'
                 else:
                     attr = 'install_requires'
@@ -0,0 +1,292 @@
+import hashlib
+import logging
+import os
+import socket
+import threading
+try:
+    import http.client as httplib
+    from urllib.error import HTTPError, URLError
+    from urllib.parse import urljoin, urlsplit
+    from urllib.request import getproxies, proxy_bypass
+except ImportError:
+    import httplib
+    from urllib import getproxies, proxy_bypass
+    from urllib2 import HTTPError, URLError
+    from urlparse import urljoin, urlsplit
+
+from pyp2rpm import settings
+from pyp2rpm.exceptions import DigestMismatchException
+
+logger = logging.getLogger(__name__)
+
+
+class PooledResponse(object):
+    """Response of a request sent through ConnectionPool. The connection
+    goes back to the pool once the body is read to the end, it is closed if
+    the response is closed earlier.
+
+    with pool.open('https://pypi.org/pypi/spam/json') as response:
+        body = response.read()
+    """
+
+    def __init__(self, pool, key, connection, response):
+        self.pool = pool
+        self.key = key
+        self.connection = connection
+        self.response = response
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.msg
+
+    def getheader(self, name, default=None):
+        return self.response.getheader(name, default)
+
+    def read(self, amt=None):
+        data = self.response.read() if amt is None else self.response.read(
+            amt)
+        if amt and not data and self.response.length:
+            # connection was closed before the whole body was received
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+            raise httplib.IncompleteRead(data, self.response.length)
+        if self.response.isclosed():
+            self.release()
+        return data
+
+    def release(self):
+        if self.connection is None:
+            return
+        if self.response.isclosed() and not self.response.will_close:
+            self.pool.release(self.key, self.connection)
+        else:
+            self.response.close()
+            self.connection.close()
+        self.connection = None
+
+    def close(self):
+        self.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+class ConnectionPool(object):
+    """Thread-safe pool of persistent HTTP/1.1 connections, up to size idle
+    connections are kept for every host, so that subsequent requests to the
+    host don't pay for new TCP and TLS handshakes.
+
+    Requests go through the given proxy (proxy.server:port), through
+    proxies from the environment (http_proxy, https_proxy, no_proxy)
+    otherwise. HTTPS requests are tunneled through the proxy.
+    """
+
+    redirect_codes = (301, 302, 303, 307, 308)
+    max_redirects = 5
+
+    def __init__(self, size=settings.HTTP_POOL_SIZE,
+                 timeout=settings.HTTP_TIMEOUT, proxy=None):
+        """
+        Args:
+            size: maximum number of idle connections kept for every host
+            timeout: timeout of connecting and every socket operation in
+                seconds
+            proxy: proxy to use for all the requests
+        """
+        self.size = size
+        self.timeout = timeout
+        self.proxy = proxy
+        self.lock = threading.Lock()
+        self.idle = {}
+        self.connections_made = 0
+
+    def proxy_for(self, scheme, host):
+        """Returns (host, port) of proxy to reach the host through or
+        None.
+        """
+        proxy = self.proxy
+        if not proxy:
+            if proxy_bypass(host):
+                return None
+            proxy = getproxies().get(scheme)
+            if not proxy:
+                return None
+        if '://' not in proxy:
+            proxy = 'http://' + proxy
+        parts = urlsplit(proxy)
+        return parts.hostname, parts.port
+
+    def new_connection(self, scheme, host, port):
+        proxy = self.proxy_for(scheme, host)
+        if scheme == 'https':
+            connection_class = httplib.HTTPSConnection
+        else:
+            connection_class = httplib.HTTPConnection
+        if proxy is None:
+            connection = connection_class(host, port, timeout=self.timeout)
+        else:
+            connection = connection_class(proxy[0], proxy[1],
+                                          timeout=self.timeout)
+            if scheme == 'https':
+                connection.set_tunnel(host, port)
+        with self.lock:
+            self.connections_made += 1
+        logger.debug('New connection to {0}://{1}:{2}.'.format(
+            scheme, host, port))
+        return connection
+
+    def acquire(self, key):
+        """Returns idle connection of the host or a new one and whether the
+        connection was used before.
+        """
+        with self.lock:
+            idle = self.idle.get(key)
+            if idle:
+                return idle.pop(), True
+        return self.new_connection(*key), False
+
+    def release(self, key, connection):
+        """Returns connection to the pool, closes it if the pool is full."""
+        with self.lock:
+            idle = self.idle.setdefault(key, [])
+            if len(idle) < self.size:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def request(self, url, headers=None):
+        """Sends GET request of the url.
+        Returns:
+            PooledResponse object
+        Raises:
+            URLError if the request can't be sent
+        """
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        key = (parts.scheme, parts.hostname, port)
+        if parts.scheme == 'http' and self.proxy_for(
+                parts.scheme, parts.hostname):
+            path = url
+        else:
+            path = (parts.path or '/') + (
+                '?' + parts.query if parts.query else '')
+        while True:
+            connection, reused = self.acquire(key)
+            try:
+                connection.request('GET', path, headers=headers or {})
+                response = connection.getresponse()
+            except (httplib.HTTPException, socket.error) as e:
+                connection.close()
+                if reused:
+                    # server closed the connection while it was idle
+                    continue
+                raise URLError(e)
+            return PooledResponse(self, key, connection, response)
+
+    def open(self, url, headers=None):
+        """Sends GET request of the url, follows redirects.
+        Args:
+            url: url to get
+            headers: dictionary of additional request headers
+        Returns:
+            PooledResponse object
+        Raises:
+            HTTPError if the response is an error
+            URLError if the request can't be sent
+        """
+        for _ in range(self.max_redirects + 1):
+            response = self.request(url, headers)
+            location = response.getheader('Location')
+            if response.status in self.redirect_codes and location:
+                response.read()
+                url = urljoin(url, location)
+                continue
+            if response.status >= 400:
+                response.read()
+                raise HTTPError(url, response.status, response.reason,
+                                response.headers, None)
+            return response
+        raise URLError('Too many redirects of {0}'.format(url))
+
+    def retrieve(self, url, filename, digests=None,
+                 retries=settings.DOWNLOAD_RETRIES, chunk_size=64 * 1024):
+        """Downloads the url to the file. The content is streamed to
+        filename.part and hashed on the fly, interrupted download is resumed
+        by range request (also the next time the same file is downloaded).
+        The file is moved into place only once its digests are verified.
+        Args:
+            url: url to download
+            filename: path to store the file to
+            digests: dictionary of expected md5 and sha256 hex digests
+            retries: number of attempts to resume interrupted download
+            chunk_size: number of bytes read at once
+        Returns:
+            dictionary of md5 and sha256 hex digests of the file
+        Raises:
+            HTTPError, URLError if the file can't be downloaded
+            DigestMismatchException if the digests don't match
+        """
+        part = filename + '.part'
+        error = None
+        for attempt in range(retries + 1):
+            offset = os.path.getsize(part) if os.path.exists(part) else 0
+            headers = {'Range': 'bytes={0}-'.format(offset)} if offset else {}
+            try:
+                response = self.open(url, headers)
+            except HTTPError as e:
+                if e.code != 416 or not offset:
+                    raise
+                # partial file is not a prefix of the file anymore
+                error = e
+                os.remove(part)
+                continue
+            with response:
+                hashes = [hashlib.md5(), hashlib.sha256()]
+                resumed = offset and response.status == 206 and (
+                    response.getheader('Content-Range', '').startswith(
+                        'bytes {0}-'.format(offset)))
+                if resumed:
+                    logger.info('Resuming download of {0} at {1} B.'.format(
+                        url, offset))
+                    with open(part, 'rb') as f:
+                        for chunk in iter(lambda: f.read(chunk_size), b''):
+                            for h in hashes:
+                                h.update(chunk)
+                try:
+                    with open(part, 'ab' if resumed else 'wb') as f:
+                        for chunk in iter(lambda: response.read(chunk_size),
+                                          b''):
+                            f.write(chunk)
+                            for h in hashes:
+                                h.update(chunk)
+                except (httplib.HTTPException, socket.error) as e:
+                    error = e
+                    logger.warning('Download of {0} interrupted: {1}.'.format(
+                        url, e))
+                    continue
+            break
+        else:
+            raise URLError(error)
+
+        computed = {'md5': hashes[0].hexdigest(),
+                    'sha256': hashes[1].hexdigest()}
+        for name, expected in (digests or {}).items():
+            if expected and name in computed and \
+                    computed[name] != expected.lower():
+                os.remove(part)
+                raise DigestMismatchException(
+                    '{0} digest of {1} is {2}, expected {3}.'.format(
+                        name, url, computed[name], expected))
+        os.rename(part, filename)
+        return computed
+
+    def close(self):
+        """Closes all the idle connections."""
+        with self.lock:
+            idle, self.idle = self.idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
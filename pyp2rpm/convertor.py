@@ -3,17 +3,9 @@ import os
 import re
 import sys
 try:
-    import urllib2 as urllib
-    from urllib2 import urlopen, HTTPError, URLError
+    from urllib2 import HTTPError, URLError
 except ImportError:
-    import urllib
-    from urllib import request
-    from urllib.request import urlopen, HTTPError, URLError
-    urllib.Request = request.Request
-    urllib.ProxyHandler = request.ProxyHandler
-    urllib.build_opener = request.build_opener
-    urllib.install_opener = request.install_opener
-import json
+    from urllib.error import HTTPError, URLError
 
 try:
     import dnf
@@ -23,12 +15,21 @@ except ImportError:
 import jinja2
 import pprint
 
+from pyp2rpm import connection_pool
 from pyp2rpm import exceptions
+from pyp2rpm import extraction_cache
 from pyp2rpm import filters
+from pyp2rpm import http_cache
 from pyp2rpm import metadata_extractors
 from pyp2rpm import name_convertor
+from pyp2rpm import package_data
 from pyp2rpm import package_getters
+from pyp2rpm import pypi_json
+from pyp2rpm import repo_index
 from pyp2rpm import settings
+from pyp2rpm import source_store
+from pyp2rpm import stages
+from pyp2rpm import workspace
 
 logger = logging.getLogger(__name__)
 
@@ -47,7 +48,10 @@ class Convertor(object):
                  distro=settings.DEFAULT_DISTRO,
                  base_python_version=settings.DEFAULT_PYTHON_VERSION,
                  python_versions=[],
-                 rpm_name=None, proxy=None, venv=True, autonc=False):
+                 rpm_name=None, proxy=None, venv=True, autonc=False,
+                 cache=False, refresh=False, wheel_layout=False,
+                 cache_ttl=settings.HTTP_CACHE_TTL, client=None,
+                 repodata=()):
         self.package = package
         self.version = version
         self.prerelease = prerelease
@@ -61,13 +65,22 @@ class Convertor(object):
         self.rpm_name = rpm_name
         self.proxy = proxy
         self.venv = venv
+        self.wheel_layout = wheel_layout
         self.autonc = autonc
+        self.cache = cache
+        self.refresh = refresh
+        self.cache_ttl = cache_ttl
+        self.repodata = list(repodata)
+        self.workspace = None
         self.pypi = True
         suffix = os.path.splitext(self.package)[1]
         if (os.path.exists(self.package)
                 and suffix in settings.ARCHIVE_SUFFIXES
                 and not os.path.isdir(self.package)):
             self.pypi = False
+        if client is not None and self.pypi:
+            # client shared by conversions of many packages
+            self._client = client
 
     @property
     def template_base_py_ver(self):
@@ -130,6 +143,56 @@ class Convertor(object):
         Returns:
             rendered RPM SPECFILE.
         """
+        # all the stages share one workspace: the package file is opened,
+        # extracted or downloaded only once, everything is removed at the end
+        self.workspace = workspace.Workspace()
+        with self.workspace:
+            # getting and extraction of the package, loading of the template
+            # and rpmdev-packager are independent of each other
+            graph = stages.StageGraph()
+            graph.add('data', self.package_data)
+            graph.add('template', self.jinja_template)
+            graph.add('packager', package_data.changelog_date_packager)
+            results = graph.run()
+        data = results['data']
+        data.changelog_date_packager = results['packager']
+        self.report_unresolvable(data)
+
+        ret = results['template'].render(data=data,
+                                         name_convertor=name_convertor)
+        return re.sub(r'[ \t]+\n', "\n", ret)
+
+    def required_names(self, data):
+        """Returns list of names of the requirements of the package as the
+        templates render them for each of the python versions, e.g.
+        python2-devel becomes python3-devel.
+        """
+        names = []
+        for version in data.sorted_python_versions:
+            names.extend(dep[1] for dep in filters.deps_for_python_version(
+                data.build_deps, version, data.base_python_version))
+            names.extend(dep[1] for dep in filters.deps_for_python_version(
+                data.runtime_deps, version, version))
+        return names
+
+    def report_unresolvable(self, data):
+        """Reports requirements of the package no package in the
+        repositories provides, together with names of similar packages.
+        """
+        for name in self.name_convertor.unresolvable(
+                self.required_names(data)):
+            message = '{0} is not provided by any package in the ' \
+                'repositories.'.format(name)
+            similar = self.name_convertor.similar(name)
+            if similar:
+                message += ' Similar packages: {0}.'.format(', '.join(similar))
+            logger.warning(message)
+
+    def package_data(self):
+        """Gets the package and extracts data from it.
+        Returns:
+            PackageData object containing the extracted data.
+        """
         # move file into position
         try:
             local_file = self.getter.get()
@@ -144,11 +207,17 @@ class Convertor(object):
         self.name, self.version = self.getter.get_name_version()
 
         self.local_file = local_file
-        data = self.metadata_extractor.extract_data(self.client)
+        # digests verified during the download, not fetched from PyPI again
+        data = self.metadata_extractor.extract_data(self.client,
+                                                    self.getter.digests)
+        data.set_from(self.getter.digests)
         logger.debug("Extracted metadata:")
         logger.debug(pprint.pformat(data.data))
         self.merge_versions(data)
+        return data
 
+    def jinja_template(self):
+        """Returns jinja2 template the SPECFILE is rendered from."""
         jinja_env = jinja2.Environment(loader=jinja2.ChoiceLoader([
             jinja2.FileSystemLoader(['/']),
             jinja2.PackageLoader('pyp2rpm', 'templates'), ]))
@@ -167,9 +236,7 @@ class Convertor(object):
 
             jinja_template = jinja_env.get_template(self.template)
             logger.info('Using default template: {0}.'.format(self.template))
-
-        ret = jinja_template.render(data=data, name_convertor=name_convertor)
-        return re.sub(r'[ \t]+\n', "\n", ret)
+        return jinja_template
 
     @property
     def getter(self):
@@ -187,7 +254,8 @@ class Convertor(object):
             if not self.pypi:
                 self._getter = package_getters.LocalFileGetter(
                     self.package,
-                    self.save_dir)
+                    self.save_dir,
+                    self.source_store)
             else:
                 logger.debug(
                     '{0} does not exist as local file trying PyPI.'.format(
@@ -197,7 +265,9 @@ class Convertor(object):
                     self.package,
                     self.version,
                     self.prerelease,
-                    self.save_dir)
+                    self.save_dir,
+                    self.workspace,
+                    self.source_store)
 
         return self._getter
 
@@ -228,7 +298,13 @@ class Convertor(object):
                 logger.debug("Using AutoProvidesNameConvertor to convert "
                              "names of the packages.")
                 self._name_convertor = name_convertor.AutoProvidesNameConvertor(
-                    self.distro)
+                    self.distro, self.provides_index)
+            elif self.repodata:
+                logger.debug("Using DandifiedNameConvertor with packages of "
+                             "{0} to convert names of the packages.".format(
+                                 ', '.join(self.repodata)))
+                self._name_convertor = name_convertor.DandifiedNameConvertor(
+                    self.distro, self.repository_names)
             elif dnf is None:
                 logger.warning("Dnf module not found, please dnf install "
                                "python{0}-dnf to improve accuracy of name "
@@ -244,6 +320,32 @@ class Convertor(object):
                     self.distro)
         return self._name_convertor
 
+    @property
+    def provides_index(self):
+        """Index of python provides of packages in the repositories given
+        by repodata or None, if there are no such.
+        """
+        if not self.repodata:
+            return None
+        try:
+            return repo_index.repository_provides(self.repodata)
+        except (IOError, OSError, ValueError) as e:
+            logger.error('Failed to read repository metadata.',
+                         exc_info=True)
+            sys.exit(e)
+
+    @property
+    def repository_names(self):
+        """Index of names of packages in the repositories given by
+        repodata, read without dnf.
+        """
+        try:
+            return repo_index.repository_names(self.repodata)
+        except (IOError, OSError, ValueError) as e:
+            logger.error('Failed to read repository metadata.',
+                         exc_info=True)
+            sys.exit(e)
+
     @property
     def metadata_extractor(self):
         """Returns an instance of proper MetadataExtractor subclass.
@@ -277,10 +379,33 @@ class Convertor(object):
                 self.rpm_name,
                 self.venv,
                 self.distro,
-                base_python_version)
+                base_python_version,
+                cache=self.metadata_cache,
+                wheel_layout=self.wheel_layout,
+                workspace=self.workspace,
+                sha256=self.getter.sha256)
 
         return self._metadata_extractor
 
+    @property
+    def metadata_cache(self):
+        """Cache of extracted metadata or None, if caching is disabled."""
+        if self.cache:
+            return extraction_cache.ExtractionCache(refresh=self.refresh)
+
+    @property
+    def http_cache(self):
+        """Cache of PyPI responses or None, if caching is disabled."""
+        if self.cache:
+            return http_cache.HTTPCache(ttl=self.cache_ttl,
+                                        refresh=self.refresh)
+
+    @property
+    def source_store(self):
+        """Store of downloaded sources or None, if caching is disabled."""
+        if self.cache:
+            return source_store.SourceStore()
+
     @property
     def client(self):
         """JSON client for PyPI. Always returns the same instance.
@@ -292,23 +417,27 @@ class Convertor(object):
             JSON client for PyPI or None.
         """
         if self._client is None and self.pypi:
-            self._client = PyPIClient(proxy=self.proxy)
+            self._client = PyPIClient(proxy=self.proxy,
+                                      http_cache=self.http_cache)
             self._client_set = True
 
         return self._client
 
 
 class PyPIClient():
-    """This class interfaces with the PyPI JSON API."""
+    """This class interfaces with the PyPI JSON API. JSON lookups and
+    downloads share one pool of persistent connections, JSON documents are
+    stored in http_cache, if given, and revalidated by conditional requests.
+    """
 
     no_such_package = {'info': {}, 'urls': [], 'releases': {}}
 
-    def __init__(self, proxy=None):
+    def __init__(self, proxy=None, pool=None, http_cache=None):
         self.cache = {}
+        self.downloads = {}
+        self.http_cache = http_cache
+        self.pool = pool or connection_pool.ConnectionPool(proxy=proxy)
         if proxy:
-            proxyhandler = urllib.ProxyHandler({"http": proxy})
-            opener = urllib.build_opener(proxyhandler)
-            urllib.install_opener(opener)
             logger.info('Using provided proxy: {0}.'.format(proxy))
 
     def get_json(self, name, version):
@@ -319,16 +448,65 @@ class PyPIClient():
         else:
             url = "{0}/{1}/json".format(settings.PYPI_URL, name)
         try:
-            json_info = urlopen(url)
+            # only info, urls and versions of releases are kept
+            self.cache[(name, version)] = pypi_json.parse_project_json(
+                self.fetch(url).decode("utf-8"))
         except HTTPError as e:
             self.cache[(name, version)] = self.no_such_package
-            return self.cache[(name, version)]
         except URLError as e:
             sys.stderr.write("Failed to connect to server: {0} \n".format(e))
             raise SystemExit(3)
-        self.cache[(name, version)] = json.loads(json_info.read().decode("utf-8"))
         return self.cache[(name, version)]
 
+    def fetch(self, url):
+        """Returns body of the url, taken from the HTTP cache if it is fresh
+        there or if it was not modified since it was cached.
+        """
+        cached = self.http_cache.get(url) if self.http_cache else None
+        if cached is not None and self.http_cache.fresh(cached):
+            return cached.read()
+        try:
+            with self.pool.open(url, cached and cached.validators) as response:
+                body = response.read()
+                if cached is not None and response.status == 304:
+                    self.http_cache.revalidated(cached)
+                    return cached.read()
+                if self.http_cache is not None:
+                    self.http_cache.put(url, response.getheader('ETag'),
+                                        response.getheader('Last-Modified'),
+                                        body)
+                return body
+        except HTTPError:
+            raise
+        except URLError as e:
+            if cached is None:
+                raise
+            logger.warning('Failed to revalidate cached response of {0}: {1}, '
+                           'using it anyway.'.format(url, e))
+            return cached.read()
+
+    def download(self, url, filename, digests=None):
+        """Downloads file of a release to filename and verifies its digests,
+        unless the client downloaded it there already.
+        Args:
+            url: url of the file
+            filename: path to store the file to
+            digests: dictionary of expected md5 and sha256 hex digests
+        Returns:
+            dictionary of md5 and sha256 hex digests of the file
+        """
+        if url in self.downloads and self.downloads[url][0] == filename \
+                and os.path.isfile(filename):
+            logger.debug('{0} is downloaded already.'.format(filename))
+            return self.downloads[url][1]
+        try:
+            computed = self.pool.retrieve(url, filename, digests)
+        except (URLError, exceptions.DigestMismatchException) as e:
+            sys.stderr.write("Failed to download {0}: {1} \n".format(url, e))
+            raise SystemExit(3)
+        self.downloads[url] = (filename, computed)
+        return computed
+
     def release_data(self, name, version):
         return self.get_json(name, version)['info']
 
@@ -336,4 +514,4 @@ class PyPIClient():
         return self.get_json(name, version)['urls']
 
     def package_releases(self, name, show_hidden):
-        return self.get_json(name, None)['releases'].keys()
+        return list(self.get_json(name, None)['releases'])
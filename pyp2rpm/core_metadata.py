@@ -0,0 +1,235 @@
+"""Parsing of core metadata files of distributions (PKG-INFO, METADATA)
+and of the files setuptools stores next to them in egg-info directories.
+"""
+import posixpath
+import re
+
+from pyp2rpm import settings
+
+# core metadata fields and arguments of setup() derived from them
+CORE_METADATA_FIELDS = {'requires-dist': ['install_requires',
+                                          'extras_require'],
+                        'provides-extra': ['extras_require'],
+                        'summary': ['description'],
+                        'description': ['long_description'],
+                        'home-page': ['url'],
+                        'project-url': ['url'],
+                        'license': ['license'],
+                        'license-expression': ['license'],
+                        'classifier': ['classifiers']}
+
+EXTRA_MARKER_RE = re.compile(r'''extra\s*==\s*['"]([^'"]+)['"]''')
+REQUIREMENT_RE = re.compile(r'^([^\s(<>=!~;]+)\s*\(?([^()]*)\)?$')
+
+
+def parse_headers(content):
+    """Parses email-header formatted file, much faster than email.parser.
+    Args:
+        content: content of the file
+    Returns:
+        tuple (dictionary of lowercase field names and lists of their
+        values, message body)
+    """
+    headers = {}
+    lines = content.split('\n')
+    values = None
+    for index, line in enumerate(lines):
+        line = line.rstrip('\r')
+        if not line:
+            return headers, '\n'.join(lines[index + 1:])
+        if line[0] in ' \t' and values:
+            values[-1] += '\n' + line
+            continue
+        name, _, value = line.partition(':')
+        values = headers.setdefault(name.strip().lower(), [])
+        values.append(value.strip())
+    return headers, ''
+
+
+def unescape_description(description):
+    """Removes indentation setuptools adds to continuation lines of
+    Description field.
+    """
+    lines = description.split('\n')
+    for index, line in enumerate(lines[1:], 1):
+        if line.startswith('       |'):
+            lines[index] = line[8:]
+        elif line.startswith('        '):
+            lines[index] = line[8:]
+        else:
+            lines[index] = line.lstrip()
+    return '\n'.join(lines)
+
+
+def parse_entry_points(content):
+    """Parses entry_points.txt file.
+    Returns:
+        dictionary of entry point groups and lists of entry points in
+        'name = object reference' format
+    """
+    entry_points = {}
+    group = None
+    for line in content.splitlines():
+        line = line.strip()
+        if not line or line.startswith(('#', ';')):
+            continue
+        if line.startswith('[') and line.endswith(']'):
+            group = entry_points.setdefault(line[1:-1].strip(), [])
+        elif group is not None and '=' in line:
+            name, _, value = line.partition('=')
+            group.append('{0} = {1}'.format(name.strip(), value.strip()))
+    return entry_points
+
+
+def split_requirement(requirement):
+    """Splits Requires-Dist value to requirement without environment
+    marker and name of the extra the requirement belongs to.
+    """
+    requirement, _, marker = requirement.partition(';')
+    extra = EXTRA_MARKER_RE.search(marker)
+    return requirement.strip(), extra.group(1) if extra else None
+
+
+def pydist_requirement(requirement):
+    """Converts requirement without environment marker to the
+    'name (specs)' format of pydist.json, e.g. 'six>=1.10' to
+    'six (>=1.10)'.
+    """
+    match = REQUIREMENT_RE.match(requirement.replace(' ', ''))
+    if not match:
+        return requirement
+    name, specs = match.groups()
+    return '{0} ({1})'.format(name, specs) if specs else name
+
+
+class CoreMetadata(object):
+    """Metadata of a distribution parsed from PKG-INFO or METADATA file."""
+
+    def __init__(self, content):
+        self.headers, self.body = parse_headers(content)
+
+    def get(self, field, default=None):
+        values = self.headers.get(field.lower())
+        # distutils used to fill in missing fields with UNKNOWN
+        if not values or values[0] == 'UNKNOWN':
+            return default
+        return values[0]
+
+    def get_all(self, field):
+        return self.headers.get(field.lower(), [])
+
+    @property
+    def version(self):
+        try:
+            return tuple(int(n) for n in self.get(
+                'Metadata-Version', '').split('.'))
+        except ValueError:
+            return (0,)
+
+    @property
+    def dynamic(self):
+        return set(field.lower() for field in self.get_all('Dynamic'))
+
+    @property
+    def authoritative(self):
+        """From Metadata 2.2 on, fields which are not marked as Dynamic
+        can't be changed by the build backend.
+        """
+        return self.version >= (2, 2)
+
+    @property
+    def description(self):
+        if self.body.strip():
+            return self.body
+        return unescape_description(self.get('Description', ''))
+
+    @property
+    def url(self):
+        if self.get('Home-page'):
+            return self.get('Home-page')
+        urls = {}
+        for project_url in self.get_all('Project-URL'):
+            label, _, url = project_url.partition(',')
+            urls[re.sub(r'[-_ ]', '', label.lower())] = url.strip()
+        for key in settings.HOMEPAGE_URL_KEYS:
+            if key in urls:
+                return urls[key]
+
+    @property
+    def requires(self):
+        """Returns tuple (install requires, dictionary of extras requires)."""
+        install_requires, extras_require = [], {}
+        for requirement in self.get_all('Requires-Dist'):
+            requirement, extra = split_requirement(requirement)
+            if extra:
+                extras_require.setdefault(extra, []).append(requirement)
+            else:
+                install_requires.append(requirement)
+        return install_requires, extras_require
+
+    @property
+    def setup_kwargs(self):
+        """Arguments of setup() corresponding to the fields which are not
+        marked as Dynamic.
+        """
+        install_requires, extras_require = self.requires
+        kwargs = {'install_requires': install_requires,
+                  'extras_require': extras_require,
+                  'description': self.get('Summary'),
+                  'long_description': self.description,
+                  'url': self.url,
+                  'license': self.get('License-Expression',
+                                      self.get('License')),
+                  'classifiers': self.get_all('Classifier')}
+        for field in self.dynamic:
+            for argument in CORE_METADATA_FIELDS.get(field, []):
+                kwargs.pop(argument, None)
+        return kwargs
+
+
+def egg_info_kwargs(read_file, files):
+    """Returns arguments of setup() setuptools stored in egg-info directory:
+    entry_points and packages and py_modules.
+    Args:
+        read_file: function returning raw content of a file given path
+            relative to the directory of setup.py or None if there is no such
+            file
+        files: list of paths of all files in the directory of setup.py
+    Returns:
+        dictionary of the arguments, empty if there is no egg-info
+    """
+    egg_infos = sorted((f for f in files if f.endswith('.egg-info/PKG-INFO')),
+                       key=lambda f: f.count('/'))
+    if not egg_infos:
+        return {}
+    egg_info = posixpath.dirname(egg_infos[0])
+
+    def read_text(name):
+        content = read_file('{0}/{1}'.format(egg_info, name))
+        return content.decode('utf-8', 'replace') if content else None
+
+    # entry_points.txt is written only if there are any entry points
+    entry_points = read_text('entry_points.txt')
+    kwargs = {'entry_points': entry_points and parse_entry_points(
+        entry_points)}
+
+    top_level = read_text('top_level.txt')
+    sources = read_text('SOURCES.txt')
+    if top_level is not None and sources is not None:
+        top_level = set(top_level.split())
+        sources = sources.split()
+        packages, py_modules = set(), set()
+        for source in sources:
+            parts = source.split('/')
+            # flat or src layout
+            for index in (0, 1):
+                if len(parts) == index + 1 and \
+                        parts[index][:-len('.py')] in top_level and \
+                        parts[index].endswith('.py'):
+                    py_modules.add(parts[index][:-len('.py')])
+                elif len(parts) > index + 1 and parts[index] in top_level \
+                        and parts[-1] == '__init__.py':
+                    packages.add('.'.join(parts[index:-1]))
+        kwargs['packages'] = sorted(packages)
+        kwargs['py_modules'] = sorted(py_modules)
+    return kwargs
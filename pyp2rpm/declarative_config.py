@@ -0,0 +1,487 @@
+"""Static extraction of metadata declared in setup.cfg and pyproject.toml.
+
+The parsers turn the declarative configuration into arguments of setup()
+function, so they can be merged with arguments resolved from setup.py by
+SetupPyParser and converted to the metadata dictionary extract_dist
+command produces.
+"""
+import posixpath
+import re
+try:
+    from configparser import RawConfigParser, Error as ConfigParserError
+except ImportError:
+    from ConfigParser import RawConfigParser, Error as ConfigParserError
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+from pyp2rpm import settings
+from pyp2rpm.setup_py_parser import find_packages, requirements_list
+
+# aliases of setup.cfg [metadata] options
+SETUP_CFG_ALIASES = {'home_page': 'url', 'summary': 'description',
+                     'classifier': 'classifiers'}
+SETUP_CFG_METADATA = ['url', 'description', 'long_description', 'license',
+                      'classifiers']
+SETUP_CFG_OPTIONS = ['setup_requires', 'tests_require', 'install_requires',
+                     'packages', 'py_modules', 'scripts', 'test_suite']
+# dynamic fields of [project] table extract_dist command reads
+PYPROJECT_DYNAMIC_FIELDS = {'dependencies': 'install_requires',
+                            'optional-dependencies': 'extras_require',
+                            'readme': 'long_description',
+                            'description': 'description',
+                            'classifiers': 'classifiers',
+                            'license': 'license',
+                            'urls': 'url',
+                            'entry-points': 'entry_points',
+                            'scripts': 'entry_points',
+                            'gui-scripts': 'entry_points'}
+
+
+def parse_list(value, separator=','):
+    """Parses list option of setup.cfg, items are either on separate lines
+    or separated by separator.
+    """
+    if isinstance(value, list):
+        return value
+    if '\n' in value:
+        items = value.splitlines()
+    else:
+        items = value.split(separator)
+    return [item.strip() for item in items if item.strip()]
+
+
+def normalized_name(name):
+    return re.sub(r'[-_.]+', '_', name).lower()
+
+
+def version_specifier(constraint):
+    """Converts poetry version constraint to PEP 440 version specifier.
+    Args:
+        constraint: poetry constraint (e.g. ^1.2, ~1.2.3, >=1.0,<2.0, 1.2.*)
+    Returns:
+        version specifier or empty string if the constraint can't be
+        converted
+    """
+    specifiers = []
+    for part in constraint.replace(' ', '').split(','):
+        if part in ('', '*'):
+            continue
+        if part[0] in '^~' and not part.startswith('~='):
+            version = part[1:]
+            numbers = version.split('.')
+            if not all(n.isdigit() for n in numbers):
+                return ''
+            if part[0] == '^':
+                # the first non-zero number is bumped
+                index = next((i for i, n in enumerate(numbers) if n != '0'),
+                             len(numbers) - 1)
+            else:
+                index = 0 if len(numbers) == 1 else 1
+            upper = [int(n) for n in numbers[:index + 1]]
+            upper[-1] += 1
+            specifiers.append('>={0},<{1}'.format(
+                version, '.'.join(str(n) for n in upper)))
+        elif part[0] in '<>=!~':
+            specifiers.append(part)
+        else:
+            specifiers.append('==' + part)
+    if any('|' in s for s in specifiers):
+        return ''
+    return ','.join(specifiers)
+
+
+def poetry_requirement(name, value):
+    """Converts poetry dependency to PEP 508 requirement string."""
+    if isinstance(value, list):
+        # multiple constraints for different environments
+        value = value[0] if value else '*'
+    if isinstance(value, dict):
+        value = value.get('version', '*')
+    return name + version_specifier(value)
+
+
+class DeclarativeConfigParser(object):
+    """Abstract base class of parsers of declarative configuration files."""
+
+    def __init__(self, content, read_file, files=()):
+        """
+        Args:
+            content: content of the configuration file
+            read_file: function returning raw content of a file given path
+                relative to the directory of the configuration file or None
+                if there is no such file
+            files: list of paths of all files in the directory of the
+                configuration file
+        """
+        self.content = content
+        self.read_file = read_file
+        self.files = files
+        self.unresolved = []
+        # packages or py_modules found by automatic discovery, setuptools
+        # uses them only if neither is given explicitly
+        self.discovered = {}
+
+    @property
+    def setup_kwargs(self):
+        """Dictionary of arguments of setup() declared in the file, names
+        of arguments which couldn't be resolved are stored in
+        self.unresolved.
+        """
+        if not hasattr(self, '_setup_kwargs'):
+            self.unresolved = []
+            self._setup_kwargs = self.parse()
+        return self._setup_kwargs
+
+    def read_text(self, path):
+        content = self.read_file(posixpath.normpath(path))
+        if content is None:
+            return None
+        try:
+            return content.decode('utf-8').replace('\r\n', '\n')
+        except UnicodeDecodeError:
+            return None
+
+    def read_files(self, paths, option):
+        """Returns joined contents of given files."""
+        contents = [self.read_text(path) for path in paths]
+        if None in contents:
+            self.unresolved.append(option)
+            return None
+        return '\n'.join(contents)
+
+    def layout(self, module, where=('src', '.')):
+        """Finds the package or module of given name in the directories
+        build backends look into.
+        Returns:
+            dictionary with packages or py_modules argument
+        """
+        for directory in where:
+            prefix = '' if directory == '.' else directory + '/'
+            if prefix + module + '/__init__.py' in self.files:
+                return {'packages': find_packages(
+                    self.files, directory, include=[module, module + '.*'])}
+            if prefix + module + '.py' in self.files:
+                return {'py_modules': [module]}
+        return {}
+
+
+class SetupCfgParser(DeclarativeConfigParser):
+    """Parses [metadata] and [options] sections of setup.cfg the way
+    setuptools does.
+    """
+
+    def parse(self):
+        config = RawConfigParser()
+        try:
+            if hasattr(config, 'read_string'):
+                config.read_string(self.content)
+            else:
+                from StringIO import StringIO
+                config.readfp(StringIO(self.content))
+        except ConfigParserError:
+            self.unresolved.append('setup.cfg syntax')
+            return {}
+
+        kwargs = {}
+        if config.has_section('metadata'):
+            for option, value in config.items('metadata'):
+                option = SETUP_CFG_ALIASES.get(option, option)
+                if option in SETUP_CFG_METADATA:
+                    kwargs[option] = self.option_value(option, value)
+        if config.has_section('options'):
+            for option, value in config.items('options'):
+                if option in SETUP_CFG_OPTIONS:
+                    kwargs[option] = self.option_value(option, value)
+            if kwargs.get('packages') in ('find:', 'find_namespace:'):
+                kwargs['packages'] = self.find_packages(config)
+        if config.has_option('options', 'entry_points'):
+            # entry points in external file
+            self.unresolved.append('entry_points')
+        for section, option, separator in (
+                ('options.extras_require', 'extras_require', ';'),
+                ('options.entry_points', 'entry_points', ',')):
+            if config.has_section(section):
+                kwargs[option] = dict(
+                    (key, parse_list(value, separator))
+                    for key, value in config.items(section))
+        return dict((k, v) for k, v in kwargs.items() if v is not None)
+
+    def option_value(self, option, value):
+        if value.startswith('file:'):
+            return self.read_files(parse_list(value[len('file:'):]), option)
+        if value.startswith('attr:'):
+            self.unresolved.append(option)
+            return None
+        if option in ('install_requires', 'setup_requires', 'tests_require'):
+            return parse_list(value, ';')
+        if option in ('classifiers', 'py_modules', 'scripts', 'packages'):
+            if value.strip() in ('find:', 'find_namespace:'):
+                return value.strip()
+            return parse_list(value)
+        return value
+
+    def find_packages(self, config):
+        kwargs = {}
+        if config.has_section('options.packages.find'):
+            kwargs = dict((option, parse_list(value)) for option, value in
+                          config.items('options.packages.find'))
+        where = kwargs.pop('where', ['.'])
+        if config.has_option('options', 'package_dir'):
+            # package_dir = =src
+            package_dir = config.get('options', 'package_dir').strip()
+            if package_dir.startswith('='):
+                where = [package_dir[1:].strip()]
+        return find_packages(self.files, where[0],
+                             kwargs.get('exclude', ()),
+                             kwargs.get('include', ('*',)))
+
+
+class PyprojectParser(DeclarativeConfigParser):
+    """Parses [project] table of pyproject.toml (PEP 621) and, if
+    tool_tables is set, also [tool.poetry] and [tool.flit.metadata] tables.
+    """
+
+    def __init__(self, content, read_file, files=(), tool_tables=True):
+        super(PyprojectParser, self).__init__(content, read_file, files)
+        self.tool_tables = tool_tables
+
+    def parse(self):
+        if tomllib is None:
+            self.unresolved.append('pyproject.toml')
+            return {}
+        try:
+            self.data = tomllib.loads(self.content)
+        except (ValueError, TypeError):
+            self.unresolved.append('pyproject.toml syntax')
+            return {}
+
+        tool = self.data.get('tool', {})
+        if 'project' in self.data:
+            return self.project_kwargs(self.data['project'])
+        if self.tool_tables and 'poetry' in tool:
+            return self.poetry_kwargs(tool['poetry'])
+        if self.tool_tables and 'metadata' in tool.get('flit', {}):
+            return self.flit_kwargs(tool['flit'])
+        return {}
+
+    @property
+    def build_backend(self):
+        return self.data.get('build-system', {}).get('build-backend', '')
+
+    @property
+    def setuptools_backend(self):
+        backend = self.build_backend
+        return not backend or backend.startswith('setuptools')
+
+    def project_kwargs(self, project):
+        kwargs = {}
+        for key in ('description', 'classifiers'):
+            if key in project:
+                kwargs[key] = project[key]
+        if 'dependencies' in project:
+            kwargs['install_requires'] = project['dependencies']
+        if 'optional-dependencies' in project:
+            kwargs['extras_require'] = project['optional-dependencies']
+
+        readme = project.get('readme')
+        if isinstance(readme, dict):
+            if 'text' in readme:
+                kwargs['long_description'] = readme['text']
+            elif 'file' in readme:
+                readme = readme['file']
+        if isinstance(readme, str):
+            kwargs['long_description'] = self.read_files(
+                [readme], 'long_description')
+
+        license = project.get('license')
+        if isinstance(license, dict):
+            # license file would end up whole in the specfile
+            license = license.get('text')
+        if license:
+            kwargs['license'] = license
+
+        urls = dict((re.sub(r'[-_ ]', '', key.lower()), url)
+                    for key, url in project.get('urls', {}).items())
+        for key in settings.HOMEPAGE_URL_KEYS:
+            if key in urls:
+                kwargs['url'] = urls[key]
+                break
+
+        entry_points = dict(
+            (group, ['{0} = {1}'.format(k, v) for k, v in points.items()])
+            for group, points in project.get('entry-points', {}).items())
+        for key, group in (('scripts', 'console_scripts'),
+                           ('gui-scripts', 'gui_scripts')):
+            if key in project:
+                entry_points[group] = ['{0} = {1}'.format(k, v) for k, v in
+                                       project[key].items()]
+        if entry_points:
+            kwargs['entry_points'] = entry_points
+
+        kwargs.update(self.dynamic_kwargs(project))
+        if self.setuptools_backend:
+            kwargs.update(self.setuptools_layout())
+        else:
+            module = self.data.get('tool', {}).get('flit', {}).get(
+                'module', {}).get('name')
+            self.discovered = self.layout(
+                module or normalized_name(project.get('name', '')))
+        return dict((k, v) for k, v in kwargs.items() if v is not None)
+
+    def dynamic_kwargs(self, project):
+        """Resolves fields marked as dynamic from [tool.setuptools.dynamic],
+        fields setuptools takes from setup.py are left out. Fields other
+        build backends compute are unresolved.
+        """
+        kwargs = {}
+        dynamic = self.data.get('tool', {}).get('setuptools', {}).get(
+            'dynamic', {})
+        for field in project.get('dynamic', []):
+            if field not in PYPROJECT_DYNAMIC_FIELDS:
+                continue
+            option = PYPROJECT_DYNAMIC_FIELDS[field]
+            if not self.setuptools_backend:
+                self.unresolved.append(option)
+                continue
+            directive = dynamic.get(field)
+            if not directive:
+                continue
+            if option in ('install_requires', 'long_description',
+                          'description', 'classifiers') and \
+                    'file' in directive:
+                content = self.read_files(parse_list(directive['file']),
+                                          option)
+                if option == 'install_requires':
+                    content = content and requirements_list(content)
+                elif option == 'classifiers':
+                    content = content and parse_list(content + '\n')
+                kwargs[option] = content
+            else:
+                self.unresolved.append(option)
+        return kwargs
+
+    def setuptools_layout(self):
+        """Returns packages and py_modules configured in [tool.setuptools]
+        or found the way setuptools automatic discovery does.
+        """
+        options = self.data.get('tool', {}).get('setuptools', {})
+        kwargs = {}
+        if 'py-modules' in options:
+            kwargs['py_modules'] = options['py-modules']
+        packages = options.get('packages')
+        if isinstance(packages, list):
+            kwargs['packages'] = packages
+        elif isinstance(packages, dict) and 'find' in packages:
+            find = packages['find']
+            kwargs['packages'] = find_packages(
+                self.files, (find.get('where') or ['.'])[0],
+                find.get('exclude', ()), find.get('include', ('*',)))
+        if kwargs or packages is not None:
+            return kwargs
+
+        # src layout, then flat layout
+        packages = find_packages(self.files, 'src')
+        if not packages:
+            excluded = [p for name in settings.AUTO_DISCOVERY_EXCLUDED_PACKAGES
+                        for p in (name, name + '.*')]
+            packages = find_packages(self.files, exclude=excluded)
+        if packages:
+            self.discovered = {'packages': packages}
+        else:
+            self.discovered = {'py_modules': sorted(
+                f[:-len('.py')] for f in self.files
+                if '/' not in f and f.endswith('.py') and f[:-len('.py')]
+                not in settings.AUTO_DISCOVERY_EXCLUDED_MODULES)}
+        return {}
+
+    def poetry_kwargs(self, poetry):
+        kwargs = {}
+        for key, option in (('description', 'description'),
+                            ('license', 'license'),
+                            ('homepage', 'url'),
+                            ('classifiers', 'classifiers')):
+            if key in poetry:
+                kwargs[option] = poetry[key]
+        if 'url' not in kwargs and 'repository' in poetry:
+            kwargs['url'] = poetry['repository']
+
+        readme = poetry.get('readme')
+        if readme:
+            kwargs['long_description'] = self.read_files(
+                readme if isinstance(readme, list) else [readme],
+                'long_description')
+
+        requires, optional = [], {}
+        for name, value in poetry.get('dependencies', {}).items():
+            if name.lower() == 'python':
+                continue
+            requirement = poetry_requirement(name, value)
+            if isinstance(value, dict) and value.get('optional'):
+                optional[name.lower()] = requirement
+            else:
+                requires.append(requirement)
+        kwargs['install_requires'] = requires
+        kwargs['extras_require'] = dict(
+            (extra, [optional.get(n.lower(), n) for n in names])
+            for extra, names in poetry.get('extras', {}).items())
+
+        entry_points = dict(
+            (group, ['{0} = {1}'.format(k, v) for k, v in points.items()])
+            for group, points in poetry.get('plugins', {}).items())
+        scripts = [
+            '{0} = {1}'.format(k, v if isinstance(v, str) else
+                               v.get('callable', v.get('reference')))
+            for k, v in poetry.get('scripts', {}).items()]
+        if scripts:
+            entry_points['console_scripts'] = scripts
+        if entry_points:
+            kwargs['entry_points'] = entry_points
+
+        if 'packages' in poetry:
+            packages = []
+            for package in poetry['packages']:
+                where = package.get('from', '.')
+                include = package['include']
+                if include.endswith('.py'):
+                    kwargs.setdefault('py_modules', []).append(include[:-3])
+                else:
+                    packages += find_packages(self.files, where, include=[
+                        include.replace('/', '.'),
+                        include.replace('/', '.') + '.*'])
+            kwargs['packages'] = packages
+        else:
+            self.discovered = self.layout(
+                normalized_name(poetry.get('name', '')))
+        return dict((k, v) for k, v in kwargs.items() if v is not None)
+
+    def flit_kwargs(self, flit):
+        metadata = flit['metadata']
+        kwargs = {}
+        for key, option in (('home-page', 'url'),
+                            ('license', 'license'),
+                            ('classifiers', 'classifiers'),
+                            ('requires', 'install_requires'),
+                            ('requires-extra', 'extras_require')):
+            if key in metadata:
+                kwargs[option] = metadata[key]
+        if 'description-file' in metadata:
+            kwargs['long_description'] = self.read_files(
+                [metadata['description-file']], 'long_description')
+
+        entry_points = dict(
+            (group, ['{0} = {1}'.format(k, v) for k, v in points.items()])
+            for group, points in flit.get('entrypoints', {}).items())
+        if 'scripts' in flit:
+            entry_points['console_scripts'] = [
+                '{0} = {1}'.format(k, v) for k, v in flit['scripts'].items()]
+        if entry_points:
+            kwargs['entry_points'] = entry_points
+
+        self.discovered = self.layout(metadata.get('module', ''),
+                                      where=('.', 'src'))
+        return dict((k, v) for k, v in kwargs.items() if v is not None)
@@ -28,3 +28,15 @@ class ExtractionError(BaseException):
 
 class MissingUrlException(BaseException):
     pass
+
+
+class WorkerError(BaseException):
+    pass
+
+
+class UnresolvableError(BaseException):
+    pass
+
+
+class DigestMismatchException(BaseException):
+    pass
@@ -0,0 +1,91 @@
+"""Long-lived worker running setup.py scripts, used by WorkerModuleRunner.
+
+The worker is started once per interpreter with setuptools and the
+extract_dist command already imported. It reads requests (one json object
+per line) from stdin, runs the requested setup.py in a forked child and
+writes the exit status and captured output of the child to stdout.
+
+This module is executed by the interpreters the metadata are extracted
+with, it has to stay compatible with both Python 2 and 3.
+"""
+import json
+import os
+import runpy
+import sys
+import tempfile
+import traceback
+
+# imported once here to be shared with all the forked children, the names
+# themselves are never used
+import setuptools  # noqa: F401
+from pyp2rpm.command import extract_dist  # noqa: F401
+
+
+def read_output(output):
+    output.seek(0)
+    return output.read().decode('utf-8', 'replace')
+
+
+def run_setup_py(setup_py, args):
+    """Runs setup.py with given arguments in a forked child process.
+    Args:
+        setup_py: full path of the setup.py script
+        args: list of command line arguments for the script
+    Returns:
+        dictionary with returncode, stdout and stderr of the child
+    """
+    stdout = tempfile.TemporaryFile()
+    stderr = tempfile.TemporaryFile()
+    pid = os.fork()
+    if pid == 0:
+        returncode = 0
+        try:
+            devnull = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(devnull, 0)
+            os.dup2(stdout.fileno(), 1)
+            os.dup2(stderr.fileno(), 2)
+            dirname = os.path.dirname(setup_py)
+            os.chdir(dirname)
+            sys.path.insert(0, dirname)
+            sys.argv = [os.path.basename(setup_py)] + list(args)
+            runpy.run_path(setup_py, run_name='__main__')
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                if not isinstance(e.code, int):
+                    sys.stderr.write('{0}\n'.format(e.code))
+                returncode = e.code if isinstance(e.code, int) else 1
+        except BaseException:
+            traceback.print_exc()
+            returncode = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(returncode)
+
+    status = os.waitpid(pid, 0)[1]
+    if os.WIFEXITED(status):
+        returncode = os.WEXITSTATUS(status)
+    else:
+        returncode = -os.WTERMSIG(status)
+    try:
+        return {'returncode': returncode,
+                'stdout': read_output(stdout),
+                'stderr': read_output(stderr)}
+    finally:
+        stdout.close()
+        stderr.close()
+
+
+def main():
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            break
+        request = json.loads(line)
+        response = run_setup_py(request['setup_py'], request['args'])
+        sys.stdout.write(json.dumps(response) + '\n')
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from pyp2rpm import settings
+from pyp2rpm import version
+
+logger = logging.getLogger(__name__)
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Returns hex sha256 digest of content of the file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionCache(object):
+    """Persistent cache of metadata extracted from archives.
+
+    Every entry is stored as a JSON file named by hash of its key. Entries
+    are written atomically (to a temporary file which is then renamed), so
+    that concurrent runs never read a partially written entry. Total size
+    of the entries is kept under max_size bytes, least recently used
+    entries (by modification time, which is updated on every hit) are
+    evicted first.
+    """
+
+    suffix = '.json'
+
+    def __init__(self, directory=settings.EXTRACTION_CACHE_DIR,
+                 max_size=settings.EXTRACTION_CACHE_SIZE, refresh=False):
+        """
+        Args:
+            directory: directory to store the entries in
+            max_size: maximum total size of the entries in bytes
+            refresh: whether to ignore existing entries, fresh results are
+                still stored
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.refresh = refresh
+
+    @staticmethod
+    def key(local_file, *args):
+        """Returns key of the extraction results of the archive.
+        Args:
+            local_file: path to the archive
+            args: all the other arguments the results depend on
+        """
+        return ExtractionCache.digest_key(file_sha256(local_file), *args)
+
+    @staticmethod
+    def digest_key(sha256, *args):
+        """Returns key of the extraction results of the archive with given
+        sha256 hex digest, for archives hashed already.
+        """
+        key = [sha256, version.version] + [str(arg) for arg in args]
+        return hashlib.sha256('\0'.join(key).encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key):
+        """Returns cached data dictionary or None, if there is no such or
+        the cache is refreshed.
+        """
+        if self.refresh:
+            return None
+        path = self.path(key)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            # mark the entry as the most recently used
+            os.utime(path, None)
+        except (IOError, OSError):
+            return None
+        except ValueError:
+            logger.warning('Corrupted extraction cache entry {0}.'.format(
+                path))
+            return None
+        logger.info('Using cached extraction results {0}.'.format(path))
+        return data
+
+    def put(self, key, data):
+        """Atomically stores data dictionary and evicts the least recently
+        used entries if the cache is over its size limit.
+        """
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory,
+                                             prefix='.tmp-')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(data, f, sort_keys=True)
+                os.rename(temp_path, self.path(key))
+            except BaseException:
+                os.remove(temp_path)
+                raise
+            self.evict()
+        except (IOError, OSError, TypeError, ValueError):
+            logger.warning('Failed to store extraction results in cache '
+                           '{0}.'.format(self.directory), exc_info=True)
+
+    def entries(self):
+        """Returns list of (modification time, size, path) of the entries,
+        least recently used first.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix) or name.startswith('.'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # removed by concurrent run
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def evict(self):
+        entries = self.entries()
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in entries:
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            size -= entry_size
+            logger.debug('Evicted extraction cache entry {0}.'.format(path))
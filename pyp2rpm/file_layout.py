@@ -0,0 +1,123 @@
+"""Layout of files a package installs: its packages, modules and scripts,
+found out either from content of a virtualenv or from RECORD of a wheel.
+"""
+import glob
+import logging
+import os
+import subprocess
+
+from pyp2rpm.settings import MODULE_SUFFIXES
+
+logger = logging.getLogger(__name__)
+
+
+def site_packages_filter(site_packages_list):
+    '''Removes wheel .dist-info files'''
+    return set([x for x in site_packages_list if not x.endswith(
+        ('.egg-info', '.dist-info', '.pth', '__pycache__', '.pyc'))])
+
+
+def scripts_filter(scripts):
+    '''
+    Removes .pyc files and __pycache__ from scripts
+    '''
+    return [x for x in scripts if not x.split('.')[-1] == 'pyc' and
+            not x == '__pycache__']
+
+
+def layout_data(bindir, lib_sitepackages):
+    '''
+    Makes packages, py_modules, scripts and has_pth data from names of files
+    a package installs to bin/ and site-packages/
+    '''
+    data = {}
+    data['has_pth'] = any([x for x in lib_sitepackages if x.endswith('.pth')])
+
+    site_packages = site_packages_filter(lib_sitepackages)
+    data['packages'] = sorted(
+        [p for p in site_packages if not p.endswith(MODULE_SUFFIXES)])
+    data['py_modules'] = sorted(set(
+        [os.path.splitext(m)[0] for m in site_packages - set(
+            data['packages'])]))
+    data['scripts'] = scripts_filter(sorted(bindir))
+    return data
+
+
+def is_entry_point_wrapper(script, entry_points):
+    '''
+    Finds out whether the script is wrapper of an entry point setuptools
+    generates for Windows (EP.exe, EP-script.py, EP.pya), installer
+    skips them
+    '''
+    for suffix in ('.exe', '-script.py', '.pya'):
+        if script.lower().endswith(suffix):
+            script = script[:-len(suffix)]
+            break
+    return script in entry_points
+
+
+def wheel_dirs_content(record_paths, entry_points):
+    '''
+    Names of files installation of a wheel creates in bin/ and site-packages/
+    Args:
+        record_paths: paths of files listed in RECORD of the wheel
+        entry_points: dict of entry point groups of the wheel
+    Returns:
+        tuple (set of names in bin/, set of names in site-packages/)
+    '''
+    # installer generates wrappers of entry points
+    bindir = set(entry_point.partition('=')[0].strip()
+                 for group in ('console_scripts', 'gui_scripts')
+                 for entry_point in entry_points.get(group, []))
+    lib_sitepackages = set()
+    for path in record_paths:
+        path = path.split('/')
+        if not path[0].endswith('.data'):
+            lib_sitepackages.add(path[0])
+        elif len(path) < 3:
+            # <name>.data/<scheme>/... only
+            continue
+        elif path[1] == 'scripts':
+            if not is_entry_point_wrapper(path[-1], bindir):
+                bindir.add(path[-1])
+        elif path[1] in ('purelib', 'platlib'):
+            lib_sitepackages.add(path[2])
+        elif path[1] == 'data':
+            # data_files, paths are relative to the prefix
+            if len(path) == 4 and path[2] == 'bin':
+                bindir.add(path[3])
+            elif len(path) > 5 and path[2] in ('lib', 'lib64') and \
+                    path[4] == 'site-packages':
+                lib_sitepackages.add(path[5])
+    return bindir, lib_sitepackages
+
+
+def build_wheel(source_dir, wheel_dir, python):
+    '''
+    Builds wheel of the project by pip of given interpreter, with build
+    dependencies of the interpreter first (no need to download them) and
+    in isolated build environment if that fails.
+    Args:
+        source_dir: directory of the project
+        wheel_dir: directory to store the wheel in
+        python: interpreter to build the wheel with
+    Returns:
+        path to the wheel or None if the build failed
+    '''
+    command = [python, '-m', 'pip', 'wheel', '--no-deps',
+               '--disable-pip-version-check', '-q', '-w', wheel_dir]
+    for options in (['--no-build-isolation'], []):
+        try:
+            with open(os.devnull, 'w') as devnull:
+                subprocess.check_call(command + options + [source_dir],
+                                      stdout=devnull, stderr=devnull)
+        except (OSError, subprocess.CalledProcessError):
+            logger.debug('Failed to build wheel with: {0}'.format(
+                ' '.join(command + options)))
+            continue
+        wheels = glob.glob(os.path.join(wheel_dir, '*.whl'))
+        if wheels:
+            logger.info('Built wheel {0}.'.format(wheels[0]))
+            return wheels[0]
+    logger.error('Failed to build wheel of {0}.'.format(source_dir))
+    return None
@@ -10,6 +10,16 @@ def name_for_python_version(name, version, default_number=False):
         name, version, default_number, True)
 
 
+def deps_for_python_version(deps, version, base_version):
+    """Returns the dependencies as they are rendered for the python version,
+    with versioned names, sphinx dependencies are left out for other than
+    the base python version.
+    """
+    return [[dep[0], name_for_python_version(dep[1], version, True)] +
+            list(dep[2:]) for dep in deps
+            if version == base_version or 'sphinx' not in dep[1]]
+
+
 def script_name_for_python_version(name, version, minor=False,
                                    default_number=True):
     if not default_number:
@@ -127,6 +137,7 @@ def rpm_version(version, use_macro=True):
 
 
 __all__ = [name_for_python_version,
+           deps_for_python_version,
            script_name_for_python_version,
            sitedir_for_python_version,
            python_bin_for_python_version,
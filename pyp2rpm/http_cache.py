@@ -0,0 +1,126 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+from pyp2rpm import settings
+from pyp2rpm.extraction_cache import ExtractionCache
+
+logger = logging.getLogger(__name__)
+
+
+class CachedResponse(object):
+    """Response stored in HTTPCache, its body is decompressed only when
+    it is read.
+    """
+
+    def __init__(self, path, url, etag, last_modified, age):
+        self.path = path
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.age = age
+
+    @property
+    def validators(self):
+        """Headers of conditional request revalidating the response."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def read(self):
+        with gzip.open(self.path, 'rb') as f:
+            f.readline()
+            return f.read()
+
+
+class HTTPCache(ExtractionCache):
+    """Persistent cache of HTTP responses keyed by URL.
+
+    Every entry is a gzip compressed file, its first line holds JSON with
+    the URL, ETag and Last-Modified headers of the response, the body
+    follows. Modification time of the entry is the time the response was
+    last fetched or revalidated. Responses younger than ttl seconds are
+    reused as they are, older ones are revalidated by conditional requests.
+    Writes and eviction of the least recently validated entries work as in
+    ExtractionCache.
+    """
+
+    suffix = '.gz'
+
+    def __init__(self, directory=settings.HTTP_CACHE_DIR,
+                 max_size=settings.HTTP_CACHE_SIZE,
+                 ttl=settings.HTTP_CACHE_TTL, refresh=False):
+        """
+        Args:
+            directory: directory to store the entries in
+            max_size: maximum total size of the entries in bytes
+            ttl: number of seconds a response is reused without
+                revalidation
+            refresh: whether to revalidate all the responses
+        """
+        super(HTTPCache, self).__init__(directory, max_size, refresh)
+        self.ttl = ttl
+
+    @staticmethod
+    def key(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def get(self, url):
+        """Returns CachedResponse of the url or None."""
+        path = self.path(self.key(url))
+        try:
+            age = time.time() - os.stat(path).st_mtime
+            with gzip.open(path, 'rb') as f:
+                headers = json.loads(f.readline().decode('utf-8'))
+        except (IOError, OSError):
+            return None
+        except (EOFError, ValueError):
+            logger.warning('Corrupted HTTP cache entry {0}.'.format(path))
+            return None
+        if headers.get('url') != url:
+            return None
+        return CachedResponse(path, url, headers.get('etag'),
+                              headers.get('last_modified'), age)
+
+    def fresh(self, response):
+        """Whether the response can be used without revalidation."""
+        return not self.refresh and 0 <= response.age < self.ttl
+
+    def put(self, url, etag, last_modified, body):
+        """Atomically stores body of the response and evicts the least
+        recently validated entries if the cache is over its size limit.
+        """
+        headers = {'url': url, 'etag': etag, 'last_modified': last_modified}
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory,
+                                             prefix='.tmp-')
+            try:
+                with os.fdopen(fd, 'wb') as raw:
+                    with gzip.GzipFile(fileobj=raw, mode='wb',
+                                       compresslevel=6) as f:
+                        f.write(json.dumps(headers).encode('utf-8') + b'\n')
+                        f.write(body)
+                os.rename(temp_path, self.path(self.key(url)))
+            except BaseException:
+                os.remove(temp_path)
+                raise
+            self.evict()
+        except (IOError, OSError):
+            logger.warning('Failed to store response of {0} in cache '
+                           '{1}.'.format(url, self.directory), exc_info=True)
+
+    def revalidated(self, response):
+        """Marks the response as fetched now."""
+        try:
+            os.utime(response.path, None)
+        except OSError:
+            pass
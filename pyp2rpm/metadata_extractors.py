@@ -3,9 +3,10 @@ import os
 import sys
 import json
 import re
-import tempfile
 import shutil
+import functools
 import glob
+import pprint
 import textwrap
 from abc import ABCMeta
 try:
@@ -15,12 +16,20 @@ except AttributeError:
 
 import pyp2rpm.exceptions as exc
 import pyp2rpm.logger
-from pyp2rpm import archive
+from pyp2rpm import file_layout
 from pyp2rpm.dependency_parser import (deps_from_pyp_format,
                                        deps_from_pydit_json)
 from pyp2rpm.package_data import PackageData
-from pyp2rpm.package_getters import get_url
-from pyp2rpm.module_runners import SubprocessModuleRunner
+from pyp2rpm.package_getters import get_url, source_url
+from pyp2rpm.setup_py_parser import (SetupPyParser, SETUP_KWARGS,
+                                     metadata_from_setup_kwargs)
+from pyp2rpm.core_metadata import (CoreMetadata, egg_info_kwargs,
+                                   pydist_requirement, split_requirement)
+from pyp2rpm.declarative_config import SetupCfgParser, PyprojectParser
+from pyp2rpm.module_runners import (SubprocessModuleRunner,
+                                    WorkerModuleRunner)
+from pyp2rpm.stages import StageGraph
+from pyp2rpm.workspace import Workspace
 from pyp2rpm import settings
 try:
     from pyp2rpm import virtualenv
@@ -29,6 +38,9 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# PackageData fields set from arguments of the extractor
+PACKAGE_DATA_ARGS = ['local_file', 'name', 'srcname', 'pkg_name', 'version']
+
 
 def cut_to_length(text, length, delim):
     """Shorten given text on first delimiter after given number
@@ -86,68 +98,6 @@ def versions_from_trove(trove):
         set([v for v in versions if v.replace('.', '', 1).isdigit()]))
 
 
-def pypi_metadata_extension(extraction_fce):
-    """Extracts data from PyPI and merges them with data from extraction
-    method.
-    """
-
-    def inner(self, client=None):
-        data = extraction_fce(self)
-        if client is None:
-            logger.warning("Client is None, it was probably disabled")
-            data.update_attr('source0', self.archive.name)
-            return data
-        try:
-            release_data = client.release_data(self.name, self.version)
-        except BaseException:
-            logger.warning("Some kind of error while communicating with "
-                           "client: {0}.".format(client), exc_info=True)
-            return data
-        try:
-            url, md5_digest = get_url(client, self.name, self.version)
-        except exc.MissingUrlException:
-            url, md5_digest = ('FAILED TO EXTRACT FROM PYPI',
-                               'FAILED TO EXTRACT FROM PYPI')
-        data_dict = {'source0': url, 'md5': md5_digest}
-
-        for data_field in settings.PYPI_USABLE_DATA:
-            data_dict[data_field] = release_data.get(data_field, '')
-
-        # we usually get better license representation from trove classifiers
-        data_dict["license"] = license_from_trove(release_data.get(
-            'classifiers', ''))
-        data.set_from(data_dict, update=True)
-        return data
-    return inner
-
-
-def venv_metadata_extension(extraction_fce):
-    """Extracts specific metadata from virtualenv object, merges them with data
-    from given extraction method.
-    """
-
-    def inner(self):
-        data = extraction_fce(self)
-        if virtualenv is None or not self.venv:
-            logger.debug("Skipping virtualenv metadata extraction.")
-            return data
-
-        temp_dir = tempfile.mkdtemp()
-        try:
-            extractor = virtualenv.VirtualEnv(self.local_file,
-                                              temp_dir,
-                                              self.name_convertor,
-                                              self.base_python_version)
-            data.set_from(extractor.get_venv_data, update=True)
-        except exc.VirtualenvFailException as e:
-            logger.error("{}, skipping virtualenv metadata extraction.".format(
-                e))
-        finally:
-            shutil.rmtree(temp_dir)
-        return data
-    return inner
-
-
 def process_description(description_fce):
     """Removes special character delimiters, titles
     and wraps paragraphs.
@@ -180,9 +130,9 @@ class LocalMetadataExtractor(object):
     def __init__(self, local_file, name, name_convertor, version,
                  rpm_name=None, venv=True, distro=None,
                  base_python_version=None,
-                 metadata_extension=False):
+                 metadata_extension=False, cache=None, wheel_layout=False,
+                 workspace=None, sha256=None):
         self.local_file = local_file
-        self.archive = archive.Archive(local_file)
         self.name = name
         self.name_convertor = name_convertor
         self.version = version
@@ -191,7 +141,13 @@ class LocalMetadataExtractor(object):
         self.distro = distro
         self.base_python_version = base_python_version
         self.metadata_extension = metadata_extension
+        self.cache = cache
+        self.wheel_layout = wheel_layout
         self.unsupported_version = None
+        self.workspace = workspace or Workspace()
+        # digest of the archive, if its getter computed it already
+        self.sha256 = sha256
+        self._cache_key = None
 
     def name_convert_deps_list(self, deps_list):
         for dep in deps_list:
@@ -202,7 +158,48 @@ class LocalMetadataExtractor(object):
 
     @property
     def venv_extraction_disabled(self):
-        return virtualenv is None or not self.venv
+        return not self.venv or (virtualenv is None and not self.wheel_layout)
+
+    @property
+    def archive(self):
+        """Archive of the package borrowed from the workspace, opened only
+        once per conversion.
+        """
+        return self.workspace.archive(self.local_file)
+
+    def cleanup(self):
+        """Removes the workspace."""
+        self.workspace.cleanup()
+
+    @property
+    def installable(self):
+        """Path to install the package to virtualenv from."""
+        return self.local_file
+
+    @property
+    def built_wheel(self):
+        """Path to wheel of the package or None if there is none."""
+        return None
+
+    @property
+    def wheel_layout_data(self):
+        """Returns packages, py_modules, scripts and has_pth of the package
+        read from RECORD and entry points of its wheel, the same data
+        installation to virtualenv would give.
+        Returns:
+            dictionary of the data or None if there is no wheel
+        """
+        if self.built_wheel is None:
+            return None
+        wheel = self.workspace.archive(self.built_wheel)
+        with wheel:
+            dirs_content = file_layout.wheel_dirs_content(
+                wheel.record_paths, wheel.wheel_entry_points)
+        data = file_layout.layout_data(*dirs_content)
+        logger.debug('Data from RECORD of wheel {0}:'.format(
+            self.built_wheel))
+        logger.debug(pprint.pformat(data))
+        return data
 
     @property
     def versions_from_archive(self):
@@ -245,14 +242,9 @@ class LocalMetadataExtractor(object):
         if self.rpm_name or self.name.startswith(('python-', 'Python-')):
             return self.name_convertor.base_name(self.rpm_name or self.name)
 
-    @pypi_metadata_extension
-    @venv_metadata_extension
-    def extract_data(self):
-        """Extracts data from archive.
-        Returns:
-            PackageData object containing the extracted data.
-        """
-        data = PackageData(
+    def new_package_data(self):
+        """Returns PackageData object with data given to the extractor."""
+        return PackageData(
             local_file=self.local_file,
             name=self.name,
             pkg_name=self.rpm_name or self.name_convertor.rpm_name(
@@ -260,6 +252,55 @@ class LocalMetadataExtractor(object):
             version=self.version,
             srcname=self.srcname)
 
+    def extract_data(self, client=None, digests=None):
+        """Extracts data from archive, virtualenv (or wheel) and PyPI.
+        Independent stages of the extraction run in parallel, their results
+        are always merged in this order. Data extracted from the package file
+        are taken from the cache, if there are any.
+        Args:
+            client: PyPI client or None if PyPI is not used
+            digests: digests of the package file downloaded from PyPI
+        Returns:
+            PackageData object containing the extracted data.
+        """
+        data = self.cached_data
+        graph = StageGraph()
+        graph.add('pypi', functools.partial(self.pypi_data, client, digests))
+        if data is None:
+            self.add_extraction_stages(graph)
+        results = graph.run()
+
+        if data is None:
+            data = results['archive']
+            if results.get('layout') is not None:
+                data.set_from(results['layout'], update=True)
+            self.store_cached_data(data)
+
+        if results['pypi'] is None:
+            data.update_attr('source0', os.path.basename(self.local_file))
+        else:
+            data.set_from(results['pypi'], update=True)
+        return data
+
+    def add_extraction_stages(self, graph):
+        """Adds stages extracting data from the package file to the graph.
+        Stages running in parallel never use the archive or the source tree
+        at the same time, layout is found out once the archive stage (which
+        may run setup.py in the source tree extracted only partially) is
+        finished.
+        """
+        graph.add('archive', self.archive_data)
+        if not self.venv_extraction_disabled:
+            graph.add('layout', lambda data: self.layout_data(
+                self.installable), requires=['archive'])
+
+    def archive_data(self):
+        """Extracts data from archive.
+        Returns:
+            PackageData object containing the extracted data.
+        """
+        data = self.new_package_data()
+
         with self.archive:
             data.set_from(self.data_from_archive)
 
@@ -271,6 +312,120 @@ class LocalMetadataExtractor(object):
 
         return data
 
+    def layout_data(self, installable):
+        """Extracts packages, py_modules, scripts and has_pth from virtualenv
+        the package is installed to. In wheel layout mode the data are read
+        from wheel of the package instead, virtualenv is used only if the
+        wheel can't be built.
+        Args:
+            installable: path to install the package from
+        Returns:
+            dictionary of the data or None if the extraction failed
+        """
+        if self.wheel_layout:
+            data = self.wheel_layout_data
+            if data is not None:
+                return data
+            logger.info("Falling back to virtualenv metadata extraction.")
+        if virtualenv is None:
+            logger.debug("Skipping virtualenv metadata extraction.")
+            return None
+
+        pool = virtualenv.VenvPool.for_python(
+            virtualenv.python_command(self.base_python_version))
+        temp_dir = pool.mkdtemp() if pool else self.workspace.mkdtemp()
+        try:
+            extractor = virtualenv.VirtualEnv(installable,
+                                              temp_dir,
+                                              self.name_convertor,
+                                              self.base_python_version,
+                                              pool)
+            return extractor.get_venv_data
+        except exc.VirtualenvFailException as e:
+            logger.error("{}, skipping virtualenv metadata extraction.".format(
+                e))
+        finally:
+            shutil.rmtree(temp_dir)
+        return None
+
+    def pypi_data(self, client, digests=None):
+        """Fetches data of the release from PyPI, URL and md5 digest of
+        package file downloaded from PyPI are not fetched again.
+        Args:
+            client: PyPI client or None if PyPI is not used
+            digests: digests of the package file downloaded from PyPI, the
+                package file is a local one if there are none
+        Returns:
+            dictionary of the data, empty if communication with the client
+            fails, or None if the client is disabled
+        """
+        if client is None:
+            logger.warning("Client is None, it was probably disabled")
+            return None
+        try:
+            release_data = client.release_data(self.name, self.version)
+        except BaseException:
+            logger.warning("Some kind of error while communicating with "
+                           "client: {0}.".format(client), exc_info=True)
+            return {}
+        if digests:
+            url = source_url(self.name, os.path.basename(self.local_file))
+            md5_digest = digests.get('md5')
+        else:
+            try:
+                url, md5_digest = get_url(client, self.name, self.version)
+            except exc.MissingUrlException:
+                url, md5_digest = ('FAILED TO EXTRACT FROM PYPI',
+                                   'FAILED TO EXTRACT FROM PYPI')
+        data_dict = {'source0': url, 'md5': md5_digest}
+
+        for data_field in settings.PYPI_USABLE_DATA:
+            data_dict[data_field] = release_data.get(data_field, '')
+
+        # we usually get better license representation from trove classifiers
+        data_dict["license"] = license_from_trove(release_data.get(
+            'classifiers', ''))
+        return data_dict
+
+    @property
+    def cache_key(self):
+        """Key of the extracted data in the cache, the archive is hashed
+        only once per extractor and not at all if its digest is known.
+        """
+        if self._cache_key is None:
+            args = (self.__class__.__name__, self.name,
+                    self.base_python_version, self.distro,
+                    not self.venv_extraction_disabled, self.wheel_layout,
+                    self.name_convertor.cache_key)
+            if self.sha256:
+                self._cache_key = self.cache.digest_key(self.sha256, *args)
+            else:
+                self._cache_key = self.cache.key(self.local_file, *args)
+        return self._cache_key
+
+    @property
+    def cached_data(self):
+        """PackageData object with data extracted from the package file
+        taken from the cache or None if there are no such.
+        """
+        if self.cache is None:
+            return None
+        cached = self.cache.get(self.cache_key)
+        if cached is None:
+            return None
+        data = self.new_package_data()
+        data.set_from(cached)
+        return data
+
+    def store_cached_data(self, data):
+        """Stores extracted data in the cache, data derived from arguments
+        of the extractor are never cached.
+        """
+        if self.cache is not None:
+            self.cache.put(self.cache_key, dict(
+                (k, v) for k, v in data.data.items()
+                if k not in PACKAGE_DATA_ARGS))
+
     @staticmethod
     def separate_license_files(doc_files):
         other = [doc for doc in doc_files if all(s not in doc.lower() for s in
@@ -321,26 +476,255 @@ class SetupPyMetadataExtractor(LocalMetadataExtractor):
 
     def __init__(self, *args, **kwargs):
         super(SetupPyMetadataExtractor, self).__init__(*args, **kwargs)
+        self._metadata = None
+        self._installable = None
+        self._built_wheel = None
 
-        temp_dir = tempfile.mkdtemp()
-        try:
-            with self.archive as package_archive:
-                package_archive.extract_all(directory=temp_dir)
-                self.metadata = self._get_metadata(temp_dir)
-        finally:
-            shutil.rmtree(temp_dir)
+    @property
+    def metadata(self):
+        """Metadata of setup.py, resolved on first access, so that
+        setup.py is never run when extracted data are taken from cache.
+        """
+        if self._metadata is None:
+            with self.archive:
+                self._metadata = (self.static_metadata or
+                                  self.extract_metadata())
+        return self._metadata
+
+    @property
+    def static_metadata(self):
+        """Resolves metadata from setup.py, setup.cfg and pyproject.toml
+        without running any code.
+        Returns:
+            metadata dictionary or None, if the metadata couldn't be
+            resolved completely
+        """
+        top_directory = self.archive.top_directory
+        if self.archive.index is None or not top_directory:
+            return None
+        prefix = top_directory + '/'
+
+        def read_file(path):
+            return self.archive.get_content_of_file(
+                prefix + path, full_path=True, raw=True)
+
+        files = [member.name[len(prefix):]
+                 for member in self.archive.index.files
+                 if member.name.startswith(prefix)]
+        setup_py = read_file('setup.py')
+        parsers = []
+        if setup_py is not None:
+            parsers.append(SetupPyParser(setup_py, read_file, files))
+        setup_cfg = read_file('setup.cfg')
+        if setup_cfg is not None:
+            parsers.append(SetupCfgParser(
+                setup_cfg.decode('utf-8', 'replace'), read_file, files))
+        pyproject = read_file('pyproject.toml')
+        if pyproject is not None:
+            # tables of other build backends are used only if there is
+            # no setup.py
+            parsers.append(PyprojectParser(
+                pyproject.decode('utf-8', 'replace'), read_file, files,
+                tool_tables=setup_py is None))
+
+        # setuptools applies options of setup.cfg only to arguments setup()
+        # was not given (or given empty), static fields of pyproject.toml
+        # override both
+        kwargs, discovered, unresolved = {}, {}, set()
+        for parser in parsers:
+            declared = parser.setup_kwargs
+            parser_unresolved = set()
+            for argument in parser.unresolved:
+                # whole file couldn't be resolved (e.g. setup(**kwargs))
+                parser_unresolved.update([argument] if argument in
+                                         SETUP_KWARGS else SETUP_KWARGS)
+            if isinstance(parser, SetupCfgParser):
+                given = set(argument for argument in kwargs
+                            if kwargs[argument]) | unresolved
+                declared = dict((argument, value) for argument, value
+                                in declared.items() if argument not in given)
+                parser_unresolved -= given
+            else:
+                unresolved.difference_update(declared)
+            unresolved.update(parser_unresolved)
+            kwargs.update(declared)
+            discovered.update(getattr(parser, 'discovered', {}))
+        if 'packages' not in kwargs and 'py_modules' not in kwargs:
+            kwargs.update(discovered)
+
+        pkg_info = self.pkg_info_kwargs(read_file, files)
+        if pkg_info:
+            unresolved.difference_update(pkg_info)
+            kwargs.update(pkg_info)
+            if setup_py is not None:
+                logger.info("Metadata taken from PKG-INFO, {0} taken from "
+                            "setup.py.".format(', '.join(
+                                a for a in SETUP_KWARGS if a not in pkg_info)))
+
+        if setup_py is None and not kwargs:
+            return None
+        if unresolved:
+            logger.info("Could not resolve {0} statically, running "
+                        "{1}.".format(', '.join(sorted(unresolved)),
+                                      'setup.py' if setup_py is not None
+                                      else 'the build backend'))
+            return None
+        logger.info("Metadata resolved without running setup.py.")
+        return metadata_from_setup_kwargs(kwargs)
+
+    def pkg_info_kwargs(self, read_file, files):
+        """Returns arguments of setup() taken from PKG-INFO and egg-info
+        files, if PKG-INFO is authoritative (Metadata 2.2 or newer).
+        Dynamic fields are left out.
+        """
+        content = read_file('PKG-INFO')
+        if content is None:
+            return {}
+        pkg_info = CoreMetadata(content.decode('utf-8', 'replace'))
+        if not pkg_info.authoritative:
+            return {}
+        kwargs = egg_info_kwargs(read_file, files)
+        kwargs.update(pkg_info.setup_kwargs)
+        return kwargs
+
+    def extract_metadata(self):
+        """Extracts files setup.py needs to temporary directory and runs
+        extract_dist command on setup.py. Projects without setup.py are
+        built by their build backend and metadata are read from the wheel.
+        Returns:
+            metadata dictionary
+        """
+        if not self.has_setup_py:
+            return self.built_wheel_metadata()
+        directory = self.extract_source_tree(members=self.setup_py_members)
+        metadata = self._run_extract_dist(directory, alternative=False)
+        if metadata is None:
+            logger.info("Failed to extract metadata with selected "
+                        "files only, extracting whole archive.")
+            self.unsupported_version = None
+            self.extract_source_tree()
+            metadata = self._get_metadata(directory)
+        return metadata
+
+    @property
+    def has_setup_py(self):
+        top_directory = self.archive.top_directory
+        return self.archive.has_file('{0}setup.py'.format(
+            top_directory + '/' if top_directory else ''))
+
+    def built_wheel_metadata(self):
+        """Reads metadata from the wheel built from the source tree.
+        Returns:
+            metadata dictionary
+        """
+        if self.built_wheel is None:
+            sys.stderr.write("Failed to build wheel of the project.\n")
+            sys.stderr.write("Check the log for details: {0}\n".format(
+                ', '.join(pyp2rpm.logger.destinations)))
+            raise SystemExit(3)
+        wheel = self.workspace.archive(self.built_wheel)
+        kwargs = wheel.wheel_metadata.setup_kwargs
+        kwargs['entry_points'] = wheel.wheel_entry_points or None
+        paths = []
+        for path in wheel.record_paths:
+            parts = path.split('/')
+            if parts[0].endswith('.data') and parts[1:2] in (['purelib'],
+                                                             ['platlib']):
+                parts = parts[2:]
+            elif parts[0].endswith(('.dist-info', '.data')):
+                continue
+            paths.append('/'.join(parts))
+        kwargs['packages'] = sorted(set(
+            os.path.dirname(path).replace('/', '.') for path in paths
+            if os.path.basename(path) == '__init__.py'))
+        kwargs['py_modules'] = [path[:-len('.py')] for path in paths
+                                if '/' not in path and path.endswith('.py')]
+        return metadata_from_setup_kwargs(kwargs)
+
+    def extract_source_tree(self, members=None):
+        """Extracts given members of the archive (all of them by default)
+        to the workspace, the tree is shared with later stages.
+        Returns:
+            path to the directory the archive was extracted to
+        """
+        with self.archive:
+            return self.workspace.source_tree(self.archive, members)
+
+    @property
+    def installable(self):
+        """Directory of the project in the extracted source tree."""
+        if self._installable is None:
+            with self.archive:
+                self._installable = os.path.join(
+                    self.extract_source_tree(),
+                    self.archive.top_directory or '')
+        return self._installable
+
+    @property
+    def built_wheel(self):
+        """Path to wheel built from the extracted source tree. The wheel is
+        built only once and kept in the workspace for later stages.
+        Returns:
+            path to the wheel or None if the build failed
+        """
+        if self._built_wheel is None:
+            self._built_wheel = file_layout.build_wheel(
+                self.installable, self.workspace.path('wheel'),
+                get_interpreter_path(self.base_python_version)) or False
+        return self._built_wheel or None
+
+    @property
+    def setup_py_members(self):
+        """Returns members of the archive setup.py can plausibly need
+        to run: files in the top directory (setup.py, setup.cfg,
+        pyproject.toml, README, version files...), Python sources, which
+        make up the package directories, egg-info files and files matching
+        settings.SETUP_PY_FILES_RE.
+        Returns:
+            List of TarInfo or ZipInfo objects
+        """
+        top_directory = self.archive.top_directory
+        files_re = re.compile(settings.SETUP_PY_FILES_RE, re.I)
+        return [member.info for member in self.archive.index.files
+                if member.dirname == top_directory or
+                member.suffix in settings.SETUP_PY_SOURCE_SUFFIXES or
+                '.egg-info/' in member.name or
+                files_re.search(member.basename)]
 
     def _get_metadata(self, temp_dir):
-        runner = SubprocessModuleRunner(
+        metadata = self._run_extract_dist(temp_dir)
+        if metadata is None:
+            sys.stderr.write("Failed to extract data from setup.py script.\n")
+            sys.stderr.write("Check the log for details: {0}\n".format(
+                ', '.join(pyp2rpm.logger.destinations)))
+            raise SystemExit(3)
+        return metadata
+
+    def _run_extract_dist(self, temp_dir, alternative=True):
+        """Runs extract_dist command on setup.py found in temp_dir.
+        Args:
+            temp_dir: directory the archive was extracted to
+            alternative: whether to try the alternative Python version if
+                the current one fails
+        Returns:
+            metadata dictionary or None, if the extraction failed
+        """
+        if settings.EXTRACT_DIST_WORKERS:
+            runner_cls = WorkerModuleRunner
+        else:
+            runner_cls = SubprocessModuleRunner
+        runner = runner_cls(
             self.get_setup_py(temp_dir),
             *settings.EXTRACT_DIST_COMMAND_ARGS + ['--stdout'])
 
         current_version = self.base_python_version or str(sys.version_info[0])
         # the version provided with `-b` option or default
-        paths_to_attempt = (get_interpreter_path(version=ver) for ver in (
-            current_version,
-            '2' if current_version == '3' else '3'  # alternative Python version
-        ))
+        versions = [current_version]
+        if alternative:
+            # alternative Python version
+            versions.append('2' if current_version == '3' else '3')
+        paths_to_attempt = (get_interpreter_path(version=ver)
+                            for ver in versions)
         for path in paths_to_attempt:
             try:
                 logger.info("Running extract_dist command with: {0}".format(
@@ -355,11 +739,7 @@ class SetupPyMetadataExtractor(LocalMetadataExtractor):
                         e.msg, e.pos))
                     logger.error("The JSON was: {0}".format(e.doc))
                 self.unsupported_version = current_version
-        else:
-            sys.stderr.write("Failed to extract data from setup.py script.\n")
-            sys.stderr.write("Check the log for details: {0}\n".format(
-                ', '.join(pyp2rpm.logger.destinations)))
-            raise SystemExit(3)
+        return None
 
     def get_setup_py(self, directory):
         try:
@@ -515,8 +895,8 @@ class SetupPyMetadataExtractor(LocalMetadataExtractor):
 
         # search for conf.py in the dirs (TODO: what if more are found?)
         for directory in candidate_dirs:
-            contains_conf_py = self.archive.get_files_re(
-                r'{0}/conf.py$'.format(re.escape(directory)), full_path=True)
+            contains_conf_py = self.archive.has_file(
+                '{0}/conf.py'.format(directory))
             in_tests = 'tests' in directory.split(os.sep)
             if contains_conf_py and not in_tests:
                 return directory
@@ -543,15 +923,26 @@ class SetupPyMetadataExtractor(LocalMetadataExtractor):
 class WheelMetadataExtractor(LocalMetadataExtractor):
     """Class to extract metadata from wheel archive"""
 
+    @property
+    def built_wheel(self):
+        return self.local_file
+
+    @property
+    def core_metadata(self):
+        return self.archive.wheel_metadata
+
     @property
     def json_metadata(self):
+        """Legacy metadata.json, only used for information missing in
+        METADATA.
+        """
         if not hasattr(self, '_json_metadata'):
             self._json_metadata = self.archive.json_wheel_metadata
         return self._json_metadata
 
     def get_requires(self, requires_types):
-        """Extracts requires of given types from metadata file, filter windows
-        specific requires.
+        """Extracts requires of given types from legacy metadata file,
+        filter windows specific requires.
         """
         if not isinstance(requires_types, list):
             requires_types = list(requires_types)
@@ -563,9 +954,25 @@ class WheelMetadataExtractor(LocalMetadataExtractor):
                 extracted_requires.extend(requires['requires'])
         return extracted_requires
 
+    def get_requires_dist(self, test_extras=False):
+        """Extracts Requires-Dist of METADATA file, filter windows specific
+        requires.
+        Args:
+            test_extras: whether to extract requires of test extras
+                (see settings.TEST_EXTRAS) instead of all the other ones
+        """
+        requires = []
+        for requirement in self.core_metadata.get_all('Requires-Dist'):
+            if 'win' in requirement.partition(';')[2]:
+                continue
+            requirement, extra = split_requirement(requirement)
+            if (extra in settings.TEST_EXTRAS) == test_extras:
+                requires.append(pydist_requirement(requirement))
+        return requires
+
     @property
     def runtime_deps(self):
-        run_requires = self.get_requires(['run_requires', 'meta_requires'])
+        run_requires = self.get_requires_dist()
         if 'setuptools' not in run_requires:
             run_requires.append('setuptools')
         return self.name_convert_deps_list(deps_from_pydit_json(run_requires))
@@ -574,8 +981,9 @@ class WheelMetadataExtractor(LocalMetadataExtractor):
     def build_deps(self):
         build_requires = self.get_requires(['build_requires'])
         if self.has_test_suite:
-            build_requires += self.get_requires([
-                'test_requires', 'run_requires'])
+            build_requires += self.get_requires(['test_requires'])
+            build_requires += self.get_requires_dist(test_extras=True)
+            build_requires += self.get_requires_dist()
         if 'setuptools' not in build_requires:
             build_requires.append('setuptools')
         return self.name_convert_deps_list(deps_from_pydit_json(
@@ -587,10 +995,16 @@ class WheelMetadataExtractor(LocalMetadataExtractor):
 
     @property
     def scripts(self):
-        return self.archive.record.get('scripts', [])
+        scripts = list(self.archive.record.get('scripts', []))
+        for script in self.archive.wheel_entry_points.get(
+                'console_scripts', []):
+            scripts.append(script.partition('=')[0].strip())
+        return sorted(set(scripts))
 
     @property
     def home_page(self):
+        if self.core_metadata.url:
+            return self.core_metadata.url
         urls = [url for url in self.json_metadata.get('extensions', {})
                 .get('python.details', {})
                 .get('project_urls', {}).values()]
@@ -600,28 +1014,32 @@ class WheelMetadataExtractor(LocalMetadataExtractor):
     @property
     @process_description
     def description(self):
-        return self.archive.wheel_description()
+        return (self.core_metadata.description or
+                self.archive.wheel_description() or '')
 
     @property
     def summary(self):
-        return self.json_metadata.get('summary', None)
+        return self.core_metadata.get('Summary')
 
     @property
     def classifiers(self):
-        return self.json_metadata.get('classifiers', [])
+        return self.core_metadata.get_all('Classifier')
 
     @property
     def license(self):
-        return self.json_metadata.get('license', None)
+        return self.core_metadata.get('License-Expression',
+                                      self.core_metadata.get('License'))
 
     @property
     def has_test_suite(self):
-        return self.has_test_files or self.json_metadata.get(
-            'test_requires', False) is not False
+        return (self.has_test_files or
+                self.json_metadata.get('test_requires', False) is not False or
+                any(extra in settings.TEST_EXTRAS for extra in
+                    self.core_metadata.get_all('Provides-Extra')))
 
     @property
     def doc_files(self):
-        return (self.json_metadata.get('extensions', {})
-                .get('python.details', {})
-                .get('document_names', {})
-                .values())
+        return list(self.json_metadata.get('extensions', {})
+                    .get('python.details', {})
+                    .get('document_names', {})
+                    .values())
@@ -1,14 +1,16 @@
+import atexit
 import os
 import sys
 import logging
 import json
 import runpy
+import threading
 from subprocess import Popen, PIPE
 from abc import ABCMeta
 
 from pyp2rpm import utils
 from pyp2rpm import main_dir
-from pyp2rpm.exceptions import ExtractionError
+from pyp2rpm.exceptions import ExtractionError, WorkerError
 from pyp2rpm.command import extract_dist
 
 logger = logging.getLogger(__name__)
@@ -53,28 +55,35 @@ class SubprocessModuleRunner(ModuleRunner):
         """Executes the code of the specified module. Deserializes captured
         json data.
         """
-        with utils.ChangeDir(self.dirname):
-            command_list = ['PYTHONPATH=' + main_dir, interpreter,
-                            self.filename] + list(self.args)
-            try:
-                proc = Popen(' '.join(command_list), stdout=PIPE, stderr=PIPE,
-                             shell=True)
-                stream_data = proc.communicate()
-            except Exception as e:
-                logger.error(
-                    "Error {0} while executing extract_dist command.".format(e))
-                raise ExtractionError
-            stream_data = [utils.console_to_str(s) for s in stream_data]
-            if proc.returncode:
-                logger.error(
-                    "Subprocess failed, working dir: {}".format(os.getcwd()))
-                logger.error(
-                    "Subprocess failed, command: {}".format(command_list))
-                logger.error(
-                    "Subprocess failed, stdout: {0[0]}, stderr: {0[1]}".format(
-                        stream_data))
-            self._result = json.loads(stream_data[0].split(
-                "extracted json data:\n")[-1].split("\n")[0])
+        # working directory is given to the subprocess only, so that stages
+        # of a conversion running in other threads are not affected
+        command_list = ['PYTHONPATH=' + main_dir, interpreter,
+                        self.filename] + list(self.args)
+        try:
+            proc = Popen(' '.join(command_list), stdout=PIPE, stderr=PIPE,
+                         shell=True, cwd=self.dirname or None)
+            stream_data = proc.communicate()
+        except Exception as e:
+            logger.error(
+                "Error {0} while executing extract_dist command.".format(e))
+            raise ExtractionError
+        stream_data = [utils.console_to_str(s) for s in stream_data]
+        if proc.returncode:
+            logger.error(
+                "Subprocess failed, working dir: {}".format(
+                    os.path.abspath(self.dirname)))
+            logger.error(
+                "Subprocess failed, command: {}".format(command_list))
+        self.process_output(proc.returncode, *stream_data)
+
+    def process_output(self, returncode, stdout, stderr):
+        """Deserializes json data captured in stdout of the module."""
+        if returncode:
+            logger.error(
+                "Subprocess failed, stdout: {0}, stderr: {1}".format(
+                    stdout, stderr))
+        self._result = json.loads(stdout.split(
+            "extracted json data:\n")[-1].split("\n")[0])
 
     @property
     def results(self):
@@ -82,3 +91,110 @@ class SubprocessModuleRunner(ModuleRunner):
             return self._result
         except AttributeError:
             return None
+
+
+class WorkerModuleRunner(SubprocessModuleRunner):
+    """Runs module in a long-lived worker process of the interpreter taken
+    from worker_pool, falls back to running it in a subprocess if the worker
+    is not available.
+    """
+
+    def run(self, interpreter):
+        """Executes the code of the specified module. Deserializes captured
+        json data.
+        """
+        try:
+            response = worker_pool.get(interpreter).run(
+                os.path.join(os.path.abspath(self.dirname), self.filename),
+                self.args)
+        except WorkerError as e:
+            logger.warning("{0}, running extract_dist command in "
+                           "subprocess.".format(e))
+            return super(WorkerModuleRunner, self).run(interpreter)
+        if response['returncode']:
+            logger.error("Worker of {0} failed to run {1}.".format(
+                interpreter, self.filename))
+        self.process_output(response['returncode'], response['stdout'],
+                            response['stderr'])
+
+
+class ExtractDistWorker(object):
+    """Long-lived process of the given interpreter running
+    pyp2rpm.extract_worker, setuptools and extract_dist command are imported
+    only once at the start of the worker. Every module is run in a forked
+    child of the worker.
+    """
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.lock = threading.Lock()
+        env = dict(os.environ, PYTHONPATH=main_dir)
+        command = [interpreter, '-m', 'pyp2rpm.extract_worker']
+        try:
+            with open(os.devnull, 'w') as devnull:
+                self.proc = Popen(command, stdin=PIPE, stdout=PIPE,
+                                  stderr=devnull, env=env, cwd=main_dir)
+        except OSError as e:
+            raise WorkerError("Failed to start worker of {0}: {1}".format(
+                interpreter, e))
+
+    @property
+    def alive(self):
+        return self.proc.poll() is None
+
+    def run(self, module, args):
+        """Runs module with given arguments in the worker.
+        Args:
+            module: full path of the module to run
+            args: list of command line arguments for the module
+        Returns:
+            dictionary with returncode, stdout and stderr of the module
+        Raises:
+            WorkerError if the worker doesn't respond
+        """
+        request = json.dumps({'setup_py': module, 'args': list(args)})
+        with self.lock:
+            try:
+                self.proc.stdin.write((request + '\n').encode('utf-8'))
+                self.proc.stdin.flush()
+                response = self.proc.stdout.readline()
+            except (IOError, OSError):
+                response = b''
+        if not response:
+            raise WorkerError("Worker of {0} is not responding".format(
+                self.interpreter))
+        return json.loads(response.decode('utf-8'))
+
+    def close(self):
+        if self.alive:
+            self.proc.stdin.close()
+            self.proc.wait()
+
+
+class ExtractDistWorkerPool(object):
+    """Pool of ExtractDistWorker objects, one per interpreter."""
+
+    def __init__(self):
+        self.workers = {}
+        self.lock = threading.Lock()
+
+    def get(self, interpreter):
+        """Returns running worker of the interpreter, starts it if needed."""
+        with self.lock:
+            worker = self.workers.get(interpreter)
+            if worker is None or not worker.alive:
+                logger.debug("Starting extract_dist worker of {0}.".format(
+                    interpreter))
+                worker = ExtractDistWorker(interpreter)
+                self.workers[interpreter] = worker
+        return worker
+
+    def close(self):
+        with self.lock:
+            for worker in self.workers.values():
+                worker.close()
+            self.workers = {}
+
+
+worker_pool = ExtractDistWorkerPool()
+atexit.register(worker_pool.close)
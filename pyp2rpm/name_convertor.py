@@ -1,11 +1,16 @@
+import json
 import logging
+import os
 import re
+import time
 try:
     import dnf
 except ImportError:
     dnf = None
 from pkg_resources import safe_name
 
+from pyp2rpm import repo_index
+from pyp2rpm import repodata
 from pyp2rpm import settings
 
 
@@ -20,6 +25,13 @@ class NameConvertor(object):
         self.reg_start = re.compile(r'^[Pp]ython(\d*|)-(.*)')
         self.reg_end = re.compile(r'(.*)-(python)(\d*|)$')
 
+    @property
+    def cache_key(self):
+        """String identifying results of the convertor in keys of cached
+        extraction results, which contain converted names.
+        """
+        return self.__class__.__name__
+
     @classmethod
     def get_default_py_version(cls):
         try:
@@ -121,12 +133,27 @@ class NameConvertor(object):
 
         return base_name
 
+    def unresolvable(self, names):
+        """Returns sorted list of the names no package in the repositories
+        has, the convertor doesn't know any repositories, so it is empty.
+        """
+        return []
+
+    def similar(self, name):
+        """Returns names of packages in the repositories similar to the
+        name, the most similar first.
+        """
+        return []
+
 
 class NameVariants(object):
     """Class to generate variants of python package name and choose
     most likely correct one.
     """
 
+    variant_names = ['python_ver_name', 'pyver_name', 'name_python_ver',
+                     'raw_name']
+
     def __init__(self, name, version, py_init=True):
         self.name = name
         self.version = version
@@ -136,12 +163,23 @@ class NameVariants(object):
             self.variants_init()
 
     def find_match(self, name):
-        for variant in ['python_ver_name', 'pyver_name', 'name_python_ver',
-                        'raw_name']:
+        for variant in self.variant_names:
             # iterates over all variants and store name to variants if matches
             if canonical_form(name) == canonical_form(getattr(self, variant)):
                 self.variants[variant] = name
 
+    def candidates(self, canonical_names):
+        """Returns set of names which match some of the variants.
+        Args:
+            canonical_names: dictionary {canonical form: list of names},
+                names may be (position, name) pairs
+        """
+        candidates = set()
+        for variant in self.variant_names:
+            candidates.update(canonical_names.get(
+                canonical_form(getattr(self, variant)), []))
+        return candidates
+
     def merge(self, other):
         """Merges object with other NameVariants object, not set values
         of self.variants are replace by values from other object.
@@ -181,21 +219,71 @@ class DandifiedNameConvertor(NameConvertor):
     for the correct variant of the name.
     """
 
-    def __init__(self, *args):
-        super(DandifiedNameConvertor, self).__init__(*args)
-        if dnf is None:
-            raise RuntimeError("DandifiedNameConvertor needs an optional "
-                               "requirement dnf.")
-        with dnf.Base() as base:
-            RELEASEVER = dnf.rpm.detect_releasever(base.conf.installroot)
-            base.conf.substitutions['releasever'] = RELEASEVER
-            base.read_all_repos()
-            base.fill_sack()
-            self.query = base.sack.query()
+    def __init__(self, distro, names=None):
+        """
+        Args:
+            distro: distribution template
+            names: NameIndex of packages of the repositories, index of
+                repositories enabled in dnf configuration is used if not
+                given
+        """
+        super(DandifiedNameConvertor, self).__init__(distro)
+        if names is None:
+            if dnf is None:
+                raise RuntimeError("DandifiedNameConvertor needs an optional "
+                                   "requirement dnf.")
+            names = dnf_names()
+        self.names = names
+
+    @property
+    def cache_key(self):
+        # converted names depend on contents of the repositories
+        return '{0}:{1}'.format(self.__class__.__name__, json.dumps(
+            self.names.revisions, sort_keys=True))
+
+    @property
+    def canonical_names(self):
+        """Dictionary {canonical form: list of (position, name)} of the
+        packages in the repositories, in order of the repositories, built
+        on first use.
+        """
+        if not hasattr(self, '_canonical_names'):
+            self._canonical_names = {}
+            for position, repo_name in enumerate(self.names):
+                self._canonical_names.setdefault(
+                    canonical_form(repo_name), []).append(
+                        (position, repo_name))
+        return self._canonical_names
+
+    @property
+    def similar_names(self):
+        """TrigramIndex of the packages in the repositories by canonical
+        forms of their base names, built on first use.
+        """
+        if not hasattr(self, '_similar_names'):
+            self._similar_names = repo_index.TrigramIndex(
+                self.names, key=self.similarity_key)
+        return self._similar_names
+
+    def similarity_key(self, name):
+        return canonical_form(self.base_name(name))
+
+    def unresolvable(self, names):
+        """Returns sorted list of the names no package in the repositories
+        has, names containing macros are left out.
+        """
+        return sorted(set(name for name in names
+                          if '%' not in name and name not in self.names))
+
+    def similar(self, name):
+        return [repo_name for repo_name, _ in self.similar_names.similar(
+            self.similarity_key(name))]
 
     def rpm_name(self, name, python_version=None, pkg_name=False):
         """Checks if name converted using superclass rpm_name_method match name
-        of package in the query. Searches for correct name if it doesn't.
+        of package in the repositories. Searches for correct name if it
+        doesn't, only the names matching a variant of the name are looked
+        up in canonical_names, the others would never match.
         Args:
             name: name to convert
             python_version: python version for which to retrieve the name of
@@ -209,9 +297,8 @@ class DandifiedNameConvertor(NameConvertor):
         original_name = name
         converted = super(DandifiedNameConvertor, self).rpm_name(
             name, python_version)
-        python_query = self.query.filter(name__substr=[
-            'python', 'py', original_name, canonical_form(original_name)])
-        if converted in [pkg.name for pkg in python_query]:
+        # converted name always contains 'python'
+        if converted in self.names:
             logger.debug("Converted name exists")
             return converted
 
@@ -225,11 +312,23 @@ class DandifiedNameConvertor(NameConvertor):
             nonpy_name = NameVariants(self.base_name(
                 original_name)[2:], python_version)
 
-        for pkg in python_query:
-            versioned_name.find_match(pkg.name)
-            not_versioned_name.find_match(pkg.name)
+        candidates = versioned_name.candidates(self.canonical_names) | \
+            not_versioned_name.candidates(self.canonical_names)
+        if 'nonpy_name' in locals():
+            candidates |= nonpy_name.candidates(self.canonical_names)
+        # names not containing any of the substrings (case-sensitively) are
+        # never matched, the last matching name in order of the
+        # repositories wins
+        substrings = ['python', 'py', original_name,
+                      canonical_form(original_name)]
+        python_names = [repo_name for _, repo_name in sorted(candidates)
+                        if any(s in repo_name for s in substrings)]
+
+        for repo_name in python_names:
+            versioned_name.find_match(repo_name)
+            not_versioned_name.find_match(repo_name)
             if 'nonpy_name' in locals():
-                nonpy_name.find_match(pkg.name)
+                nonpy_name.find_match(repo_name)
 
         if 'nonpy_name' in locals():
             versioned_name = versioned_name.merge(nonpy_name)
@@ -237,9 +336,69 @@ class DandifiedNameConvertor(NameConvertor):
         correct_form = versioned_name.merge(not_versioned_name).best_matching
         logger.debug("Most likely correct form of the name {0}.".format(
             correct_form))
+        if correct_form is None:
+            logger.debug("No variant of {0} found, similar packages: "
+                         "{1}.".format(converted,
+                                       ', '.join(self.similar(converted))))
         return correct_form or converted
 
 
+def dnf_revisions(base, now=None):
+    """Returns dictionary of revisions of metadata of repositories enabled
+    in dnf configuration, as found in dnf cache, or None if some of them
+    is not cached or the cached metadata are older than metadata_expire
+    of the repository, so that dnf has to refresh them first.
+    """
+    now = time.time() if now is None else now
+    try:
+        entries = os.listdir(base.conf.cachedir)
+    except OSError:
+        return None
+    revisions = {}
+    for repo in base.repos.iter_enabled():
+        # dnf caches metadata of a repository in <cachedir>/<id>-<hash>,
+        # where hash has 16 hex digits, ids may be prefixes of other ids
+        cache_re = re.compile(r'^{0}-[0-9a-f]{{16}}$'.format(
+            re.escape(repo.id)))
+        cached = [os.path.join(base.conf.cachedir, entry)
+                  for entry in entries if cache_re.match(entry)]
+        cached = [path for path in cached
+                  if repodata.repomd_revision(path) is not None]
+        if not cached:
+            return None
+        path = max(cached, key=lambda path: os.stat(
+            repodata.repomd_path(path)).st_mtime)
+        age = now - os.stat(repodata.repomd_path(path)).st_mtime
+        if 0 <= repo.metadata_expire < age:
+            return None
+        revisions[repo.id] = repodata.repomd_revision(path)
+    return revisions
+
+
+def dnf_names(directory=settings.REPO_INDEX_DIR):
+    """Returns NameIndex of packages of repositories enabled in dnf
+    configuration. Loading the dnf sack takes seconds, it is loaded only
+    if metadata of some of the repositories changed since the index was
+    built or expired (metadata_expire), in which case dnf refreshes them.
+    """
+    with dnf.Base() as base:
+        RELEASEVER = dnf.rpm.detect_releasever(base.conf.installroot)
+        base.conf.substitutions['releasever'] = RELEASEVER
+        base.read_all_repos()
+        revisions = dnf_revisions(base)
+        if revisions:
+            index = repo_index.open_index(repo_index.index_path(
+                directory, 'dnf-names', revisions), revisions)
+            if index is not None:
+                return index
+        base.fill_sack()
+        revisions = dnf_revisions(base) or {}
+        logger.info('Building index of package names of dnf repositories.')
+        return repo_index.NameIndex.build(
+            repo_index.index_path(directory, 'dnf-names', revisions),
+            (pkg.name for pkg in base.sack.query()), revisions)
+
+
 def canonical_form(name):
     return name.lower().replace('-', '').replace('_', '')
 
@@ -253,6 +412,17 @@ class AutoProvidesNameConvertor(NameConvertor):
         pkg_name: flag to perform conversion of rpm package name
                   (foo -> python-foo)
     """
+
+    def __init__(self, distro, provides=None):
+        """
+        Args:
+            distro: distribution template
+            provides: ProvidesIndex of repositories to check the converted
+                names against or None
+        """
+        super(AutoProvidesNameConvertor, self).__init__(distro)
+        self.provides = provides
+
     def rpm_name(self, name, python_version=settings.DEFAULT_PYTHON_VERSION,
                  pkg_name=False):
         if pkg_name:
@@ -260,3 +430,15 @@ class AutoProvidesNameConvertor(NameConvertor):
                 name, python_version)
         canonical_name = safe_name(name).lower()
         return "python{0}dist({1})".format(python_version, canonical_name)
+
+    def unresolvable(self, names):
+        """Returns sorted list of python provides among the names, which no
+        package in the repositories provides, the list is always empty
+        without index of the provides.
+        """
+        if self.provides is None:
+            return []
+        python_provides = set(name for name in names
+                              if repodata.PYTHON_PROVIDE_RE.match(name))
+        return sorted(python_provides - self.provides.provided(
+            python_provides))
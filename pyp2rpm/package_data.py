@@ -40,7 +40,8 @@ class PackageData(object):
         if name == 'underscored_name':
             return self.data['name'].replace('-', '_')
         elif name == 'changelog_date_packager':
-            return self.get_changelog_date_packager()
+            # may be set in advance by a stage running in parallel
+            return self.data.get(name) or self.get_changelog_date_packager()
         elif name in ['runtime_deps', 'build_deps', 'classifiers',
                       'doc_files', 'doc_license']:
             return self.data.get(name, [])
@@ -89,16 +90,21 @@ class PackageData(object):
     def get_changelog_date_packager(self):
         """Returns part of the changelog entry, containing date and packager.
         """
-        try:
-            packager = subprocess.Popen(
-                'rpmdev-packager', stdout=subprocess.PIPE).communicate(
-                )[0].strip()
-        except OSError:
-            # Hi John Doe, you should install rpmdevtools
-            packager = "John Doe <john@doe.com>"
-            logger.warn("Package rpmdevtools is missing, using default "
-                        "name: {0}.".format(packager))
-        with utils.c_time_locale():
-            date_str = time.strftime('%a %b %d %Y', time.gmtime())
-        encoding = locale.getpreferredencoding()
-        return u'{0} {1}'.format(date_str, packager.decode(encoding))
+        return changelog_date_packager()
+
+
+def changelog_date_packager():
+    """Returns part of the changelog entry, containing date and packager."""
+    try:
+        packager = subprocess.Popen(
+            'rpmdev-packager', stdout=subprocess.PIPE).communicate(
+            )[0].strip()
+    except OSError:
+        # Hi John Doe, you should install rpmdevtools
+        packager = b"John Doe <john@doe.com>"
+        logger.warn("Package rpmdevtools is missing, using default "
+                    "name: {0}.".format(packager.decode()))
+    with utils.c_time_locale():
+        date_str = time.strftime('%a %b %d %Y', time.gmtime())
+    encoding = locale.getpreferredencoding()
+    return u'{0} {1}'.format(date_str, packager.decode(encoding))
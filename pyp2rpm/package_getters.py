@@ -3,22 +3,31 @@ import os
 import sys
 import subprocess
 import tempfile
+import threading
 import shutil
 import re
-try:
-    import urllib.request as request
-except ImportError:
-    import urllib as request
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 from pkg_resources import parse_version
 
 
 from pyp2rpm import settings
 from pyp2rpm import exceptions
+from pyp2rpm import source_store
+from pyp2rpm.extraction_cache import file_sha256
 
 
 logger = logger = logging.getLogger(__name__)
 
 
+def source_url(name, filename):
+    """Returns URL of the file of the package on PyPI, which doesn't
+    depend on the hash of the file.
+    """
+    return ("https://files.pythonhosted.org/packages/source"
+            "/{0[0]}/{0}/{1}").format(name, filename)
+
+
 def get_url(client, name, version, wheel=False, hashed_format=False):
     """Retrieves list of package URLs using PyPI's XML-RPC. Chooses URL
     of prefered archive and md5_digest.
@@ -69,16 +78,150 @@ def get_url(client, name, version, wheel=False, hashed_format=False):
             "to upload sources.".format(release_data['name']))
 
     if not hashed_format:
-        url = ("https://files.pythonhosted.org/packages/source"
-               "/{0[0]}/{0}/{1}").format(name, url.split("/")[-1])
+        url = source_url(name, url.split("/")[-1])
 
     return (url, md5_digest)
 
 
+def get_digests(client, name, version, url):
+    """Returns dictionary of md5 and sha256 hex digests PyPI lists for the
+    file of the release at given url.
+    """
+    for release_url in client.release_urls(name, version):
+        if release_url['url'] == url:
+            digests = dict(release_url.get('digests') or {})
+            if release_url.get('md5_digest'):
+                digests.setdefault('md5', release_url['md5_digest'])
+            return dict((k, v) for k, v in digests.items()
+                        if k in ('md5', 'sha256'))
+    return {}
+
+
+def fetch_file(client, name, version, url, save_file, store=None):
+    """Places file of the release at given url to save_file, from the
+    source store if it holds the file, by download otherwise.
+    Args:
+        client: PyPIClient object
+        name, version: name and version of the release
+        url: url of the file
+        save_file: path to place the file to
+        store: SourceStore object or None
+    Returns:
+        dictionary of md5 and sha256 hex digests of the file
+    """
+    digests = get_digests(client, name, version, url)
+    if store is not None and store.get_to(digests.get('sha256'), save_file):
+        return digests
+    computed = client.download(url, save_file, digests)
+    if store is not None:
+        store.add(save_file, computed['sha256'])
+    return computed
+
+
+def resolve_version(client, name, version=None, prerelease=False):
+    """Checks that the version of the package exists on PyPI, finds out
+    the latest version if no version is given.
+    Returns:
+        the version
+    Raises:
+        NoSuchPackageException if there is no such package or version
+    """
+    if version:
+        if not client.release_urls(name, version):
+            raise exceptions.NoSuchPackageException(
+                'Package with name "{0}" and version "{1}" could not be '
+                'found on PyPI.'.format(name, version))
+        return version
+
+    versions = sorted(client.package_releases(name, True),
+                      reverse=True, key=parse_version)
+
+    # Use only stable versions, unless --pre was specified
+    if not prerelease:
+        versions = [candidate for candidate in versions
+                    if not parse_version(candidate).is_prerelease]
+
+    # If versions is empty list then there is no such package on PyPI
+    if not versions:
+        raise exceptions.NoSuchPackageException(
+            'Package "{0}" could not be found on PyPI.'.format(name))
+    return versions[0]
+
+
+def prefetch(client, packages, save_dir=None, prerelease=False,
+             workers=settings.PREFETCH_WORKERS, store=None):
+    """Fetches PyPI data (release data and urls of sources) of many
+    packages at once, at most workers packages at the same time. The data
+    are kept in the client, conversions of the packages using the client
+    then don't wait for PyPI. Failures are only logged, conversion of the
+    package reports them later.
+    Args:
+        client: PyPIClient object to fill
+        packages: list of (name, version) pairs, None stands for the latest
+            version
+        save_dir: directory to download sources of the packages to, they
+            are not downloaded if not given
+        prerelease: whether the latest version may be a prerelease
+        workers: maximum number of packages fetched at the same time
+        store: SourceStore object to take the sources from and to store
+            the downloaded ones in
+    Returns:
+        dictionary {(name, version): (resolved version, url of sources,
+        path to downloaded sources or None)}, failed packages are left out
+    """
+    # packages resolving to the same file, e.g. (spam, None) and (spam, 2),
+    # must not download it at the same time, it is placed only once
+    lock = threading.Lock()
+    file_locks = {}
+    placed = set()
+
+    def place(name, version, url, local_file):
+        with lock:
+            file_lock = file_locks.setdefault(local_file, threading.Lock())
+        with file_lock:
+            if local_file not in placed:
+                fetch_file(client, name, version, url, local_file, store)
+                placed.add(local_file)
+
+    def fetch(package):
+        name, version = package
+        try:
+            version = resolve_version(client, name, version, prerelease)
+            client.release_data(name, version)
+            url = get_url(client, name, version, hashed_format=True)[0]
+            local_file = None
+            if save_dir is not None:
+                local_file = os.path.join(save_dir, url.split('/')[-1])
+                place(name, version, url, local_file)
+        except BaseException as e:
+            logger.warning('Failed to prefetch {0} {1}: {2}'.format(
+                name, version or '', e))
+            return package, None
+        return package, (version, url, local_file)
+
+    if save_dir is not None and not os.path.isdir(save_dir):
+        os.makedirs(save_dir)
+    # the same package is fetched only once
+    packages = list(OrderedDict.fromkeys(packages))
+    pool = ThreadPool(max(1, min(workers, len(packages))))
+    try:
+        results = pool.map(fetch, packages)
+    finally:
+        pool.close()
+        pool.join()
+    return dict(result for result in results if result[1] is not None)
+
+
 class PackageGetter(object):
 
     """Base class for package getters"""
 
+    # digests of the package file computed while getting it
+    digests = {}
+    # sha256 hex digest of the package file, if it was computed or verified
+    # while getting it
+    sha256 = None
+
     def get(self):
         pass
 
@@ -124,36 +267,17 @@ class PypiDownloader(PackageGetter):
     """Class for downloading the package from PyPI."""
 
     def __init__(self, client, name, version=None, prerelease=False,
-                 save_dir=None):
+                 save_dir=None, workspace=None, store=None):
         self.client = client
         self.name = name
-        if version:
-            # if version is specified, will check if such version exists
-            if not self.client.release_urls(name, version):
-                raise exceptions.NoSuchPackageException(
-                    'Package with name "{0}" and version "{1}" could not be '
-                    'found on PyPI.'.format(name, version))
-
-            self.version = version
-        else:
-            self.versions = sorted(self.client.package_releases(self.name, True),
-                                   reverse=True, key=parse_version)
-
-            # Use only stable versions, unless --pre was specified
-            if not prerelease:
-                self.versions = [candidate for candidate in self.versions
-                                 if not parse_version(candidate).is_prerelease]
-
-            # If versions is empty list then there is no such package on PyPI
-            if not self.versions:
-                raise exceptions.NoSuchPackageException(
-                    'Package "{0}" could not be found on PyPI.'.format(name))
-
-            self.version = self.versions[0]
+        self.workspace = workspace
+        self.store = store
+        self.version = resolve_version(client, name, version, prerelease)
         self.save_dir_init(save_dir)
 
     def get(self, wheel=False):
-        """Downloads the package from PyPI.
+        """Downloads the package from PyPI, unless the source store holds
+        it already.
         Returns:
             Full path of the downloaded file.
         Raises:
@@ -164,14 +288,20 @@ class PypiDownloader(PackageGetter):
                           wheel, hashed_format=True)[0]
         except exceptions.MissingUrlException as e:
             raise SystemExit(e)
-        if wheel:
+        if wheel and self.workspace is not None:
+            # removed together with the workspace
+            save_dir = self.workspace.directory
+        elif wheel:
             self.temp_dir = tempfile.mkdtemp()
             save_dir = self.temp_dir
         else:
             save_dir = self.save_dir
 
         save_file = '{0}/{1}'.format(save_dir, url.split('/')[-1])
-        request.urlretrieve(url, save_file)
+        # wheels are removed after the conversion, not worth storing
+        self.digests = fetch_file(self.client, self.name, self.version, url,
+                                  save_file, None if wheel else self.store)
+        self.sha256 = self.digests.get('sha256')
         logger.info('Downloaded package from PyPI: {0}.'.format(save_file))
         return save_file
 
@@ -184,32 +314,37 @@ class PypiDownloader(PackageGetter):
 
 class LocalFileGetter(PackageGetter):
 
-    def __init__(self, local_file, save_dir=None):
+    def __init__(self, local_file, save_dir=None, store=None):
         self.local_file = local_file
+        self.store = store
         self.name_version_pattern = re.compile(
             r"(^.*?)-(\d+\.?\d*\.?\d*\.?\d*\.?(?:a|b|rc|post|dev)?\d*).*$")
         self.save_dir_init(save_dir)
 
     def get(self):
-        """Copies file from local filesystem to self.save_dir.
+        """Places file from local filesystem to self.save_dir by reflink or
+        hardlink, the file is copied only if neither is possible. The file
+        is kept in the source store, if given. Wheels are not sources, they
+        are only read in place.
         Returns:
-            Full path of the copied file.
+            Full path of the placed file.
         Raises:
             EnvironmentError if the file can't be found or the save_dir
             is not writable.
         """
         if self.local_file.endswith('.whl'):
-            self.temp_dir = tempfile.mkdtemp()
-            save_dir = self.temp_dir
-        else:
-            save_dir = self.save_dir
+            if not os.path.isfile(self.local_file):
+                raise EnvironmentError('No such file: {0}'.format(
+                    self.local_file))
+            return os.path.abspath(self.local_file)
 
-        save_file = '{0}/{1}'.format(save_dir, os.path.basename(
+        save_file = '{0}/{1}'.format(self.save_dir, os.path.basename(
             self.local_file))
-        if not os.path.exists(save_file) or not os.path.samefile(
-                self.local_file, save_file):
-            shutil.copy2(self.local_file, save_file)
-        logger.info('Local file: {0} copied to {1}.'.format(
+        source_store.place(self.local_file, save_file)
+        if self.store is not None:
+            self.sha256 = file_sha256(save_file)
+            self.store.add(save_file, self.sha256)
+        logger.info('Local file: {0} placed to {1}.'.format(
             self.local_file, save_file))
 
         return save_file
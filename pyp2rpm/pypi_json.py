@@ -0,0 +1,81 @@
+"""Selective parsing of documents of PyPI JSON API. Most of a document of
+a project with long history are file entries of its releases, none of
+them is ever used. Only the members used are kept, the rest of the
+document is decoded value by value by the C decoder of json module and
+dropped right away, so the whole tree is never in memory.
+"""
+import json
+import re
+
+WHITESPACE_RE = re.compile(r'[ \t\n\r]*')
+
+decoder = json.JSONDecoder()
+
+
+def skip_whitespace(text, pos):
+    return WHITESPACE_RE.match(text, pos).end()
+
+
+def skip_value(text, pos):
+    """Returns position right after the JSON value starting at pos."""
+    return decoder.raw_decode(text, pos)[1]
+
+
+def scan_object(text, pos, member):
+    """Scans JSON object starting at pos, member(key, position) is called
+    for every member of the object and returns position right after its
+    value.
+    Returns:
+        position right after the object
+    """
+    if text[pos] != '{':
+        raise ValueError('Expecting JSON object at {0}'.format(pos))
+    pos = skip_whitespace(text, pos + 1)
+    if text[pos] == '}':
+        return pos + 1
+    while True:
+        key, pos = decoder.raw_decode(text, pos)
+        pos = skip_whitespace(text, pos)
+        if text[pos] != ':':
+            raise ValueError('Expecting ":" at {0}'.format(pos))
+        pos = skip_whitespace(text, member(
+            key, skip_whitespace(text, pos + 1)))
+        if text[pos] == '}':
+            return pos + 1
+        if text[pos] != ',':
+            raise ValueError('Expecting "," or "}}" at {0}'.format(pos))
+        pos = skip_whitespace(text, pos + 1)
+
+
+def parse_project_json(text):
+    """Parses document of PyPI JSON API of a project or its release.
+    Args:
+        text: the document
+    Returns:
+        dictionary with info and urls of the document and list of versions
+        of releases
+    Raises:
+        ValueError if the document is not valid JSON object
+    """
+    data = {'info': {}, 'urls': [], 'releases': []}
+
+    def release(version, pos):
+        data['releases'].append(version)
+        return skip_value(text, pos)
+
+    def member(key, pos):
+        if key in ('info', 'urls'):
+            data[key], pos = decoder.raw_decode(text, pos)
+            return pos
+        if key == 'releases' and text[pos] == '{':
+            return scan_object(text, pos, release)
+        return skip_value(text, pos)
+
+    try:
+        pos = skip_whitespace(text, scan_object(
+            text, skip_whitespace(text, 0), member))
+    except IndexError:
+        raise ValueError('Unexpected end of JSON document')
+    if pos != len(text):
+        raise ValueError('Extra data at {0}'.format(pos))
+    return data
@@ -0,0 +1,365 @@
+"""Persistent indexes of packages of rpm repositories, rebuilt only when
+metadata of some of the repositories change.
+"""
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+
+from pyp2rpm import repodata
+from pyp2rpm import settings
+
+logger = logging.getLogger(__name__)
+
+NAMES_MAGIC = b'pyp2rpm-names 1\n'
+OFFSET = struct.Struct('<I')
+
+
+class NameIndex(object):
+    """Sorted table of distinct package names stored in a file, which is
+    memory-mapped, so opening the index takes no time and its pages are
+    shared by all processes using it.
+
+    File layout:
+        NAMES_MAGIC
+        JSON line with number of the names and revisions of metadata of
+        the repositories the names come from
+        (number + 1) offsets of the names as little-endian 32 bit integers
+        the names encoded in UTF-8, concatenated
+
+    names = NameIndex.build(path, ['python3-spam', 'bash'], revisions)
+    'bash' in names  # True, looked up by binary search
+    list(names)  # ['bash', 'python3-spam']
+    """
+
+    def __init__(self, path):
+        """
+        Raises:
+            IOError, OSError if the file can't be read
+            ValueError if the file is not a valid index
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(NAMES_MAGIC)] != NAMES_MAGIC:
+            raise ValueError('{0} is not index of package names.'.format(
+                path))
+        end = self.map.find(b'\n', len(NAMES_MAGIC))
+        header = json.loads(self.map[len(NAMES_MAGIC):end].decode('utf-8'))
+        self.revisions = header['revisions']
+        self.count = header['count']
+        self.table = end + 1
+        self.blob = self.table + (self.count + 1) * OFFSET.size
+        if len(self.map) != self.blob + self.offset(self.count):
+            raise ValueError('Index {0} is truncated.'.format(path))
+
+    @classmethod
+    def build(cls, path, names, revisions):
+        """Atomically writes index of the names to path.
+        Args:
+            path: path of the index
+            names: iterable of package names, may contain duplicates
+            revisions: dictionary identifying the repositories and
+                revisions of their metadata
+        Returns:
+            the NameIndex
+        """
+        encoded = sorted(set(name.encode('utf-8') for name in names))
+        header = json.dumps({'count': len(encoded), 'revisions': revisions},
+                            sort_keys=True)
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(NAMES_MAGIC + header.encode('utf-8') + b'\n')
+                offset = 0
+                for name in encoded:
+                    f.write(OFFSET.pack(offset))
+                    offset += len(name)
+                f.write(OFFSET.pack(offset))
+                f.write(b''.join(encoded))
+            os.rename(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return cls(path)
+
+    def offset(self, i):
+        return OFFSET.unpack_from(self.map, self.table + i * OFFSET.size)[0]
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError('Index of package names out of range.')
+        return self.map[self.blob + self.offset(i):
+                        self.blob + self.offset(i + 1)].decode('utf-8')
+
+    def __iter__(self):
+        offsets = struct.unpack_from('<{0}I'.format(self.count + 1),
+                                     self.map, self.table)
+        blob = self.map[self.blob:]
+        for i in range(self.count):
+            yield blob[offsets[i]:offsets[i + 1]].decode('utf-8')
+
+    def __contains__(self, name):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self[middle] < name:
+                low = middle + 1
+            else:
+                high = middle
+        return low < self.count and self[low] == name
+
+    def close(self):
+        self.map.close()
+
+
+class ProvidesIndex(object):
+    """Index of python provides (pythonXdist(...)) of packages stored in
+    sqlite database, every provide is looked up by the primary key.
+
+    provides = ProvidesIndex.build(
+        path, [('python3dist(spam)', 'python3-spam')], revisions)
+    'python3dist(spam)' in provides  # True
+    provides.packages('python3dist(spam)')  # ['python3-spam']
+    """
+
+    def __init__(self, path):
+        """
+        Raises:
+            IOError, OSError if the file doesn't exist
+            ValueError if the file is not a valid index
+        """
+        if not os.path.isfile(path):
+            raise IOError('No such file: {0}'.format(path))
+        self.path = path
+        # conversion stages may run in other threads, queries are serialized
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        try:
+            self.revisions = dict(self.connection.execute(
+                'SELECT repo, revision FROM revisions'))
+        except sqlite3.DatabaseError as e:
+            self.connection.close()
+            raise ValueError('{0} is not index of provides: {1}'.format(
+                path, e))
+
+    @classmethod
+    def build(cls, path, provides, revisions):
+        """Atomically writes index of the provides to path.
+        Args:
+            path: path of the index
+            provides: iterable of (provide, package name) pairs, may
+                contain duplicates
+            revisions: dictionary identifying the repositories and
+                revisions of their metadata
+        Returns:
+            the ProvidesIndex
+        """
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        os.close(fd)
+        try:
+            connection = sqlite3.connect(temp_path)
+            try:
+                connection.executescript("""
+                    CREATE TABLE revisions (repo TEXT, revision TEXT);
+                    CREATE TABLE provides (
+                        provide TEXT NOT NULL,
+                        package TEXT NOT NULL,
+                        PRIMARY KEY (provide, package)) WITHOUT ROWID;
+                """)
+                connection.executemany(
+                    'INSERT INTO revisions VALUES (?, ?)', revisions.items())
+                connection.executemany(
+                    'INSERT OR IGNORE INTO provides VALUES (?, ?)', provides)
+                connection.commit()
+            finally:
+                connection.close()
+            os.rename(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return cls(path)
+
+    def packages(self, provide):
+        """Returns sorted list of names of packages with the provide."""
+        with self.lock:
+            return [package for (package,) in self.connection.execute(
+                'SELECT package FROM provides WHERE provide = ? '
+                'ORDER BY package', (provide,))]
+
+    def provided(self, provides):
+        """Returns set of the provides some package has, all of them are
+        looked up by one query (per 500 provides).
+        """
+        provides = list(set(provides))
+        found = set()
+        with self.lock:
+            for i in range(0, len(provides), 500):
+                chunk = provides[i:i + 500]
+                found.update(provide for (provide,) in self.connection.execute(
+                    'SELECT DISTINCT provide FROM provides WHERE provide IN '
+                    '({0})'.format(', '.join('?' * len(chunk))), chunk))
+        return found
+
+    def __contains__(self, provide):
+        with self.lock:
+            return self.connection.execute(
+                'SELECT 1 FROM provides WHERE provide = ? LIMIT 1',
+                (provide,)).fetchone() is not None
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute(
+                'SELECT COUNT(DISTINCT provide) FROM provides').fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+def trigrams(key):
+    """Returns set of trigrams of the key padded by spaces, so that starts
+    and ends of the keys have trigrams of their own.
+    """
+    padded = ' {0} '.format(key)
+    return set(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class TrigramIndex(object):
+    """In-memory index of names by trigrams of their keys for fuzzy
+    matching. Only names sharing some trigram with the query are scored,
+    so lookups don't scan all the names, like computing edit distances
+    would.
+
+    index = TrigramIndex(['python3-dateutil', 'bash'],
+                         key=lambda name: name.split('-')[-1])
+    index.similar('dateutil2')  # [('python3-dateutil', 0.7)]
+    """
+
+    def __init__(self, names, key=lambda name: name):
+        """
+        Args:
+            names: iterable of names
+            key: function returning string the name is compared by
+        """
+        self.names = []
+        self.sizes = []
+        self.postings = {}
+        for i, name in enumerate(names):
+            grams = trigrams(key(name))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(i)
+            self.names.append(name)
+            self.sizes.append(len(grams))
+
+    def __len__(self):
+        return len(self.names)
+
+    def similar(self, key, limit=settings.SIMILAR_NAMES_LIMIT,
+                threshold=settings.SIMILAR_NAMES_THRESHOLD):
+        """Returns list of (name, similarity) of at most limit names most
+        similar to the key, the most similar first. Similarity is Jaccard
+        index of sets of trigrams of the keys, names less similar than the
+        threshold are left out.
+        """
+        grams = trigrams(key)
+        shared = {}
+        for gram in grams:
+            for i in self.postings.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+        scored = []
+        for i, count in shared.items():
+            similarity = float(count) / (len(grams) + self.sizes[i] - count)
+            if similarity >= threshold:
+                scored.append((-similarity, self.names[i]))
+        return [(name, -similarity)
+                for similarity, name in heapq.nsmallest(limit, scored)]
+
+
+def index_path(directory, kind, revisions):
+    """Returns path of index of given kind of the repositories, identified
+    by keys of revisions.
+    """
+    key = hashlib.sha256('\0'.join(sorted(revisions)).encode(
+        'utf-8')).hexdigest()
+    return os.path.join(directory, '{0}-{1}.idx'.format(kind, key))
+
+
+def open_index(path, revisions, index_class=NameIndex):
+    """Returns index of the index_class stored at path if it was built from
+    metadata of the same revisions, None otherwise.
+    """
+    try:
+        index = index_class(path)
+    except (IOError, OSError):
+        return None
+    except ValueError:
+        logger.warning('Corrupted repository index {0}.'.format(path))
+        return None
+    if index.revisions != revisions:
+        index.close()
+        return None
+    return index
+
+
+def repository_names(repo_dirs, directory=settings.REPO_INDEX_DIR):
+    """Returns NameIndex of packages of the repositories stored in local
+    directories, the index is built only if there is none of the current
+    revisions of their metadata.
+    Args:
+        repo_dirs: list of directories containing repodata
+        directory: directory to store the indexes in
+    Raises:
+        IOError if some of the directories is not a repository
+    """
+    revisions = dict((os.path.abspath(repo_dir),
+                      repodata.repomd_revision(repo_dir))
+                     for repo_dir in repo_dirs)
+    path = index_path(directory, 'names', revisions)
+    index = open_index(path, revisions)
+    if index is None:
+        logger.info('Building index of package names of {0}.'.format(
+            ', '.join(repo_dirs)))
+        index = NameIndex.build(path, itertools.chain.from_iterable(
+            repodata.package_names(repo_dir) for repo_dir in repo_dirs),
+            revisions)
+    return index
+
+
+def repository_provides(repo_dirs, directory=settings.REPO_INDEX_DIR):
+    """Returns ProvidesIndex of python provides of packages of the
+    repositories stored in local directories, the index is built only if
+    there is none of the current revisions of their metadata.
+    Args:
+        repo_dirs: list of directories containing repodata
+        directory: directory to store the indexes in
+    Raises:
+        IOError if some of the directories is not a repository
+    """
+    revisions = dict((os.path.abspath(repo_dir),
+                      repodata.repomd_revision(repo_dir))
+                     for repo_dir in repo_dirs)
+    path = index_path(directory, 'provides', revisions)
+    index = open_index(path, revisions, ProvidesIndex)
+    if index is None:
+        logger.info('Building index of python provides of {0}.'.format(
+            ', '.join(repo_dirs)))
+        index = ProvidesIndex.build(path, itertools.chain.from_iterable(
+            repodata.python_provides(repo_dir) for repo_dir in repo_dirs),
+            revisions)
+    return index
@@ -0,0 +1,247 @@
+"""Reading of metadata of rpm repositories (repodata directories created
+by createrepo) stored in local directories.
+"""
+import bz2
+import contextlib
+import gzip
+import itertools
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import xml.etree.ElementTree as ET
+from xml.parsers import expat
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+logger = logging.getLogger(__name__)
+
+REPO_NS = '{http://linux.duke.edu/metadata/repo}'
+COMMON_NS = '{http://linux.duke.edu/metadata/common}'
+RPM_NS = '{http://linux.duke.edu/metadata/rpm}'
+
+# pythonXdist(...) and pythonX.Ydist(...) provides
+PYTHON_PROVIDE_RE = re.compile(r'^python\d+(\.\d+)?dist\(')
+
+
+def repomd_path(repo_dir):
+    return os.path.join(repo_dir, 'repodata', 'repomd.xml')
+
+
+def repomd_revision(repo_dir):
+    """Returns revision of the repository metadata or None, if there is no
+    repomd.xml in the repository.
+    """
+    try:
+        root = ET.parse(repomd_path(repo_dir)).getroot()
+    except (IOError, OSError):
+        return None
+    revision = root.find(REPO_NS + 'revision')
+    if revision is not None and (revision.text or '').strip():
+        return revision.text.strip()
+    # revision is optional, the time of the last sync identifies it
+    return str(os.stat(repomd_path(repo_dir)).st_mtime)
+
+
+def metadata_path(repo_dir, data_type):
+    """Returns path to the metadata file of given type (e.g. primary)
+    listed in repomd.xml or None, if there is no such.
+    """
+    try:
+        root = ET.parse(repomd_path(repo_dir)).getroot()
+    except (IOError, OSError):
+        return None
+    for data in root.findall(REPO_NS + 'data'):
+        if data.get('type') == data_type:
+            location = data.find(REPO_NS + 'location')
+            if location is not None:
+                return os.path.join(repo_dir, location.get('href'))
+    return None
+
+
+def open_metadata(path):
+    """Opens possibly compressed metadata file for reading.
+    Raises:
+        IOError if the file can't be opened or its compression is not
+        supported
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.bz2'):
+        return bz2.BZ2File(path, 'rb')
+    if path.endswith('.xz'):
+        if lzma is None:
+            raise IOError('Reading of {0} needs lzma module.'.format(path))
+        return lzma.open(path, 'rb')
+    return open(path, 'rb')
+
+
+@contextlib.contextmanager
+def sqlite_metadata(path):
+    """Context manager opening the sqlite database of metadata, compressed
+    database is decompressed to a temporary file first.
+    """
+    temp_path = None
+    try:
+        if path.endswith(('.gz', '.bz2', '.xz')):
+            fd, temp_path = tempfile.mkstemp(suffix='.sqlite')
+            with os.fdopen(fd, 'wb') as temp:
+                with open_metadata(path) as f:
+                    shutil.copyfileobj(f, temp)
+            path = temp_path
+        connection = sqlite3.connect(path)
+        try:
+            yield connection
+        finally:
+            connection.close()
+    finally:
+        if temp_path is not None:
+            os.remove(temp_path)
+
+
+class PrimaryParser(object):
+    """Incremental parser of primary.xml keeping only names and python
+    provides of the packages. Elements are never built, handlers of
+    expat parser pick up the few values needed, so memory used doesn't
+    depend on size of the document. Handlers of ends of elements and of
+    text are set only inside elements of the values, most of the document
+    is passed by without calling them.
+
+    parser = PrimaryParser()
+    parser.feed(chunk)
+    parser.completed()  # [(name, [python provides]), ...] parsed so far
+    """
+
+    PACKAGE = COMMON_NS[1:-1] + ' package'
+    NAME = COMMON_NS[1:-1] + ' name'
+    PROVIDES = RPM_NS[1:-1] + ' provides'
+    ENTRY = RPM_NS[1:-1] + ' entry'
+
+    def __init__(self):
+        self.parser = expat.ParserCreate(namespace_separator=' ')
+        self.parser.buffer_text = True
+        self.parser.StartElementHandler = self.start
+        self.packages = []
+        self.text = []
+        self.in_provides = False
+
+    def start(self, tag, attributes):
+        if self.in_provides:
+            if tag == self.ENTRY and PYTHON_PROVIDE_RE.match(
+                    attributes.get('name', '')):
+                self.packages[-1][1].append(attributes['name'])
+        elif tag == self.PACKAGE:
+            self.packages.append([None, []])
+        elif tag == self.NAME and self.packages:
+            self.text = []
+            self.parser.CharacterDataHandler = self.text.append
+            self.parser.EndElementHandler = self.end
+        elif tag == self.PROVIDES:
+            self.in_provides = True
+            self.parser.EndElementHandler = self.end
+
+    def end(self, tag):
+        if tag == self.NAME:
+            self.packages[-1][0] = ''.join(self.text)
+            self.parser.CharacterDataHandler = None
+        elif tag == self.PROVIDES:
+            self.in_provides = False
+        else:
+            return
+        self.parser.EndElementHandler = None
+
+    def feed(self, data, final=False):
+        """Raises:
+            ValueError if the document is not well-formed
+        """
+        try:
+            self.parser.Parse(data, final)
+        except expat.ExpatError as e:
+            raise ValueError('Invalid primary metadata: {0}'.format(e))
+
+    def completed(self):
+        """Returns and forgets the packages parsed completely so far."""
+        # the last package may still be parsed
+        packages, self.packages = self.packages[:-1], self.packages[-1:]
+        return [tuple(package) for package in packages]
+
+
+def xml_packages(path, chunk_size=64 * 1024):
+    """Yields (name, list of python provides) of the packages listed in
+    primary.xml(.gz|.bz2|.xz), the document is read in chunks.
+    """
+    parser = PrimaryParser()
+    with open_metadata(path) as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            parser.feed(chunk)
+            for package in parser.completed():
+                yield package
+    parser.feed(b'', True)
+    for package in parser.completed() + [
+            tuple(package) for package in parser.packages]:
+        yield package
+
+
+def sqlite_packages(path):
+    """Yields (name, list of python provides) of the packages listed in
+    primary.sqlite(.bz2|.gz|.xz).
+    """
+    with sqlite_metadata(path) as connection:
+        cursor = connection.execute(
+            "SELECT packages.pkgKey, packages.name, provides.name "
+            "FROM packages LEFT JOIN provides "
+            "ON provides.pkgKey = packages.pkgKey "
+            "AND provides.name LIKE 'python%dist(%' "
+            "ORDER BY packages.pkgKey, provides.rowid")
+        for _, rows in itertools.groupby(cursor, key=lambda row: row[0]):
+            rows = list(rows)
+            yield rows[0][1], [row[2] for row in rows
+                               if row[2] and PYTHON_PROVIDE_RE.match(row[2])]
+
+
+def packages(repo_dir):
+    """Yields (name, list of python provides) of the packages of the
+    repository, read from its sqlite database if it has one, from
+    primary.xml otherwise. The database is read whole before the packages
+    are yielded, so that failing to read it midway doesn't yield some of
+    them twice.
+    Raises:
+        IOError if the repository has no primary metadata
+        ValueError if the metadata are not valid
+    """
+    path = metadata_path(repo_dir, 'primary_db')
+    if path is not None:
+        try:
+            sqlite_rows = list(sqlite_packages(path))
+        except (IOError, OSError, sqlite3.DatabaseError) as e:
+            logger.warning('Failed to read {0}: {1}, reading primary.xml '
+                           'instead.'.format(path, e))
+        else:
+            for package in sqlite_rows:
+                yield package
+            return
+    path = metadata_path(repo_dir, 'primary')
+    if path is None:
+        raise IOError('No primary metadata in repository {0}.'.format(
+            repo_dir))
+    for package in xml_packages(path):
+        yield package
+
+
+def package_names(repo_dir):
+    """Yields names of all packages of the repository."""
+    for name, _ in packages(repo_dir):
+        yield name
+
+
+def python_provides(repo_dir):
+    """Yields (provide, package name) pairs of python provides of the
+    packages of the repository.
+    """
+    for name, provides in packages(repo_dir):
+        for provide in provides:
+            yield provide, name
@@ -1,3 +1,5 @@
+import os
+
 from pyp2rpm import utils
 
 DEFAULT_TEMPLATE = 'fedora'
@@ -16,6 +18,46 @@ DEFAULT_PKG_SAVE_PATH = utils.get_default_save_path()
 KNOWN_DISTROS = DEFAULT_PYTHON_VERSIONS.keys()
 ARCHIVE_SUFFIXES = ['.tar', '.tgz', '.tar.gz', '.tar.bz2',
                     '.gz', '.bz2', '.xz', '.zip', '.egg', '.whl']
+ARCHIVE_SCAN_FILES = ['setup.py', 'setup.cfg', 'PKG-INFO', 'RECORD',
+                      'DESCRIPTION.rst', 'conf.py']
+ARCHIVE_CONTENT_CACHE_SIZE = 16 * 1024 * 1024
+# bigger files are not captured while compressed tarballs are scanned,
+# nor more than ARCHIVE_SCAN_CAPTURE_SIZE bytes of files in total
+ARCHIVE_SCAN_FILE_SIZE = 1024 * 1024
+ARCHIVE_SCAN_CAPTURE_SIZE = 4 * 1024 * 1024
+CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+    'pyp2rpm')
+EXTRACTION_CACHE_DIR = os.path.join(CACHE_DIR, 'extraction')
+EXTRACTION_CACHE_SIZE = 64 * 1024 * 1024
+# PyPI responses younger than HTTP_CACHE_TTL seconds are used without
+# revalidation
+HTTP_CACHE_DIR = os.path.join(CACHE_DIR, 'http')
+HTTP_CACHE_SIZE = 256 * 1024 * 1024
+HTTP_CACHE_TTL = 10 * 60
+# downloaded sources keyed by sha256, shared by all save directories
+SOURCE_STORE_DIR = os.path.join(CACHE_DIR, 'sources')
+SOURCE_STORE_SIZE = 1024 * 1024 * 1024
+# indexes of packages of rpm repositories used by name conversion
+REPO_INDEX_DIR = os.path.join(CACHE_DIR, 'repos')
+# packages suggested for names not found in the repositories
+SIMILAR_NAMES_LIMIT = 5
+SIMILAR_NAMES_THRESHOLD = 0.4
+# golden virtualenvs and their ready to use clones, 0 disables the pool
+VENV_POOL_DIR = os.path.join(CACHE_DIR, 'venvs')
+VENV_POOL_SIZE = 2
+# threads running independent stages of a conversion, 1 runs them in sequence
+STAGE_WORKERS = 4
+# idle keep-alive connections kept per host, timeout of HTTP requests in s
+HTTP_POOL_SIZE = 4
+HTTP_TIMEOUT = 30
+# attempts to resume interrupted download
+DOWNLOAD_RETRIES = 3
+# packages prefetched from PyPI at the same time
+PREFETCH_WORKERS = 8
+SETUP_PY_SOURCE_SUFFIXES = ['.py', '.pyx', '.pxd', '.cfg', '.toml', '.in']
+SETUP_PY_FILES_RE = r'^(version|readme|changes|changelog|history|news|' \
+                    r'requirements|about)'
 EXTENSION_SUFFIXES = ['.c', '.cpp']
 MODULE_SUFFIXES = ('.py', '.pyc')
 DOC_FILES_RE = [r'readme.+', r'licens.+', r'copying.+']
@@ -27,6 +69,22 @@ PYPI_USABLE_DATA = ['description', 'summary', 'license',
 PYTHON_INTERPRETER = '/usr/bin/python'
 EXTRACT_DIST_COMMAND_ARGS = ['--quiet', '--command-packages',
                              'pyp2rpm.command', 'extract_dist']
+EXTRACT_DIST_WORKERS = True
+HOMEPAGE_URL_KEYS = ['homepage', 'home', 'source', 'sourcecode',
+                     'repository']
+# extras of wheels which hold requires of the test suite
+TEST_EXTRAS = ['test', 'tests', 'testing']
+# packages and modules automatic discovery of setuptools skips
+AUTO_DISCOVERY_EXCLUDED_PACKAGES = [
+    'ci', 'bin', 'debian', 'doc', 'docs', 'documentation', 'manpages', 'news',
+    'changelog', 'test', 'tests', 'unit_test', 'unit_tests', 'example',
+    'examples', 'scripts', 'tools', 'util', 'utils', 'python', 'build',
+    'dist', 'venv', 'env', 'requirements', 'tasks', 'fabfile', 'site_scons',
+    'benchmark', 'benchmarks', 'exercise', 'exercises', 'htmlcov']
+AUTO_DISCOVERY_EXCLUDED_MODULES = [
+    'setup', 'conftest', 'test', 'tests', 'example', 'examples', 'build',
+    'toxfile', 'noxfile', 'pavement', 'dodo', 'tasks', 'fabfile', 'conanfile',
+    'manage', 'benchmark', 'benchmarks', 'exercise', 'exercises']
 RPM_RICH_DEP_BLACKLIST = ['epel6', 'epel7']
 
 TROVE_LICENSES = {
@@ -0,0 +1,671 @@
+"""Static extraction of metadata from setup.py scripts.
+
+Many setup.py scripts only call setup() with literal arguments, values of
+simple module level constants or contents of files read from the archive.
+SetupPyParser resolves arguments of such scripts without running them.
+"""
+import ast
+import fnmatch
+import json
+import posixpath
+import sys
+
+from pyp2rpm.command.extract_dist import (to_list, to_str,
+                                          SETUP_REQUIRES_EXTRAS)
+from pyp2rpm.exceptions import UnresolvableError
+
+SETUP_FUNCTIONS = ('setuptools.setup', 'distutils.core.setup')
+
+# arguments of setup() the extract_dist command reads
+SETUP_KWARGS = ['setup_requires', 'tests_require', 'install_requires',
+                'extras_require', 'packages', 'py_modules', 'scripts', 'url',
+                'long_description', 'description', 'license', 'classifiers',
+                'entry_points', 'test_suite']
+
+MUTATING_METHODS = ('append', 'extend', 'insert', 'remove', 'pop', 'clear',
+                    'update', 'setdefault', 'popitem', 'add', 'discard',
+                    'sort', 'reverse')
+
+STR_METHODS = ('strip', 'lstrip', 'rstrip', 'split', 'splitlines', 'replace',
+               'lower', 'upper', 'format', 'join', 'decode')
+
+FIND_PACKAGES_DEFAULT_EXCLUDE = ('ez_setup', '*__pycache__')
+
+MAX_CALL_DEPTH = 8
+
+# python 3.8+ parses all literals to ast.Constant, ast.Str is deprecated
+# there (and removed in 3.14), older versions parse strings to ast.Str even
+# though some of them define ast.Constant
+if sys.version_info >= (3, 8):
+    STRING_NODE = ast.Constant
+else:
+    STRING_NODE = ast.Str
+
+
+def requirements_list(requires):
+    """Converts requirements to list the way setuptools does, skips empty
+    lines and comments.
+    """
+    requirements = []
+    for requirement in to_list(requires):
+        if not isinstance(requirement, str):
+            requirements.append(requirement)
+            continue
+        for line in requirement.splitlines():
+            line = line.split(' #')[0].strip()
+            if line and not line.startswith('#'):
+                requirements.append(line)
+    return requirements
+
+
+def metadata_from_setup_kwargs(kwargs):
+    """Creates metadata dictionary of the same shape as the one extract_dist
+    command produces from arguments of setup() function.
+    Args:
+        kwargs: dictionary of arguments of setup() function
+    Returns:
+        dictionary of metadata
+    """
+    metadata = {}
+    for attr in ['setup_requires', 'tests_require', 'packages',
+                 'py_modules', 'scripts']:
+        metadata[attr] = to_list(kwargs.get(attr))
+    metadata['install_requires'] = requirements_list(
+        kwargs.get('install_requires'))
+
+    try:
+        for k, v in (kwargs.get('extras_require') or {}).items():
+            if k in SETUP_REQUIRES_EXTRAS:
+                attr = 'setup_requires'
+            else:
+                attr = 'install_requires'
+            metadata[attr] += requirements_list(v)
+    except (AttributeError, ValueError):
+        # extras require are skipped in case of wrong data format
+        pass
+
+    for attr in ['url', 'long_description', 'description', 'license']:
+        metadata[attr] = to_str(kwargs.get(attr))
+
+    metadata['classifiers'] = to_list(kwargs.get('classifiers'))
+
+    if isinstance(kwargs.get('entry_points'), dict):
+        metadata['entry_points'] = kwargs['entry_points']
+    else:
+        metadata['entry_points'] = None
+
+    metadata['test_suite'] = kwargs.get('test_suite') is not None
+
+    # the same serialization extract_dist uses to pass the data
+    return json.loads(json.dumps(metadata, default=to_str))
+
+
+def find_packages(files, where='.', exclude=(), include=('*',)):
+    """Reimplementation of setuptools.find_packages working with list
+    of files of the archive.
+    Args:
+        files: list of paths of files relative to the directory of setup.py
+        where, exclude, include: arguments of setuptools.find_packages
+    Returns:
+        list of names of the packages found
+    """
+    where = posixpath.normpath(where)
+    if where.startswith(('/', '..')):
+        raise ValueError(where)
+    prefix = '' if where == '.' else where + '/'
+    package_dirs = set(
+        posixpath.dirname(f[len(prefix):]) for f in files
+        if f.startswith(prefix) and posixpath.basename(f) == '__init__.py')
+    exclude = tuple(exclude) + FIND_PACKAGES_DEFAULT_EXCLUDE
+
+    packages = []
+    for directory in sorted(package_dirs):
+        parts = directory.split('/')
+        if not directory or any('.' in part for part in parts):
+            continue
+        parents = ['.'.join(parts[:i]) for i in range(1, len(parts))]
+        if not all(p.replace('.', '/') in package_dirs for p in parents):
+            continue
+        # setuptools doesn't look into excluded package trees
+        if any(p + '*' in exclude or p + '.*' in exclude for p in parents):
+            continue
+        package = '.'.join(parts)
+        if (any(fnmatch.fnmatchcase(package, pat) for pat in include) and
+                not any(fnmatch.fnmatchcase(package, pat)
+                        for pat in exclude)):
+            packages.append(package)
+    return packages
+
+
+def is_main_guard(node):
+    """Finds out if node is `if __name__ == '__main__':` statement."""
+    if not isinstance(node, ast.If) or not isinstance(node.test, ast.Compare):
+        return False
+    operands = [node.test.left] + node.test.comparators
+    names = [o.id for o in operands if isinstance(o, ast.Name)]
+    return names == ['__name__'] and len(operands) == 2
+
+
+def is_string(node):
+    """Returns True if the expression node is a string literal."""
+    if STRING_NODE is ast.Constant:
+        return isinstance(node, ast.Constant) and isinstance(
+            node.value, str)
+    return isinstance(node, STRING_NODE)
+
+
+def with_items(node):
+    """Returns list of (context_expr, optional_vars) tuples of With node."""
+    if hasattr(node, 'items'):
+        return [(item.context_expr, item.optional_vars) for item in node.items]
+    return [(node.context_expr, node.optional_vars)]
+
+
+def argument_names(arguments):
+    return [getattr(arg, 'arg', getattr(arg, 'id', None))
+            for arg in arguments.args]
+
+
+class ArchiveFile(object):
+    """File opened by the setup.py script."""
+
+    def __init__(self, content):
+        self.content = content
+
+    def read(self):
+        return self.content
+
+    def readlines(self):
+        return self.content.splitlines(True)
+
+
+class ArchivePath(object):
+    """pathlib.Path object created by the setup.py script."""
+
+    def __init__(self, path, parser):
+        self.path = path
+        self.parser = parser
+
+    @property
+    def parent(self):
+        return ArchivePath(posixpath.dirname(self.path), self.parser)
+
+    def joinpath(self, *other):
+        return ArchivePath(posixpath.join(self.path, *other), self.parser)
+
+    def resolve(self):
+        return self
+
+    absolute = resolve
+
+    def read_text(self, encoding=None):
+        return self.parser.open(self.path, encoding=encoding).read()
+
+    def read_bytes(self):
+        return self.parser.open(self.path, 'rb').read()
+
+    def open(self, mode='r', buffering=-1, encoding=None):
+        return self.parser.open(self.path, mode, encoding=encoding)
+
+
+class SetupPyParser(object):
+    """Resolves arguments of setup() call in setup.py using ast, without
+    running the script.
+
+    Resolved are literals, module level names bound exactly once and never
+    mutated, open(...).read() and pathlib reads of files from the archive,
+    os.path functions applied to __file__, find_packages() and calls of
+    simple module level functions composed of these.
+    """
+
+    def __init__(self, source, read_file, files=(), filename='setup.py'):
+        """
+        Args:
+            source: source code of the setup.py
+            read_file: function returning raw content of a file given path
+                relative to the directory of setup.py or None if there is
+                no such file
+            files: list of paths of all files in the directory of setup.py
+            filename: name of the setup.py script
+        """
+        self.source = source
+        self.read_file = read_file
+        self.files = files
+        self.filename = filename
+        self.unresolved = []
+        self.depth = 0
+
+    @property
+    def setup_kwargs(self):
+        """Dictionary of resolved arguments of setup() relevant for
+        extract_dist command, names of arguments which couldn't be resolved
+        are stored in self.unresolved.
+        """
+        if not hasattr(self, '_setup_kwargs'):
+            self.unresolved = []
+            try:
+                self._setup_kwargs = self.resolve_setup_kwargs()
+            except UnresolvableError as e:
+                self.unresolved.append(str(e))
+                self._setup_kwargs = {}
+        return self._setup_kwargs
+
+    @property
+    def metadata(self):
+        """Metadata dictionary in the shape extract_dist command produces,
+        incomplete if self.unresolved is not empty.
+        """
+        return metadata_from_setup_kwargs(self.setup_kwargs)
+
+    @property
+    def complete(self):
+        return self.setup_kwargs is not None and not self.unresolved
+
+    def parse(self):
+        try:
+            self.tree = ast.parse(self.source, self.filename)
+        except (SyntaxError, ValueError, TypeError):
+            raise UnresolvableError('setup.py syntax')
+        self.imports = {}
+        self.bindings = {}
+        self.functions = {}
+        self.stores = {}
+        self.mutated = set()
+        self.values = {}
+        self.resolving = set()
+        self.collect_names()
+        self.collect_bindings(self.tree.body)
+
+    def collect_names(self):
+        """Collects imported names, counts bindings of all names and finds
+        out which names are mutated anywhere in the script.
+        """
+        def store(name):
+            self.stores[name] = self.stores.get(name, 0) + 1
+
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.Name):
+                if not isinstance(node.ctx, ast.Load):
+                    store(node.id)
+            elif isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+                store(node.name)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                for alias in node.names:
+                    if isinstance(node, ast.Import):
+                        name = alias.asname or alias.name.split('.')[0]
+                        qualname = alias.asname and alias.name or name
+                    else:
+                        name = alias.asname or alias.name
+                        qualname = '{0}.{1}'.format(node.module, alias.name)
+                    store(name)
+                    self.add_import(name, qualname)
+            elif isinstance(node, ast.Global):
+                self.mutated.update(node.names)
+            elif isinstance(node, ast.Subscript):
+                if (not isinstance(node.ctx, ast.Load) and
+                        isinstance(node.value, ast.Name)):
+                    self.mutated.add(node.value.id)
+            elif isinstance(node, ast.AugAssign):
+                target = node.target
+                while isinstance(target, (ast.Attribute, ast.Subscript)):
+                    target = target.value
+                if isinstance(target, ast.Name):
+                    self.mutated.add(target.id)
+            elif isinstance(node, ast.Call):
+                func = node.func
+                if (isinstance(func, ast.Attribute) and
+                        isinstance(func.value, ast.Name) and
+                        func.attr in MUTATING_METHODS):
+                    self.mutated.add(func.value.id)
+
+    def add_import(self, name, qualname):
+        # try: from setuptools import setup
+        # except ImportError: from distutils.core import setup
+        previous = self.imports.get(name, qualname)
+        if previous != qualname and not (previous in SETUP_FUNCTIONS and
+                                         qualname in SETUP_FUNCTIONS):
+            qualname = None
+        self.imports[name] = qualname
+
+    def collect_bindings(self, statements, context=()):
+        """Collects module level assignments and function definitions,
+        assignments in module level with statements are stored together
+        with the context managers (with open(...) as f: x = f.read()).
+        """
+        for node in statements:
+            if isinstance(node, ast.Assign):
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        self.bindings[target.id] = (node.value, context)
+            elif (getattr(ast, 'AnnAssign', None) and
+                  isinstance(node, ast.AnnAssign) and node.value and
+                  isinstance(node.target, ast.Name)):
+                self.bindings[node.target.id] = (node.value, context)
+            elif isinstance(node, ast.FunctionDef):
+                self.functions[node.name] = node
+            elif isinstance(node, ast.With):
+                self.collect_bindings(node.body, context + tuple(
+                    with_items(node)))
+
+    def bound_once(self, name):
+        return self.stores.get(name) == 1 and name not in self.mutated
+
+    def find_setup_call(self):
+        calls = [node for node in ast.walk(self.tree)
+                 if isinstance(node, ast.Call) and
+                 self.qualname(node.func, {}) in SETUP_FUNCTIONS]
+        if len(calls) != 1:
+            raise UnresolvableError('setup() call')
+
+        statements = list(self.tree.body)
+        for node in self.tree.body:
+            if is_main_guard(node):
+                statements.extend(node.body)
+        if not any(isinstance(node, ast.Expr) and node.value is calls[0]
+                   for node in statements):
+            raise UnresolvableError('setup() call')
+        return calls[0]
+
+    def resolve_setup_kwargs(self):
+        self.parse()
+        call = self.find_setup_call()
+        kwargs = {}
+
+        keywords = list(call.keywords)
+        if getattr(call, 'kwargs', None) is not None:
+            keywords.append(ast.keyword(arg=None, value=call.kwargs))
+        if getattr(call, 'starargs', None) is not None or any(
+                type(arg).__name__ == 'Starred' for arg in call.args):
+            self.unresolved.append('*args')
+
+        for keyword in keywords:
+            if keyword.arg is None:
+                try:
+                    value = self.evaluate(keyword.value, {})
+                    if not isinstance(value, dict):
+                        raise UnresolvableError
+                except UnresolvableError:
+                    self.unresolved.append('**kwargs')
+                    continue
+                kwargs.update((k, v) for k, v in value.items()
+                              if k in SETUP_KWARGS)
+            elif keyword.arg in SETUP_KWARGS:
+                try:
+                    kwargs[keyword.arg] = self.evaluate(keyword.value, {})
+                except UnresolvableError:
+                    self.unresolved.append(keyword.arg)
+        return kwargs
+
+    def qualname(self, node, scope):
+        """Returns qualified name of imported function or builtin node refers
+        to (e.g. os.path.join), None if it refers to something else.
+        """
+        if isinstance(node, ast.Name):
+            if node.id in scope:
+                return None
+            if node.id in self.imports:
+                return self.imports[node.id]
+            if node.id in self.stores:
+                return None
+            return node.id
+        if isinstance(node, ast.Attribute):
+            prefix = self.qualname(node.value, scope)
+            if prefix:
+                return '{0}.{1}'.format(prefix, node.attr)
+        return None
+
+    def evaluate(self, node, scope):
+        """Evaluates expression node.
+        Args:
+            node: ast expression node
+            scope: dictionary of local names and their values
+        Returns:
+            value of the expression
+        Raises:
+            UnresolvableError if the value can't be determined statically
+        """
+        try:
+            return ast.literal_eval(node)
+        except (ValueError, TypeError, SyntaxError):
+            pass
+
+        if isinstance(node, ast.Name):
+            return self.evaluate_name(node.id, scope)
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+            items = []
+            for element in node.elts:
+                if type(element).__name__ == 'Starred':
+                    items.extend(self.evaluate(element.value, scope))
+                else:
+                    items.append(self.evaluate(element, scope))
+            if isinstance(node, ast.Tuple):
+                return tuple(items)
+            return items
+        if isinstance(node, ast.Dict):
+            value = {}
+            for k, v in zip(node.keys, node.values):
+                if k is None:
+                    value.update(self.dict_value(v, scope))
+                else:
+                    value[self.evaluate(k, scope)] = self.evaluate(v, scope)
+            return value
+        if isinstance(node, ast.BinOp):
+            return self.evaluate_binop(node, scope)
+        if isinstance(node, ast.Call):
+            return self.evaluate_call(node, scope)
+        if isinstance(node, ast.Attribute):
+            value = self.evaluate(node.value, scope)
+            if isinstance(value, ArchivePath) and node.attr == 'parent':
+                return value.parent
+        if type(node).__name__ == 'JoinedStr':
+            return ''.join(self.evaluate_formatted(v, scope)
+                           for v in node.values)
+        raise UnresolvableError(type(node).__name__)
+
+    def evaluate_name(self, name, scope):
+        if name in scope:
+            return scope[name]
+        if name == '__file__':
+            return self.filename
+        if name not in self.bindings or not self.bound_once(name):
+            raise UnresolvableError(name)
+        if name not in self.values:
+            if name in self.resolving:
+                raise UnresolvableError(name)
+            self.resolving.add(name)
+            try:
+                value, context = self.bindings[name]
+                with_scope = {}
+                for expr, variable in context:
+                    context_value = self.evaluate(expr, with_scope)
+                    if isinstance(variable, ast.Name):
+                        with_scope[variable.id] = context_value
+                self.values[name] = self.evaluate(value, with_scope)
+            finally:
+                self.resolving.discard(name)
+        return self.values[name]
+
+    def evaluate_formatted(self, node, scope):
+        if type(node).__name__ == 'FormattedValue':
+            if node.conversion not in (-1, None) or node.format_spec:
+                raise UnresolvableError('f-string')
+            return to_str(self.evaluate(node.value, scope))
+        return self.evaluate(node, scope)
+
+    def evaluate_binop(self, node, scope):
+        left = self.evaluate(node.left, scope)
+        right = self.evaluate(node.right, scope)
+        if isinstance(node.op, ast.Div) and isinstance(left, ArchivePath):
+            return left.joinpath(right)
+        try:
+            if isinstance(node.op, ast.Add):
+                return left + right
+            if isinstance(node.op, ast.Mod) and isinstance(left, str):
+                return left % right
+        except TypeError:
+            pass
+        raise UnresolvableError(type(node.op).__name__)
+
+    def dict_value(self, node, scope):
+        value = self.evaluate(node, scope)
+        if not isinstance(value, dict):
+            raise UnresolvableError('**')
+        return value
+
+    def evaluate_call(self, node, scope):
+        if getattr(node, 'starargs', None) or getattr(node, 'kwargs', None):
+            raise UnresolvableError('call')
+        args = []
+        for arg in node.args:
+            if type(arg).__name__ == 'Starred':
+                args.extend(self.evaluate(arg.value, scope))
+            else:
+                args.append(self.evaluate(arg, scope))
+        kwargs = {}
+        for keyword in node.keywords:
+            if keyword.arg is None:
+                kwargs.update(self.dict_value(keyword.value, scope))
+            else:
+                kwargs[keyword.arg] = self.evaluate(keyword.value, scope)
+
+        qualname = self.qualname(node.func, scope)
+        function = self.builtin_functions.get(qualname)
+        if function is not None:
+            try:
+                return function(self, *args, **kwargs)
+            except (TypeError, ValueError, AttributeError):
+                raise UnresolvableError(qualname)
+
+        if (isinstance(node.func, ast.Name) and
+                node.func.id in self.functions and
+                node.func.id not in scope and
+                self.bound_once(node.func.id)):
+            return self.call_function(self.functions[node.func.id],
+                                      args, kwargs)
+
+        if isinstance(node.func, ast.Attribute):
+            return self.call_method(
+                self.evaluate(node.func.value, scope),
+                node.func.attr, args, kwargs)
+        raise UnresolvableError('call')
+
+    def call_method(self, value, method, args, kwargs):
+        if isinstance(value, (ArchiveFile, ArchivePath)):
+            allowed = method in ('read', 'readlines', 'joinpath', 'resolve',
+                                 'absolute', 'read_text', 'read_bytes',
+                                 'open')
+        else:
+            allowed = (method in STR_METHODS and
+                       isinstance(value, (str, bytes)))
+        if not allowed:
+            raise UnresolvableError(method)
+        try:
+            return getattr(value, method)(*args, **kwargs)
+        except (TypeError, ValueError, AttributeError, LookupError):
+            raise UnresolvableError(method)
+
+    def call_function(self, function, args, kwargs):
+        """Calls module level function consisting only of assignments,
+        with statements and return statement.
+        """
+        arguments = function.args
+        if (arguments.vararg or arguments.kwarg or
+                getattr(arguments, 'kwonlyargs', None) or
+                self.depth >= MAX_CALL_DEPTH):
+            raise UnresolvableError(function.name)
+        names = argument_names(arguments)
+        defaults = dict(zip(names[len(names) - len(arguments.defaults):],
+                            arguments.defaults))
+        scope = dict(zip(names, args))
+        for name in names[len(args):]:
+            if name in kwargs:
+                scope[name] = kwargs.pop(name)
+            elif name in defaults:
+                scope[name] = self.evaluate(defaults[name], {})
+            else:
+                raise UnresolvableError(function.name)
+        if kwargs or len(args) > len(names):
+            raise UnresolvableError(function.name)
+
+        self.depth += 1
+        try:
+            returned, value = self.execute(function.body, scope)
+        finally:
+            self.depth -= 1
+        if not returned:
+            raise UnresolvableError(function.name)
+        return value
+
+    def execute(self, statements, scope):
+        """Executes body of a function.
+        Returns:
+            tuple (True, returned value) if return statement was reached,
+            (False, None) otherwise
+        """
+        for index, node in enumerate(statements):
+            if isinstance(node, ast.Return):
+                return True, self.evaluate(node.value, scope)
+            elif isinstance(node, ast.Assign) and all(
+                    isinstance(target, ast.Name) for target in node.targets):
+                value = self.evaluate(node.value, scope)
+                for target in node.targets:
+                    scope[target.id] = value
+            elif isinstance(node, ast.With):
+                for expr, variable in with_items(node):
+                    value = self.evaluate(expr, scope)
+                    if isinstance(variable, ast.Name):
+                        scope[variable.id] = value
+                returned, value = self.execute(node.body, scope)
+                if returned:
+                    return returned, value
+            elif (index == 0 and isinstance(node, ast.Expr) and
+                  is_string(node.value)):
+                continue  # docstring
+            else:
+                raise UnresolvableError(type(node).__name__)
+        return False, None
+
+    def open(self, path, mode='r', buffering=-1, encoding=None, **kwargs):
+        if isinstance(path, ArchivePath):
+            path = path.path
+        path = posixpath.normpath(path)
+        if path.startswith(('/', '..')) or any(m in mode for m in 'wax+'):
+            raise UnresolvableError('open')
+        content = self.read_file(path)
+        if content is None:
+            raise UnresolvableError('open')
+        if 'b' not in mode:
+            try:
+                content = content.decode(encoding or 'utf-8')
+            except (UnicodeDecodeError, LookupError):
+                raise UnresolvableError('open')
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+        return ArchiveFile(content)
+
+    def codecs_open(self, filename, mode='r', encoding=None, *args):
+        return self.open(filename, mode, encoding=encoding)
+
+    def path(self, *segments):
+        segments = [s.path if isinstance(s, ArchivePath) else s
+                    for s in segments]
+        return ArchivePath(posixpath.join(*segments) if segments else '',
+                           self)
+
+    def find_packages(self, where='.', exclude=(), include=('*',)):
+        return find_packages(self.files, where, exclude, include)
+
+    builtin_functions = {
+        'open': open,
+        'io.open': open,
+        'codecs.open': codecs_open,
+        'os.path.join': lambda self, *p: posixpath.join(*p),
+        'os.path.dirname': lambda self, p: posixpath.dirname(p),
+        'os.path.abspath': lambda self, p: p,
+        'os.path.realpath': lambda self, p: p,
+        'os.path.normpath': lambda self, p: posixpath.normpath(p),
+        'os.getcwd': lambda self: '',
+        'pathlib.Path': path,
+        'setuptools.find_packages': find_packages,
+        'dict': lambda self, *args, **kwargs: dict(*args, **kwargs),
+        'list': lambda self, *args: list(*args),
+    }
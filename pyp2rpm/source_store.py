@@ -0,0 +1,145 @@
+import logging
+import os
+import shutil
+import tempfile
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from pyp2rpm import settings
+from pyp2rpm.extraction_cache import file_sha256
+
+logger = logging.getLogger(__name__)
+
+# ioctl cloning content of a file on copy-on-write filesystems (Linux)
+FICLONE = 0x40049409
+
+
+def reflink(source, target):
+    """Creates target sharing content of source on copy-on-write
+    filesystem.
+    Raises:
+        IOError, OSError if the filesystem doesn't support it
+    """
+    if fcntl is None:
+        raise OSError('Reflinks are not supported.')
+    with open(source, 'rb') as s:
+        with open(target, 'wb') as t:
+            try:
+                fcntl.ioctl(t.fileno(), FICLONE, s.fileno())
+            except (IOError, OSError):
+                os.remove(target)
+                raise
+
+
+def place(source, target):
+    """Atomically places content of source file to target, by reflink
+    (copy-on-write clone) if possible, by hardlink otherwise. The file is
+    copied only if both fail (e.g. they are on different filesystems).
+    """
+    if os.path.exists(target) and os.path.samefile(source, target):
+        return
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target) or '.',
+                                     prefix='.tmp-')
+    os.close(fd)
+    os.remove(temp_path)
+    try:
+        for method in (reflink, os.link, shutil.copy2):
+            try:
+                method(source, temp_path)
+                break
+            except (IOError, OSError):
+                if method is shutil.copy2:
+                    raise
+        os.rename(temp_path, target)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class SourceStore(object):
+    """Content-addressed store of package files shared by all runs and save
+    directories. Every file is stored as <sha256>/<filename>, files are
+    verified by the digest when they are taken from the store, so damaged
+    entries are never used. Total size of the entries is kept under
+    max_size bytes, least recently used entries (by modification time of
+    their directories) are evicted first.
+
+    store = SourceStore()
+    if not store.get_to(digest, '/spam/SOURCES/spam-1.0.tar.gz'):
+        download('/spam/SOURCES/spam-1.0.tar.gz')
+        store.add('/spam/SOURCES/spam-1.0.tar.gz', digest)
+    """
+
+    def __init__(self, directory=settings.SOURCE_STORE_DIR,
+                 max_size=settings.SOURCE_STORE_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+
+    def path(self, digest, filename):
+        return os.path.join(self.directory, digest, filename)
+
+    def get_to(self, digest, target):
+        """Places stored file with the digest and name of the target to the
+        target.
+        Returns:
+            True if the file was found in the store, False otherwise
+        """
+        if not digest:
+            return False
+        path = self.path(digest, os.path.basename(target))
+        try:
+            if file_sha256(path) != digest:
+                logger.warning('Damaged source store entry {0}.'.format(
+                    path))
+                shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+                return False
+            place(path, target)
+            # mark the entry as the most recently used
+            os.utime(os.path.dirname(path), None)
+        except (IOError, OSError):
+            return False
+        logger.info('Placed {0} from source store.'.format(target))
+        return True
+
+    def add(self, source, digest):
+        """Stores the file under its digest and evicts the least recently
+        used entries if the store is over its size limit.
+        """
+        path = self.path(digest, os.path.basename(source))
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            place(source, path)
+            self.evict()
+        except (IOError, OSError):
+            logger.warning('Failed to store {0} in source store {1}.'.format(
+                source, self.directory), exc_info=True)
+
+    def entries(self):
+        """Returns list of (modification time, size, path) of the entries,
+        least recently used first.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                size = sum(os.path.getsize(os.path.join(path, f))
+                           for f in os.listdir(path))
+                entries.append((os.stat(path).st_mtime, size, path))
+            except OSError:
+                # removed by concurrent run
+                continue
+        return sorted(entries)
+
+    def evict(self):
+        entries = self.entries()
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in entries:
+            if size <= self.max_size:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            size -= entry_size
+            logger.debug('Evicted source store entry {0}.'.format(path))
@@ -0,0 +1,100 @@
+import logging
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from pyp2rpm import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Stage(object):
+
+    def __init__(self, name, function, requires=()):
+        self.name = name
+        self.function = function
+        self.requires = list(requires)
+
+
+class StageGraph(object):
+    """Dependency graph of stages of a conversion. Every stage runs in
+    a thread of a pool as soon as all the stages it requires are finished,
+    so that independent stages (network requests, subprocesses) overlap.
+    Every stage gets results of the stages it requires as arguments, in
+    the order they are listed in. Results are returned by name, the order
+    they are merged in is up to the caller and doesn't depend on the order
+    the stages finish in.
+
+    graph = StageGraph()
+    graph.add('spam', get_spam)
+    graph.add('eggs', get_eggs)
+    graph.add('ham', make_ham, requires=['spam', 'eggs'])
+    results = graph.run()
+    """
+
+    def __init__(self, workers=settings.STAGE_WORKERS):
+        self.workers = workers
+        self.stages = []
+
+    def add(self, name, function, requires=()):
+        for required in requires:
+            if required not in self.names:
+                raise ValueError(
+                    'Stage {0} requires unknown stage {1}.'.format(
+                        name, required))
+        self.stages.append(Stage(name, function, requires))
+
+    @property
+    def names(self):
+        return [stage.name for stage in self.stages]
+
+    def run(self):
+        """Runs all the stages, the first exception raised by any of them is
+        re-raised once the running stages finish.
+        Returns:
+            dictionary of results of the stages
+        """
+        results = {}
+        pending = list(self.stages)
+        running = set()
+        finished = queue.Queue()
+        error = None
+        pool = ThreadPool(max(1, min(self.workers, len(self.stages))))
+        try:
+            while running or (pending and error is None):
+                # stages are started in the order they were added in, none
+                # after a failure
+                ready = [s for s in pending if error is None and all(
+                    r in results for r in s.requires)]
+                for stage in ready:
+                    pending.remove(stage)
+                    running.add(stage.name)
+                    pool.apply_async(self.run_stage, (
+                        stage, [results[r] for r in stage.requires],
+                        finished))
+                name, result, exc_info = finished.get()
+                running.remove(name)
+                if exc_info is not None and error is None:
+                    error = exc_info
+                results[name] = result
+        finally:
+            pool.close()
+            pool.join()
+        if error is not None:
+            raise error[1]
+        return results
+
+    @staticmethod
+    def run_stage(stage, args, finished):
+        start = time.time()
+        try:
+            result, exc_info = stage.function(*args), None
+        except BaseException:
+            result, exc_info = None, sys.exc_info()
+        logger.debug('Stage {0} finished in {1:.2f} s.'.format(
+            stage.name, time.time() - start))
+        finished.put((stage.name, result, exc_info))
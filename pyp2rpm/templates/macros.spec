@@ -1,6 +1,6 @@
-{# prints a single dependency for a specific python version #}
-{%- macro one_dep(dep, python_version) %}
-{{ dep[0] }}:{{ ' ' * (15 - dep[0]|length) }}{{ dep[2].format(name=dep[1]|name_for_python_version(python_version, True)) }}
+{# prints a single dependency, its name is already versioned by deps_for_python_version #}
+{%- macro one_dep(dep) %}
+{{ dep[0] }}:{{ ' ' * (15 - dep[0]|length) }}{{ dep[2].format(name=dep[1]) }}
 {%- endmacro %}
 
 {# Prints given deps (runtime or buildtime for given python_version,
@@ -13,10 +13,8 @@ use_with=True) %}
 {%- if python_version != base_python_version and use_with %}
 %if 0%{?with_python{{ python_version }}}
 {%- endif %}
-{%- for dep in deps -%}
-{%- if python_version == base_python_version or not 'sphinx' in dep[1] -%}
-{{ one_dep(dep, python_version) }}
-{%- endif -%}
+{%- for dep in deps|deps_for_python_version(python_version, base_python_version) -%}
+{{ one_dep(dep) }}
 {%- endfor %}
 {%- if python_version != base_python_version and use_with %}
 %endif # if with_python{{ python_version }}
@@ -1,31 +1,26 @@
+import errno
 import os
 import glob
+import json
 import logging
 import pprint
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
 
 from virtualenvapi.manage import VirtualEnvironment
 import virtualenvapi.exceptions as ve
 
 from pyp2rpm.exceptions import VirtualenvFailException
-from pyp2rpm.settings import DEFAULT_PYTHON_VERSION, MODULE_SUFFIXES
+from pyp2rpm.file_layout import layout_data
+from pyp2rpm.settings import (DEFAULT_PYTHON_VERSION, VENV_POOL_DIR,
+                              VENV_POOL_SIZE)
 
 logger = logging.getLogger(__name__)
 
 
-def site_packages_filter(site_packages_list):
-    '''Removes wheel .dist-info files'''
-    return set([x for x in site_packages_list if not x.endswith(
-        ('.egg-info', '.dist-info', '.pth', '__pycache__', '.pyc'))])
-
-
-def scripts_filter(scripts):
-    '''
-    Removes .pyc files and __pycache__ from scripts
-    '''
-    return [x for x in scripts if not x.split('.')[-1] == 'pyc' and
-            not x == '__pycache__']
-
-
 class DirsContent(object):
     '''
     Object to store and compare directory content before and
@@ -57,26 +52,243 @@ class DirsContent(object):
         return result
 
 
+def python_command(base_python_version):
+    return 'python' + (base_python_version or DEFAULT_PYTHON_VERSION)
+
+
+def create_venv(path, python):
+    env = VirtualEnvironment(path, python=python)
+    try:
+        env.open_or_create()
+    except (ve.VirtualenvCreationException,
+            ve.VirtualenvReadonlyException):
+        raise VirtualenvFailException('Failed to create virtualenv')
+    return env
+
+
+def open_venv(path, python):
+    '''
+    Opens existing virtualenv without checking it, virtualenvapi runs pip
+    as bin/python -m pip, so the virtualenv may have been moved and its
+    scripts (bin/pip, bin/activate) may point to its original path
+    '''
+    env = VirtualEnvironment(path, python=python)
+    # open_or_create() would only check that bin/pip exists
+    env._ready = True
+    return env
+
+
+def process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+class VenvPool(object):
+    '''
+    Pool of virtualenvs of one Python interpreter. The "golden" virtualenv
+    is created only once, every conversion gets its clone (copied with
+    reflinks where the filesystem supports them) together with content
+    of its directories before installation, which is the same for all the
+    clones. A few clones are kept ready, so that getting one costs just
+    a rename. The virtualenvs are created in temporary directories and
+    moved, so scripts in them point to paths which don't exist anymore,
+    they are only used through their bin/python (see open_venv).
+    '''
+    pools = {}
+    snapshot_name = 'pyp2rpm-dirs-content.json'
+
+    def __init__(self, python, directory=VENV_POOL_DIR, size=VENV_POOL_SIZE):
+        self.python = python
+        self.directory = os.path.join(directory, python)
+        self.golden = os.path.join(self.directory, 'golden')
+        self.ready = os.path.join(self.directory, 'ready')
+        self.size = size
+        self.refill_thread = None
+        self._snapshot = None
+
+    @classmethod
+    def for_python(cls, python):
+        '''
+        Returns the pool of given interpreter, one per process, or None
+        if the pool is disabled or can't be used
+        '''
+        if not VENV_POOL_SIZE:
+            return None
+        if python not in cls.pools:
+            pool = cls(python)
+            try:
+                if not os.path.isdir(pool.directory):
+                    os.makedirs(pool.directory)
+            except OSError:
+                logger.warning('Virtualenv pool directory {0} is not '
+                               'writable.'.format(pool.directory))
+                pool = None
+            cls.pools[python] = pool
+        return cls.pools[python]
+
+    def mkdtemp(self):
+        '''
+        Creates temporary directory on the same filesystem as the ready
+        clones are, so that they can be moved there, named after the
+        process to be removed once the process is gone
+        '''
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        return tempfile.mkdtemp(dir=self.directory,
+                                prefix='.work-{0}-'.format(os.getpid()))
+
+    def remove_stale(self):
+        '''
+        Removes temporary directories of processes which exited without
+        removing them, e.g. in the middle of refill
+        '''
+        for name in os.listdir(self.directory):
+            match = re.match(r'^\.work-(\d+)-', name)
+            if match and not process_exists(int(match.group(1))):
+                logger.debug('Removing stale directory {0}.'.format(name))
+                shutil.rmtree(os.path.join(self.directory, name),
+                              ignore_errors=True)
+
+    @property
+    def snapshot(self):
+        '''
+        DirsContent of the golden virtualenv
+        '''
+        if self._snapshot is None:
+            with open(os.path.join(self.golden, self.snapshot_name)) as f:
+                content = json.load(f)
+            self._snapshot = DirsContent(set(content['bindir']),
+                                         set(content['lib_sitepackages']))
+        return self._snapshot
+
+    @property
+    def golden_usable(self):
+        # python of the virtualenv is a link to the system one
+        return (os.path.exists(os.path.join(self.golden, 'bin', 'python')) and
+                os.path.isfile(os.path.join(self.golden, self.snapshot_name)))
+
+    def create_golden(self):
+        '''
+        Creates the golden virtualenv unless there is a usable one already
+        '''
+        if self.golden_usable:
+            return
+        temp_dir = self.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, 'venv')
+            create_venv(path, self.python)
+            content = DirsContent()
+            content.fill(path + '/')
+            with open(os.path.join(path, self.snapshot_name), 'w') as f:
+                json.dump({'bindir': sorted(content.bindir),
+                           'lib_sitepackages': sorted(
+                               content.lib_sitepackages)}, f)
+            if os.path.isdir(self.golden) and not self.golden_usable:
+                logger.info('Replacing broken virtualenv {0}.'.format(
+                    self.golden))
+                shutil.rmtree(self.golden)
+                shutil.rmtree(self.ready, ignore_errors=True)
+            try:
+                os.rename(path, self.golden)
+            except OSError:
+                # created by concurrent run meanwhile
+                if not self.golden_usable:
+                    raise
+        except OSError as e:
+            raise VirtualenvFailException(
+                'Failed to create virtualenv {0}: {1}'.format(
+                    self.golden, e))
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def clone(self, target):
+        try:
+            subprocess.check_call(['cp', '-a', '--reflink=auto',
+                                   self.golden, target])
+        except (OSError, subprocess.CalledProcessError):
+            # cp without --reflink support
+            shutil.rmtree(target, ignore_errors=True)
+            shutil.copytree(self.golden, target, symlinks=True)
+
+    @property
+    def ready_clones(self):
+        if not os.path.isdir(self.ready):
+            return []
+        return [os.path.join(self.ready, name)
+                for name in sorted(os.listdir(self.ready))]
+
+    def get(self, target):
+        '''
+        Moves one of the ready clones to target path or clones the golden
+        virtualenv there if there is none, refills the pool in background
+        Returns:
+            DirsContent of the virtualenv
+        '''
+        self.create_golden()
+        for clone in self.ready_clones:
+            try:
+                os.rename(clone, target)
+                logger.debug('Using ready virtualenv {0}.'.format(clone))
+                break
+            except OSError:
+                # taken by concurrent run
+                continue
+        else:
+            self.clone(target)
+        self.refill()
+        return self.snapshot
+
+    def refill(self):
+        if self.refill_thread is None or not self.refill_thread.is_alive():
+            # exiting doesn't wait for the refill, clones are built in
+            # temporary directories and only complete ones are moved to the
+            # ready ones
+            self.refill_thread = threading.Thread(target=self.fill)
+            self.refill_thread.daemon = True
+            self.refill_thread.start()
+
+    def fill(self):
+        '''
+        Clones the golden virtualenv until there are enough ready clones
+        '''
+        try:
+            self.remove_stale()
+            if not os.path.isdir(self.ready):
+                os.makedirs(self.ready)
+            while len(self.ready_clones) < self.size:
+                temp_dir = self.mkdtemp()
+                try:
+                    self.clone(os.path.join(temp_dir, 'venv'))
+                    os.rename(os.path.join(temp_dir, 'venv'), os.path.join(
+                        self.ready, 'venv' + os.path.basename(
+                            temp_dir)[len('.work'):]))
+                finally:
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+        except (OSError, shutil.Error):
+            logger.warning('Failed to refill virtualenv pool {0}.'.format(
+                self.directory), exc_info=True)
+
+
 class VirtualEnv(object):
 
     def __init__(self, name, temp_dir, name_convertor,
-                 base_python_version):
+                 base_python_version, pool=None):
         self.name = name
         self.temp_dir = temp_dir
         self.name_convertor = name_convertor
-        if not base_python_version:
-            base_python_version = DEFAULT_PYTHON_VERSION
-        python_version = 'python' + base_python_version
-        self.env = VirtualEnvironment(temp_dir + '/venv',
-                                      python=python_version)
-        try:
-            self.env.open_or_create()
-        except (ve.VirtualenvCreationException,
-                ve.VirtualenvReadonlyException):
-            raise VirtualenvFailException('Failed to create virtualenv')
-        self.dirs_before_install = DirsContent()
+        python_version = python_command(base_python_version)
+        if pool is not None:
+            # ready clone with already known content
+            self.dirs_before_install = pool.get(temp_dir + '/venv')
+            self.env = open_venv(temp_dir + '/venv', python_version)
+        else:
+            self.env = create_venv(temp_dir + '/venv', python_version)
+            self.dirs_before_install = DirsContent()
+            self.dirs_before_install.fill(temp_dir + '/venv/')
         self.dirs_after_install = DirsContent()
-        self.dirs_before_install.fill(temp_dir + '/venv/')
         self.data = {}
 
     def install_package_to_venv(self):
@@ -103,16 +315,7 @@ class VirtualEnv(object):
         except ValueError:
             raise VirtualenvFailException(
                 "Some of the DirsContent attributes is uninicialized")
-        self.data['has_pth'] = \
-            any([x for x in diff.lib_sitepackages if x.endswith('.pth')])
-
-        site_packages = site_packages_filter(diff.lib_sitepackages)
-        self.data['packages'] = sorted(
-            [p for p in site_packages if not p.endswith(MODULE_SUFFIXES)])
-        self.data['py_modules'] = sorted(set(
-            [os.path.splitext(m)[0] for m in site_packages - set(
-                self.data['packages'])]))
-        self.data['scripts'] = scripts_filter(sorted(diff.bindir))
+        self.data = layout_data(diff.bindir, diff.lib_sitepackages)
         logger.debug('Data from files differance in virtualenv:')
         logger.debug(pprint.pformat(self.data))
 
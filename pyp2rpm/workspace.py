@@ -0,0 +1,87 @@
+import logging
+import os
+import shutil
+import tempfile
+
+from pyp2rpm import archive
+
+logger = logging.getLogger(__name__)
+
+
+class Workspace(object):
+    """Files shared by all stages of one conversion, so that none of them
+    has to open, extract or copy the package file again: the opened
+    archives, the tree the package archive is extracted to and everything
+    else the stages store in the workspace directory. All of it is removed
+    at once by cleanup() (or at the end of with statement).
+
+    workspace = Workspace()
+    with workspace:
+        archive = workspace.archive('/spam/spam-1.0.tar.gz')
+        directory = workspace.source_tree(archive)
+    """
+
+    def __init__(self):
+        self._directory = None
+        self.archives = {}
+        self.source_tree_complete = False
+
+    @property
+    def directory(self):
+        """Temporary directory of the workspace, created on first access."""
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix='pyp2rpm-')
+            logger.debug('Created workspace {0}.'.format(self._directory))
+        return self._directory
+
+    def path(self, *names):
+        return os.path.join(self.directory, *names)
+
+    def mkdtemp(self):
+        """Creates new temporary directory inside the workspace."""
+        return tempfile.mkdtemp(dir=self.directory)
+
+    def archive(self, local_file):
+        """Returns Archive of the file, the archive is opened on the first
+        call only and stays open (with its content cache) until cleanup.
+        """
+        if local_file not in self.archives:
+            self.archives[local_file] = archive.Archive(
+                local_file).__enter__()
+        return self.archives[local_file]
+
+    def source_tree(self, archive, members=None):
+        """Extracts given members of the archive (all of them by default)
+        unless the whole archive was extracted already.
+        Args:
+            archive: opened Archive of the package
+            members: list of TarInfo or ZipInfo objects to extract
+        Returns:
+            path to the directory the archive is extracted to
+        """
+        directory = self.path('source')
+        if not self.source_tree_complete:
+            archive.extract_all(directory=directory, members=members)
+            self.source_tree_complete = members is None
+        return directory
+
+    def cleanup(self):
+        """Closes the archives and removes the workspace directory."""
+        for opened in self.archives.values():
+            opened.__exit__(None, None, None)
+        self.archives = {}
+        self.source_tree_complete = False
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            logger.debug('Removed workspace {0}.'.format(self._directory))
+            self._directory = None
+
+    def __del__(self):
+        if self._directory is not None and os.path.exists(self._directory):
+            shutil.rmtree(self._directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.cleanup()
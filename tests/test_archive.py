@@ -5,7 +5,10 @@ from zipfile import ZipFile
 
 import pytest
 
-from pyp2rpm.archive import Archive, flat_list
+from flexmock import flexmock
+
+from pyp2rpm import settings
+from pyp2rpm.archive import Archive, ContentCache, flat_list
 
 
 @pytest.mark.parametrize(('arg', 'expected'), [
@@ -103,3 +106,121 @@ class TestArchive(object):
     def test_get_directories_re(self, i, r, f, c, expected):
         with self.a[i] as a:
             assert set(a.get_directories_re(r, f, c)) == set(expected)
+
+    @pytest.mark.parametrize(('i', 'n', 'expected'), [
+        (0, 'plumbum-0.9.0/setup.py', True),
+        (0, 'setup.py', False),
+        (0, 'plumbum-0.9.0/plumbum', False),  # directory
+        (1, 'pytest-2.2.3/doc/conf.py', True),
+        (4, 'in_unextractable', False),
+    ])
+    def test_has_file(self, i, n, expected):
+        with self.a[i] as a:
+            assert a.has_file(n) == expected
+
+    @pytest.mark.parametrize(('i', 'expected'), [
+        (0, 'plumbum-0.9.0'),
+        (1, 'pytest-2.2.3'),
+    ])
+    def test_top_directory(self, i, expected):
+        with self.a[i] as a:
+            assert a.top_directory == expected
+
+    def test_index_built_once(self):
+        with self.a[0] as a:
+            index = a.index
+            assert len(index.files) < len(index.members)
+        with self.a[0] as a:
+            assert a.index is index
+            assert a.get_files_re(r'PKG-INFO')
+
+    @pytest.mark.parametrize(('i', 'captured'), [
+        (0, ['plumbum-0.9.0/setup.cfg', 'plumbum-0.9.0/setup.py',
+             'plumbum-0.9.0/PKG-INFO',
+             'plumbum-0.9.0/plumbum.egg-info/PKG-INFO']),
+        (1, []),  # zip archives are not scanned
+        (3, []),
+    ])
+    def test_scan_captured_files(self, i, captured):
+        with self.a[i] as a:
+            assert sorted(a.index.captured) == sorted(captured)
+        # the captured files live as long as the index
+        assert sorted(a.index.captured) == sorted(captured)
+
+    def test_scan_file_size_limit(self, monkeypatch):
+        monkeypatch.setattr(settings, 'ARCHIVE_SCAN_FILE_SIZE', 100)
+        with self.a[0] as a:
+            assert 'plumbum-0.9.0/setup.cfg' in a.index.captured
+            assert 'plumbum-0.9.0/setup.py' not in a.index.captured
+            assert a.get_content_of_file('setup.py').startswith('#!')
+
+    def test_scan_capture_size_limit(self, monkeypatch):
+        monkeypatch.setattr(settings, 'ARCHIVE_SCAN_CAPTURE_SIZE', 100)
+        with self.a[0] as a:
+            assert a.index.captured_size <= 100
+            assert a.index.captured == {
+                'plumbum-0.9.0/setup.cfg': a.get_content_of_file(
+                    'setup.cfg', raw=True)}
+
+    def test_captured_content_after_reopen(self):
+        with self.a[0] as a:
+            pass
+        with self.a[0] as a:
+            flexmock(a.handle).should_receive('extractfile').never()
+            assert a.get_content_of_file('setup.py').startswith('#!')
+            assert a.get_content_of_file('PKG-INFO')
+
+    def test_captured_content_does_not_touch_stream(self):
+        with self.a[0] as a:
+            flexmock(a.handle).should_receive('extractfile').never()
+            assert a.get_content_of_file('setup.cfg').startswith('[egg_info]')
+
+    def test_extract_all_scanned(self, tmpdir):
+        with self.a[0] as a:
+            a.extract_all(directory=str(tmpdir))
+        assert tmpdir.join('plumbum-0.9.0', 'setup.py').check(file=1)
+        assert tmpdir.join('plumbum-0.9.0', 'plumbum').check(dir=1)
+
+    def test_content_cache(self):
+        with self.a[1] as a:
+            name = 'pytest-2.2.3/pytest.egg-info/requires.txt'
+            flexmock(a.handle).should_call('extractfile').once()
+            assert a.get_content_of_file(name, True) == 'py>=1.4.7.dev2'
+            assert a.get_content_of_file(name, True, raw=True) == \
+                b'py>=1.4.7.dev2'
+            assert (a.content_cache.hits, a.content_cache.misses) == (1, 1)
+        assert len(a.content_cache) == 0
+
+    def test_nested_with(self):
+        flexmock(self.a[1]).should_call('open').once()
+        with self.a[1] as a:
+            handle = a.handle
+            with self.a[1] as nested:
+                assert nested.handle is handle
+            assert a.handle is handle
+        assert self.a[1].handle is None
+
+
+class TestContentCache(object):
+
+    def test_lru_eviction(self):
+        cache = ContentCache(max_size=10)
+        cache.put('a', b'1234')
+        cache.put('b', b'1234')
+        cache.get('a')
+        cache.put('c', b'1234')
+        assert 'a' in cache and 'c' in cache and 'b' not in cache
+        assert cache.size == 8
+
+    def test_too_big_content(self):
+        cache = ContentCache(max_size=10)
+        cache.put('a', b'12345678901')
+        assert cache.get('a') is None
+        assert (cache.hits, cache.misses, cache.size) == (0, 1, 0)
+
+    def test_replace_content(self):
+        cache = ContentCache(max_size=10)
+        cache.put('a', b'1234')
+        cache.put('a', b'12')
+        assert cache.get('a') == b'12'
+        assert cache.size == 2
@@ -0,0 +1,269 @@
+import hashlib
+import json
+import os
+import threading
+import time
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib2 import HTTPError
+    from urlparse import urlsplit
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.error import HTTPError
+    from urllib.parse import urlsplit
+
+import pytest
+
+from pyp2rpm import settings
+from pyp2rpm.connection_pool import ConnectionPool
+from pyp2rpm.exceptions import DigestMismatchException
+from pyp2rpm.convertor import PyPIClient
+from pyp2rpm.http_cache import HTTPCache
+
+BODY = json.dumps({'info': {'name': 'spam'}, 'urls': [],
+                   'releases': {'0.1': []}}).encode('utf-8')
+FILE = b''.join(str(i).encode('ascii') for i in range(100000))
+DIGESTS = {'md5': hashlib.md5(FILE).hexdigest(),
+           'sha256': hashlib.sha256(FILE).hexdigest()}
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Stand-in of PyPI, counts connections it accepts and paths of the
+    requests it gets.
+    """
+    protocol_version = 'HTTP/1.1'
+    # idle connections are closed by the server
+    timeout = 0.5
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        self.server.paths.append(self.path)
+        if path.startswith('/redirect'):
+            self.reply(301, b'', Location='/pypi/spam/json')
+        elif path == '/close':
+            self.reply(200, BODY, Connection='close')
+        elif path in ('/file', '/flaky', '/norange'):
+            self.reply_file(path)
+        elif path.endswith('/json') and 'spam' in path:
+            if self.headers.get('If-None-Match') == '"spam"':
+                self.server.not_modified += 1
+                self.reply(304, b'')
+            else:
+                self.reply(200, BODY, ETag='"spam"')
+        else:
+            self.reply(404, b'Not Found')
+
+    def reply_file(self, path):
+        """Serves byte ranges of FILE, /norange ignores them, /flaky drops
+        the connection in the middle of the first response.
+        """
+        offset = 0
+        requested = self.headers.get('Range')
+        if requested and path != '/norange':
+            offset = int(requested.split('=')[1].rstrip('-'))
+        if offset >= len(FILE):
+            return self.reply(416, b'')
+        if path == '/flaky' and not self.server.dropped:
+            self.server.dropped = True
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(FILE)))
+            self.end_headers()
+            self.wfile.write(FILE[:len(FILE) // 2])
+            self.close_connection = True
+            return
+        if offset:
+            self.reply(206, FILE[offset:], **{
+                'Content-Range': 'bytes {0}-{1}/{2}'.format(
+                    offset, len(FILE) - 1, len(FILE))})
+        else:
+            self.reply(200, FILE)
+
+    def reply(self, status, body, **headers):
+        self.send_response(status)
+        if status != 304:
+            self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def server():
+    server = Server(('127.0.0.1', 0), Handler)
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.paths = []
+    server.not_modified = 0
+    server.dropped = False
+    server.url = 'http://127.0.0.1:{0}'.format(server.server_address[1])
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def pool():
+    pool = ConnectionPool(size=2, timeout=5)
+    yield pool
+    pool.close()
+
+
+class TestConnectionPool(object):
+
+    def test_connection_is_reused(self, server, pool):
+        for _ in range(10):
+            with pool.open(server.url + '/pypi/spam/json') as response:
+                assert response.read() == BODY
+        assert server.connections == pool.connections_made == 1
+
+    def test_unread_response_closes_connection(self, server, pool):
+        with pool.open(server.url + '/file') as response:
+            response.read(10)
+        with pool.open(server.url + '/file') as response:
+            assert response.read() == FILE
+        assert server.connections == 2
+
+    def test_connection_close(self, server, pool):
+        for _ in range(2):
+            with pool.open(server.url + '/close') as response:
+                response.read()
+        assert server.connections == 2
+
+    def test_parallel_requests(self, server, pool):
+        def get():
+            for _ in range(5):
+                with pool.open(server.url + '/pypi/spam/json') as response:
+                    response.read()
+
+        threads = [threading.Thread(target=get) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert server.paths == ['/pypi/spam/json'] * 20
+        assert server.connections <= 4
+        assert len(pool.idle[('http', '127.0.0.1',
+                              server.server_address[1])]) <= 2
+
+    def test_redirect(self, server, pool):
+        with pool.open(server.url + '/redirect') as response:
+            assert response.read() == BODY
+        assert server.paths == ['/redirect', '/pypi/spam/json']
+        assert server.connections == 1
+
+    def test_error(self, server, pool):
+        with pytest.raises(HTTPError) as exc_info:
+            pool.open(server.url + '/pypi/eggs/json')
+        assert exc_info.value.code == 404
+        with pool.open(server.url + '/pypi/spam/json') as response:
+            response.read()
+        assert server.connections == 1
+
+    def test_idle_connection_closed_by_server(self, server, pool):
+        with pool.open(server.url + '/pypi/spam/json') as response:
+            response.read()
+        time.sleep(1)
+        with pool.open(server.url + '/pypi/spam/json') as response:
+            assert response.read() == BODY
+        assert server.connections == 2
+
+    def test_retrieve(self, server, pool, tmpdir):
+        filename = str(tmpdir.join('spam-0.1.tar.gz'))
+        assert pool.retrieve(server.url + '/file', filename,
+                             DIGESTS) == DIGESTS
+        with open(filename, 'rb') as f:
+            assert f.read() == FILE
+        assert os.listdir(str(tmpdir)) == ['spam-0.1.tar.gz']
+
+    @pytest.mark.parametrize(('path', 'part', 'expected_paths'), [
+        ('/file', FILE[:1000], ['/file']),
+        ('/norange', FILE[:1000], ['/norange']),
+        ('/norange', b'eggs', ['/norange']),
+        ('/file', FILE, ['/file', '/file']),
+        ('/flaky', b'', ['/flaky', '/flaky']),
+    ])
+    def test_retrieve_resume(self, server, pool, tmpdir, path, part,
+                             expected_paths):
+        filename = str(tmpdir.join('spam-0.1.tar.gz'))
+        if part:
+            tmpdir.join('spam-0.1.tar.gz.part').write(part, mode='wb')
+        assert pool.retrieve(server.url + path, filename) == DIGESTS
+        with open(filename, 'rb') as f:
+            assert f.read() == FILE
+        assert [p for p in server.paths] == expected_paths
+
+    def test_retrieve_digest_mismatch(self, server, pool, tmpdir):
+        filename = str(tmpdir.join('spam-0.1.tar.gz'))
+        with pytest.raises(DigestMismatchException):
+            pool.retrieve(server.url + '/file', filename,
+                          {'sha256': DIGESTS['sha256'], 'md5': 'spam'})
+        assert os.listdir(str(tmpdir)) == []
+
+    def test_proxy(self, server):
+        pool = ConnectionPool(proxy=server.url.split('://')[1])
+        with pool.open('http://pypi.invalid/pypi/spam/json') as response:
+            assert response.read() == BODY
+        assert server.paths == ['http://pypi.invalid/pypi/spam/json']
+
+
+class TestPyPIClient(object):
+
+    def test_lookups_and_downloads_share_connection(self, server, tmpdir,
+                                                    monkeypatch):
+        monkeypatch.setattr(settings, 'PYPI_URL', server.url + '/pypi')
+        client = PyPIClient()
+        assert list(client.package_releases('spam', True)) == ['0.1']
+        assert client.release_data('spam', '0.1') == {'name': 'spam'}
+        assert client.release_urls('eggs', '0.1') == []
+        client.download(server.url + '/file',
+                        str(tmpdir.join('spam-0.1.tar.gz')))
+        assert server.connections == 1
+
+    def test_download_once(self, server, tmpdir):
+        client = PyPIClient()
+        filename = str(tmpdir.join('spam-0.1.tar.gz'))
+        client.download(server.url + '/file', filename)
+        client.download(server.url + '/file', filename)
+        assert server.paths == ['/file']
+
+    def test_http_cache(self, server, tmpdir, monkeypatch):
+        monkeypatch.setattr(settings, 'PYPI_URL', server.url + '/pypi')
+        http_cache = HTTPCache(str(tmpdir), ttl=60)
+        PyPIClient(http_cache=http_cache).release_data('spam', '0.1')
+        # fresh response is used without asking the server
+        client = PyPIClient(http_cache=http_cache)
+        assert client.release_data('spam', '0.1') == {'name': 'spam'}
+        assert server.connections == 1
+        # stale response is revalidated
+        http_cache.ttl = 0
+        client = PyPIClient(http_cache=http_cache)
+        assert client.release_data('spam', '0.1') == {'name': 'spam'}
+        assert server.paths == ['/pypi/spam/0.1/json'] * 2
+        assert server.not_modified == 1
+
+    def test_http_cache_offline(self, server, tmpdir, monkeypatch):
+        monkeypatch.setattr(settings, 'PYPI_URL', server.url + '/pypi')
+        http_cache = HTTPCache(str(tmpdir), ttl=0)
+        PyPIClient(http_cache=http_cache).release_data('spam', '0.1')
+        server.shutdown()
+        server.server_close()
+        client = PyPIClient(http_cache=http_cache)
+        assert client.release_data('spam', '0.1') == {'name': 'spam'}
@@ -1,5 +1,7 @@
+import logging
 import pytest
 import os
+import re
 
 from flexmock import flexmock
 
@@ -8,11 +10,21 @@ from pyp2rpm.exceptions import NoSuchPackageException
 from pyp2rpm.metadata_extractors import (SetupPyMetadataExtractor,
                                          WheelMetadataExtractor)
 from pyp2rpm.package_getters import PypiDownloader, LocalFileGetter
+from pyp2rpm import name_convertor, repo_index
+from pyp2rpm.name_convertor import (AutoProvidesNameConvertor,
+                                    DandifiedNameConvertor)
 from pyp2rpm.package_data import PackageData
+from pyp2rpm.repo_index import repository_provides
+from pyp2rpm.workspace import Workspace
 
 tests_dir = os.path.split(os.path.abspath(__file__))[0]
 
 
+def warnings(caplog):
+    return [record.getMessage() for record in caplog.records
+            if record.levelno == logging.WARNING]
+
+
 class TestConvertor(object):
     td_dir = '{0}/test_data/'.format(tests_dir)
     client = flexmock(package_releases=lambda n, hidden: n == 'spam' and ['0.1'] or [])
@@ -122,3 +134,85 @@ class TestConvertor(object):
         data = PackageData('pkg.tar.gz', 'pkg', 'pkg', '0.1')
         with pytest.raises(SystemExit):
             c.merge_versions(data)
+
+    def test_convert_shares_workspace(self, tmpdir):
+        c = Convertor(package='{0}utest-0.1.0.tar.gz'.format(self.td_dir),
+                      save_dir=str(tmpdir), venv=False, cache=False)
+        flexmock(Workspace).should_call('cleanup').once()
+        assert c.convert()
+        assert c.metadata_extractor.workspace is c.workspace
+        assert c.workspace.archives == {}
+
+    def test_shared_client(self):
+        client = flexmock()
+        assert Convertor(package='spam', client=client).client is client
+        assert Convertor(package='{0}utest-0.1.0.tar.gz'.format(self.td_dir),
+                         client=client).client is not client
+
+    def test_repodata_name_convertor(self, tmpdir):
+        repo_dir = '{0}repo'.format(self.td_dir)
+        names = repo_index.repository_names([repo_dir], str(tmpdir))
+        flexmock(repo_index).should_receive('repository_names').with_args(
+            [repo_dir]).and_return(names).once()
+        c = Convertor(package='spam', autonc=False, repodata=[repo_dir])
+        assert isinstance(c.name_convertor, DandifiedNameConvertor)
+        assert c.name_convertor.rpm_name('Jinja2', '3') == 'python3-jinja2'
+
+    @pytest.mark.parametrize('template', ['fedora.spec', 'epel6.spec',
+                                          'epel7.spec', 'mageia.spec'])
+    def test_required_names_rendered(self, template):
+        c = Convertor(package='spam', template=template)
+        data = PackageData('spam-0.1.tar.gz', 'spam', 'python-spam', '0.1')
+        data.base_python_version = '3'
+        data.python_versions = ['2']
+        data.build_deps = [['BuildRequires', 'python2-devel', '{name}'],
+                           ['BuildRequires', 'python-sphinx', '{name}'],
+                           ['BuildRequires', 'python-eggs', '{name} >= 1']]
+        data.runtime_deps = [['Requires', 'python-six', '{name}']]
+        spec = c.jinja_template().render(data=data,
+                                         name_convertor=name_convertor)
+        rendered = re.findall(r'^(?:Build)?Requires:\s+(\S+)', spec,
+                              re.MULTILINE)
+        assert sorted(c.required_names(data)) == sorted(rendered)
+
+    def test_report_unresolvable(self, tmpdir, caplog):
+        c = Convertor(package='spam', autonc=True)
+        c._name_convertor = AutoProvidesNameConvertor(
+            'fedora', repository_provides(['{0}repo'.format(self.td_dir)],
+                                          str(tmpdir)))
+        data = PackageData('spam-0.1.tar.gz', 'spam', 'python-spam', '0.1')
+        data.base_python_version = '3'
+        data.runtime_deps = [['Requires', 'python3dist(babel)'],
+                             ['Requires', 'python3dist(eggs)', '>=', '1']]
+        data.build_deps = [['BuildRequires', 'python3-devel'],
+                           ['BuildRequires', 'python3dist(eggs)']]
+        c.report_unresolvable(data)
+        assert warnings(caplog) == [
+            'python3dist(eggs) is not provided by any package in the '
+            'repositories.']
+
+    def test_convert_report_unresolvable(self, tmpdir, caplog):
+        repo_dir = '{0}repo'.format(self.td_dir)
+        names = repo_index.repository_names([repo_dir], str(tmpdir))
+        flexmock(repo_index).should_receive('repository_names').with_args(
+            [repo_dir]).and_return(names)
+        c = Convertor(package='{0}utest-0.1.0.tar.gz'.format(self.td_dir),
+                      save_dir=str(tmpdir), repodata=[repo_dir],
+                      python_versions=['3'], base_python_version='3',
+                      autonc=False, venv=False, cache=False)
+        assert 'BuildRequires:  python3-devel' in c.convert()
+        assert not [m for m in warnings(caplog) if 'devel' in m]
+
+    def test_report_unresolvable_similar(self, tmpdir, caplog):
+        c = Convertor(package='spam', autonc=False)
+        c._name_convertor = DandifiedNameConvertor(
+            'fedora', repo_index.repository_names(
+                ['{0}repo'.format(self.td_dir)], str(tmpdir)))
+        data = PackageData('spam-0.1.tar.gz', 'spam', 'python-spam', '0.1')
+        data.base_python_version = '3'
+        data.runtime_deps = [['Requires', 'python3-dateutil2']]
+        data.build_deps = [['BuildRequires', 'python3-devel']]
+        c.report_unresolvable(data)
+        assert warnings(caplog) == [
+            'python3-dateutil2 is not provided by any package in the '
+            'repositories. Similar packages: python3-dateutil.']
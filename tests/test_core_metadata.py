@@ -0,0 +1,130 @@
+import pytest
+
+from pyp2rpm.core_metadata import (CoreMetadata, parse_entry_points,
+                                   egg_info_kwargs, split_requirement,
+                                   pydist_requirement)
+
+PKG_INFO = '''Metadata-Version: 2.2
+Name: spam
+Version: 1.0
+Summary: Spam
+Home-page: https://spam.org
+License: MIT
+Classifier: Programming Language :: Python :: 3
+Classifier: License :: OSI Approved :: MIT License
+Requires-Dist: six>=1.10
+Requires-Dist: enum34; python_version < "3.4"
+Provides-Extra: test
+Requires-Dist: pytest; extra == "test"
+Dynamic: License
+
+Spam
+====
+
+Eggs
+'''
+
+OLD_PKG_INFO = '''Metadata-Version: 1.1
+Name: spam
+Version: 1.0
+Summary: Spam
+Home-page: UNKNOWN
+Description: Spam
+        ====
+        \n        Eggs
+Platform: UNKNOWN
+'''
+
+
+class TestCoreMetadata(object):
+
+    def test_setup_kwargs(self):
+        assert CoreMetadata(PKG_INFO).setup_kwargs == {
+            'install_requires': ['six>=1.10', 'enum34'],
+            'extras_require': {'test': ['pytest']},
+            'description': 'Spam',
+            'long_description': 'Spam\n====\n\nEggs\n',
+            'url': 'https://spam.org',
+            'classifiers': ['Programming Language :: Python :: 3',
+                            'License :: OSI Approved :: MIT License'],
+        }
+
+    @pytest.mark.parametrize(('dynamic', 'left_out'), [
+        ('Requires-Dist', ['install_requires', 'extras_require']),
+        ('Provides-Extra', ['extras_require']),
+        ('Summary', ['description']),
+    ])
+    def test_setup_kwargs_dynamic(self, dynamic, left_out):
+        kwargs = CoreMetadata(PKG_INFO.replace(
+            'Dynamic: License', 'Dynamic: {0}'.format(dynamic))).setup_kwargs
+        assert sorted(left_out + list(kwargs)) == sorted(CoreMetadata(
+            PKG_INFO.replace('Dynamic: License\n', '')).setup_kwargs)
+
+    @pytest.mark.parametrize(('content', 'authoritative'), [
+        (PKG_INFO, True),
+        (OLD_PKG_INFO, False),
+        ('Metadata-Version: 2.10\n', True),
+        ('Metadata-Version: spam\n', False),
+    ])
+    def test_authoritative(self, content, authoritative):
+        assert CoreMetadata(content).authoritative == authoritative
+
+    def test_unknown(self):
+        assert CoreMetadata(OLD_PKG_INFO).get('Home-page') is None
+
+    def test_description_header(self):
+        assert CoreMetadata(OLD_PKG_INFO).description == 'Spam\n====\n\nEggs'
+
+    def test_project_url(self):
+        metadata = CoreMetadata('Metadata-Version: 2.2\n'
+                                'Project-URL: Documentation, https://d.org\n'
+                                'Project-URL: Homepage, https://spam.org\n')
+        assert metadata.url == 'https://spam.org'
+
+
+@pytest.mark.parametrize(('requirement', 'expected'), [
+    ('six', ('six', None)),
+    ('six (>=1.10)', ('six (>=1.10)', None)),
+    ("pytest; extra == 'test'", ('pytest', 'test')),
+    ('mock; python_version < "3" and extra == "test"', ('mock', 'test')),
+])
+def test_split_requirement(requirement, expected):
+    assert split_requirement(requirement) == expected
+
+
+@pytest.mark.parametrize(('requirement', 'expected'), [
+    ('six', 'six'),
+    ('six (>=1.10)', 'six (>=1.10)'),
+    ('six>=1.10,<2', 'six (>=1.10,<2)'),
+    ('requests[socks] >= 2.0', 'requests[socks] (>=2.0)'),
+])
+def test_pydist_requirement(requirement, expected):
+    assert pydist_requirement(requirement) == expected
+
+
+def test_parse_entry_points():
+    assert parse_entry_points(
+        '[console_scripts]\nspam = spam.cli:main\n\n'
+        '[spam.plugins]\neggs=spam.eggs:Eggs\n') == {
+            'console_scripts': ['spam = spam.cli:main'],
+            'spam.plugins': ['eggs = spam.eggs:Eggs']}
+
+
+def test_egg_info_kwargs():
+    files = {
+        'src/spam.egg-info/PKG-INFO': b'',
+        'src/spam.egg-info/top_level.txt': b'spam\nham\n',
+        'src/spam.egg-info/SOURCES.txt': b'setup.py\nsrc/ham.py\n'
+                                         b'src/spam/__init__.py\n'
+                                         b'src/spam/eggs/__init__.py\n'
+                                         b'tests/test_spam.py\n',
+    }
+    assert egg_info_kwargs(files.get, list(files)) == {
+        'entry_points': None,
+        'packages': ['spam', 'spam.eggs'],
+        'py_modules': ['ham'],
+    }
+
+
+def test_egg_info_kwargs_no_egg_info():
+    assert egg_info_kwargs({}.get, ['setup.py']) == {}
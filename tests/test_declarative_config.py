@@ -0,0 +1,232 @@
+import pytest
+
+from pyp2rpm.declarative_config import (SetupCfgParser, PyprojectParser,
+                                        parse_list, version_specifier,
+                                        tomllib)
+
+FILES = {
+    'README.md': b'Spam\r\n',
+    'CHANGES.md': b'Eggs\n',
+    'requirements.txt': b'six\n# comment\nrequests>=2.0\n',
+    'src/spam/__init__.py': b'',
+    'src/spam/ham/__init__.py': b'',
+    'tests/__init__.py': b'',
+}
+
+needs_toml = pytest.mark.skipif(tomllib is None,
+                                reason='tomllib or tomli is not available')
+
+
+def setup_cfg(content):
+    return SetupCfgParser(content, FILES.get, list(FILES))
+
+
+def pyproject(content, tool_tables=True):
+    return PyprojectParser(content, FILES.get, list(FILES), tool_tables)
+
+
+@pytest.mark.parametrize(('value', 'separator', 'expected'), [
+    ('spam, eggs', ',', ['spam', 'eggs']),
+    ('\nspam\neggs\n', ',', ['spam', 'eggs']),
+    ('spam>=1;eggs', ';', ['spam>=1', 'eggs']),
+])
+def test_parse_list(value, separator, expected):
+    assert parse_list(value, separator) == expected
+
+
+@pytest.mark.parametrize(('constraint', 'expected'), [
+    ('*', ''),
+    ('^1.2.3', '>=1.2.3,<2'),
+    ('^0.2.3', '>=0.2.3,<0.3'),
+    ('~1.2.3', '>=1.2.3,<1.3'),
+    ('~1', '>=1,<2'),
+    ('>=1.0,<2.0', '>=1.0,<2.0'),
+    ('1.2.*', '==1.2.*'),
+    ('^1.0 || ^2.0', ''),
+])
+def test_version_specifier(constraint, expected):
+    assert version_specifier(constraint) == expected
+
+
+class TestSetupCfgParser(object):
+
+    def test_metadata_and_options(self):
+        p = setup_cfg('''[metadata]
+name = spam
+home_page = https://spam.org
+summary = Spam
+long_description = file: README.md, CHANGES.md
+license = MIT
+classifiers =
+    Programming Language :: Python :: 3
+    License :: OSI Approved :: MIT License
+
+[options]
+package_dir =
+    =src
+packages = find:
+install_requires =
+    six
+    requests>=2.0
+tests_require = pytest; mock
+test_suite = tests
+
+[options.extras_require]
+doc = sphinx
+
+[options.entry_points]
+console_scripts =
+    spam = spam:main
+''')
+        assert p.setup_kwargs == {
+            'url': 'https://spam.org',
+            'description': 'Spam',
+            'long_description': 'Spam\n\nEggs\n',
+            'license': 'MIT',
+            'classifiers': ['Programming Language :: Python :: 3',
+                            'License :: OSI Approved :: MIT License'],
+            'packages': ['spam', 'spam.ham'],
+            'install_requires': ['six', 'requests>=2.0'],
+            'tests_require': ['pytest', 'mock'],
+            'test_suite': 'tests',
+            'extras_require': {'doc': ['sphinx']},
+            'entry_points': {'console_scripts': ['spam = spam:main']},
+        }
+        assert p.unresolved == []
+
+    def test_no_declarative_config(self):
+        p = setup_cfg('[bdist_wheel]\nuniversal = 1\n')
+        assert p.setup_kwargs == {}
+        assert p.unresolved == []
+
+    @pytest.mark.parametrize(('content', 'unresolved'), [
+        ('[metadata]\nlong_description = file: MISSING.rst\n',
+         ['long_description']),
+        ('[metadata]\nlicense = attr: spam.__license__\n', ['license']),
+        ('[options]\nentry_points = file: entry_points.cfg\n',
+         ['entry_points']),
+    ])
+    def test_unresolved(self, content, unresolved):
+        p = setup_cfg(content)
+        p.setup_kwargs
+        assert p.unresolved == unresolved
+
+
+@needs_toml
+class TestPyprojectParser(object):
+
+    def test_project(self):
+        p = pyproject('''[build-system]
+requires = ["setuptools>=61"]
+build-backend = "setuptools.build_meta"
+
+[project]
+name = "spam"
+description = "Spam"
+readme = "README.md"
+license = {text = "MIT"}
+dependencies = ["six", "requests>=2.0"]
+classifiers = ["Programming Language :: Python :: 3"]
+
+[project.optional-dependencies]
+doc = ["sphinx"]
+
+[project.urls]
+Home-page = "https://spam.org"
+
+[project.scripts]
+spam = "spam:main"
+''')
+        assert p.setup_kwargs == {
+            'description': 'Spam',
+            'long_description': 'Spam\n',
+            'license': 'MIT',
+            'install_requires': ['six', 'requests>=2.0'],
+            'extras_require': {'doc': ['sphinx']},
+            'classifiers': ['Programming Language :: Python :: 3'],
+            'url': 'https://spam.org',
+            'entry_points': {'console_scripts': ['spam = spam:main']},
+        }
+        assert p.discovered == {'packages': ['spam', 'spam.ham']}
+        assert p.unresolved == []
+
+    def test_project_dynamic(self):
+        p = pyproject('''[project]
+name = "spam"
+dynamic = ["version", "dependencies"]
+
+[tool.setuptools.dynamic]
+version = {attr = "spam.__version__"}
+dependencies = {file = ["requirements.txt"]}
+''')
+        assert p.setup_kwargs == {'install_requires': ['six', 'requests>=2.0']}
+        assert p.unresolved == []
+
+    @pytest.mark.parametrize(('dynamic', 'unresolved'), [
+        ('["version"]', []),
+        ('["version", "dependencies"]', ['install_requires']),
+        ('["readme", "urls"]', ['long_description', 'url']),
+    ])
+    def test_project_dynamic_other_backend(self, dynamic, unresolved):
+        p = pyproject('''[build-system]
+requires = ["hatchling"]
+build-backend = "hatchling.build"
+
+[project]
+name = "spam"
+dynamic = {0}
+'''.format(dynamic))
+        p.setup_kwargs
+        assert p.unresolved == unresolved
+
+    def test_poetry(self):
+        p = pyproject('''[tool.poetry]
+name = "spam"
+description = "Spam"
+license = "MIT"
+readme = "README.md"
+homepage = "https://spam.org"
+
+[tool.poetry.dependencies]
+python = "^3.6"
+six = "^1.10"
+requests = {version = ">=2.0", optional = true}
+
+[tool.poetry.extras]
+http = ["requests"]
+
+[tool.poetry.scripts]
+spam = "spam:main"
+''')
+        assert p.setup_kwargs == {
+            'description': 'Spam',
+            'license': 'MIT',
+            'url': 'https://spam.org',
+            'long_description': 'Spam\n',
+            'install_requires': ['six>=1.10,<2'],
+            'extras_require': {'http': ['requests>=2.0']},
+            'entry_points': {'console_scripts': ['spam = spam:main']},
+        }
+        assert p.discovered == {'packages': ['spam', 'spam.ham']}
+
+    def test_flit(self):
+        p = pyproject('''[tool.flit.metadata]
+module = "spam"
+home-page = "https://spam.org"
+requires = ["six"]
+description-file = "README.md"
+
+[tool.flit.scripts]
+spam = "spam:main"
+''')
+        assert p.setup_kwargs == {
+            'url': 'https://spam.org',
+            'install_requires': ['six'],
+            'long_description': 'Spam\n',
+            'entry_points': {'console_scripts': ['spam = spam:main']},
+        }
+        assert p.discovered == {'packages': ['spam', 'spam.ham']}
+
+    def test_tool_tables_ignored(self):
+        p = pyproject('[tool.poetry]\nname = "spam"\n', tool_tables=False)
+        assert p.setup_kwargs == {}
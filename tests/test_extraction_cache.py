@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from pyp2rpm.extraction_cache import ExtractionCache, file_sha256
+
+
+@pytest.fixture
+def archive(tmpdir):
+    archive = tmpdir.join('spam-1.0.tar.gz')
+    archive.write(b'spam', mode='wb')
+    return str(archive)
+
+
+@pytest.fixture
+def cache(tmpdir):
+    return ExtractionCache(str(tmpdir.join('cache')), max_size=100)
+
+
+def test_file_sha256(archive):
+    assert file_sha256(archive, chunk_size=3) == (
+        '4e388ab32b10dc8dbc7e28144f552830adc74787c1e2c0824032078a79f227fb')
+
+
+class TestExtractionCache(object):
+
+    def test_key(self, archive, tmpdir):
+        key = ExtractionCache.key(archive, 'SetupPyMetadataExtractor', '3')
+        assert key == ExtractionCache.key(archive,
+                                          'SetupPyMetadataExtractor', '3')
+        assert key != ExtractionCache.key(archive,
+                                          'SetupPyMetadataExtractor', '2')
+        tmpdir.join('spam-1.0.tar.gz').write(b'eggs', mode='wb')
+        assert key != ExtractionCache.key(archive,
+                                          'SetupPyMetadataExtractor', '3')
+
+    def test_put_get(self, cache):
+        assert cache.get('spam') is None
+        cache.put('spam', {'scripts': ['spam']})
+        assert cache.get('spam') == {'scripts': ['spam']}
+        assert os.listdir(cache.directory) == ['spam.json']
+
+    def test_refresh(self, cache):
+        cache.put('spam', {'scripts': ['spam']})
+        cache.refresh = True
+        assert cache.get('spam') is None
+        cache.put('spam', {'scripts': ['eggs']})
+        cache.refresh = False
+        assert cache.get('spam') == {'scripts': ['eggs']}
+
+    def test_corrupted_entry(self, cache):
+        cache.put('spam', {})
+        with open(cache.path('spam'), 'w') as f:
+            f.write('{"scripts"')
+        assert cache.get('spam') is None
+
+    def test_evict_least_recently_used(self, cache):
+        # every entry takes 39 bytes
+        cache.max_size = 120
+        for mtime, key in enumerate(['spam', 'eggs', 'ham']):
+            cache.put(key, {'description': 'x' * 20})
+            os.utime(cache.path(key), (mtime, mtime))
+        # hit updates modification time
+        cache.get('spam')
+        cache.put('beans', {'description': 'x' * 20})
+        assert sorted(os.listdir(cache.directory)) == [
+            'beans.json', 'ham.json', 'spam.json']
@@ -0,0 +1,94 @@
+import subprocess
+
+import pytest
+from flexmock import flexmock
+
+from pyp2rpm import file_layout
+from pyp2rpm.file_layout import (site_packages_filter, scripts_filter,
+                                 layout_data, wheel_dirs_content, build_wheel)
+
+
+class TestUtils(object):
+
+    @pytest.mark.parametrize(('input', 'expected'), [
+        (['foo', 'foo-1.0.0.dist-info'], set(['foo'])),
+        (['foo', 'foo-1.0.0.dist-info', 'foo2'], set(['foo', 'foo2'])),
+        (['foo', 'foo-1.0.0.dist-info', 'foo2-1.0.0-py2.7.egg-info'],
+         set(['foo'])),
+        (['foo', 'foo2-1.0.0-py2.7.egg-info'],
+         set(['foo'])),
+        ([], set()),
+    ])
+    def test_site_packages_filter(self, input, expected):
+        assert site_packages_filter(input) == expected
+
+    @pytest.mark.parametrize(('input', 'expected'), [
+        (['script', 'script2'], ['script', 'script2']),
+        (['script.py', 'script2'], ['script.py', 'script2']),
+        (['script.pyc', 'script2'], ['script2']),
+        (['script.pyc'], []),
+        ([], []),
+    ])
+    def test_scripts_filter(self, input, expected):
+        assert scripts_filter(input) == expected
+
+    def test_layout_data(self):
+        assert layout_data(
+            set(['spam']),
+            set(['spam', 'eggs.py', 'eggs.pyc', 'spam.pth',
+                 'spam-1.0.dist-info'])) == {
+            'packages': ['spam'], 'py_modules': ['eggs'],
+            'scripts': ['spam'], 'has_pth': True}
+
+
+@pytest.mark.parametrize(('record_paths', 'entry_points', 'expected'), [
+    (['spam/__init__.py', 'eggs.py', 'spam-1.0.dist-info/RECORD'], {},
+     (set(), set(['spam', 'eggs.py', 'spam-1.0.dist-info']))),
+    (['spam-1.0.data/scripts/spam-tool',
+      'spam-1.0.data/purelib/eggs/__init__.py',
+      'spam-1.0.data/platlib/_ham.so',
+      'spam-1.0.data/headers/spam.h'], {},
+     (set(['spam-tool']), set(['eggs', '_ham.so']))),
+    (['spam-1.0.data/data/bin/spam-data',
+      'spam-1.0.data/data/lib/python3.6/site-packages/spam.pth',
+      'spam-1.0.data/data/share/spam/spam.txt'], {},
+     (set(['spam-data']), set(['spam.pth']))),
+    (['spam-1.0.data/scripts/spam.exe',
+      'spam-1.0.data/scripts/spam-script.py',
+      'spam-1.0.data/scripts/spam-gui.pya'],
+     {'console_scripts': ['spam = spam:main'],
+      'gui_scripts': ['spam-gui = spam:gui'],
+      'spam.plugins': ['eggs = spam.eggs:Eggs']},
+     (set(['spam', 'spam-gui']), set())),
+])
+def test_wheel_dirs_content(record_paths, entry_points, expected):
+    assert wheel_dirs_content(record_paths, entry_points) == expected
+
+
+class TestBuildWheel(object):
+
+    def test_build_wheel(self, tmpdir):
+        def check_call(command, **kwargs):
+            tmpdir.join('spam-1.0-py3-none-any.whl').write('')
+        flexmock(subprocess).should_receive('check_call').replace_with(
+            check_call).once()
+        assert build_wheel('spam-1.0', str(tmpdir), 'python3') == str(
+            tmpdir.join('spam-1.0-py3-none-any.whl'))
+
+    def test_build_isolation_fallback(self, tmpdir):
+        commands = []
+
+        def check_call(command, **kwargs):
+            commands.append(command)
+            if '--no-build-isolation' in command:
+                raise subprocess.CalledProcessError(1, command)
+            tmpdir.join('spam-1.0-py3-none-any.whl').write('')
+        flexmock(subprocess).should_receive('check_call').replace_with(
+            check_call)
+        assert build_wheel('spam-1.0', str(tmpdir), 'python3')
+        assert len(commands) == 2
+
+    def test_build_failure(self, tmpdir):
+        flexmock(file_layout.subprocess).should_receive(
+            'check_call').and_raise(OSError).twice()
+        assert build_wheel('spam-1.0', str(tmpdir), 'python3') is None
@@ -1,6 +1,7 @@
 import pytest
 
-from pyp2rpm.filters import (macroed_pkg_name,
+from pyp2rpm.filters import (deps_for_python_version,
+                             macroed_pkg_name,
                              name_for_python_version,
                              script_name_for_python_version)
 
@@ -36,3 +37,17 @@ class TestFilters(object):
                                             default_number, expected):
         assert script_name_for_python_version(name, version, minor,
                                               default_number) == expected
+
+    @pytest.mark.parametrize(('version', 'base_version', 'expected'), [
+        ('3', '3', [['BuildRequires', 'python3-devel', '{name}'],
+                    ['BuildRequires', 'python3-sphinx', '{name}'],
+                    ['BuildRequires', 'python3-six', '{name} >= 1']]),
+        ('2', '3', [['BuildRequires', 'python2-devel', '{name}'],
+                    ['BuildRequires', 'python2-six', '{name} >= 1']]),
+    ])
+    def test_deps_for_python_version(self, version, base_version, expected):
+        deps = [['BuildRequires', 'python2-devel', '{name}'],
+                ['BuildRequires', 'python-sphinx', '{name}'],
+                ['BuildRequires', 'python-six', '{name} >= 1']]
+        assert deps_for_python_version(
+            deps, version, base_version) == expected
@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from pyp2rpm.http_cache import HTTPCache
+
+URL = 'https://pypi.org/pypi/spam/json'
+
+
+@pytest.fixture
+def cache(tmpdir):
+    return HTTPCache(str(tmpdir.join('cache')), ttl=60)
+
+
+class TestHTTPCache(object):
+
+    def test_put_get(self, cache):
+        assert cache.get(URL) is None
+        cache.put(URL, '"spam"', None, b'{"info": {}}\n')
+        response = cache.get(URL)
+        assert response.read() == b'{"info": {}}\n'
+        assert response.validators == {'If-None-Match': '"spam"'}
+        assert cache.fresh(response)
+        assert cache.get(URL + '?') is None
+
+    def test_entry_is_compressed(self, cache):
+        cache.put(URL, None, None, b'spam' * 10000)
+        assert os.path.getsize(cache.path(cache.key(URL))) < 1000
+
+    def test_stale(self, cache):
+        cache.put(URL, None, 'Sun, 18 Oct 2026 00:00:00 GMT', b'{}')
+        os.utime(cache.path(cache.key(URL)), (0, 0))
+        response = cache.get(URL)
+        assert not cache.fresh(response)
+        assert response.validators == {
+            'If-Modified-Since': 'Sun, 18 Oct 2026 00:00:00 GMT'}
+        cache.revalidated(response)
+        assert cache.fresh(cache.get(URL))
+
+    def test_refresh(self, cache):
+        cache.put(URL, '"spam"', None, b'{}')
+        cache.refresh = True
+        assert not cache.fresh(cache.get(URL))
+
+    def test_corrupted_entry(self, cache):
+        cache.put(URL, None, None, b'{}')
+        with open(cache.path(cache.key(URL)), 'wb') as f:
+            f.write(b'spam')
+        assert cache.get(URL) is None
@@ -23,10 +23,15 @@ class TestSpec(object):
 
     def setup_method(self, method):
         self.temp_dir = tempfile.mkdtemp()
-        self.env = TestFileEnvironment(self.temp_dir, start_clear=False)
+        # keep extraction cache of the tests apart from the user's one
+        self.cache_dir = tempfile.mkdtemp()
+        self.env = TestFileEnvironment(
+            self.temp_dir, start_clear=False,
+            environ=dict(os.environ, XDG_CACHE_HOME=self.cache_dir))
 
     def teardown_method(self, method):
         shutil.rmtree(self.temp_dir)
+        shutil.rmtree(self.cache_dir)
 
     @pytest.mark.parametrize(('package', 'options', 'expected'), [
         ('Jinja2', '-v2.8', 'python-Jinja2_py3_autonc.spec'),
@@ -1,4 +1,10 @@
+import io
 import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import zipfile
 
 import setuptools
 import pytest
@@ -6,11 +12,98 @@ import pytest
 from flexmock import flexmock
 
 import pyp2rpm.metadata_extractors as me
-from pyp2rpm.name_convertor import NameConvertor
+from pyp2rpm.archive import Archive
+from pyp2rpm.declarative_config import tomllib
+from pyp2rpm import extraction_cache
+from pyp2rpm.extraction_cache import ExtractionCache
+from pyp2rpm.module_runners import SubprocessModuleRunner
+from pyp2rpm.stages import StageGraph
+from pyp2rpm.name_convertor import NameConvertor, AutoProvidesNameConvertor
+from pyp2rpm import settings
 from pyp2rpm import utils
 
 tests_dir = os.path.split(os.path.abspath(__file__))[0]
 
+PKG_INFO = b'''Metadata-Version: 2.2
+Name: spam
+Version: 1.0
+Summary: Spam
+Requires-Dist: six>=1.10
+'''
+
+# install_requires can't be resolved statically
+SETUP_PY = b'''from setuptools import setup
+requires = []
+for line in open('requirements.txt'):
+    requires.append(line.strip())
+setup(name='spam', version='1.0', install_requires=requires,
+      tests_require=['pytest'], packages=['spam'],
+      entry_points={'console_scripts': ['spam = spam:main']})
+'''
+
+# wheel built by wheel >= 0.31, without metadata.json
+WHEEL_METADATA = b'''Metadata-Version: 2.1
+Name: spam
+Version: 1.0
+Summary: Spam
+Home-page: https://spam.org
+License: MIT
+Classifier: Programming Language :: Python :: 3
+Requires-Dist: six>=1.10
+Requires-Dist: pywin32; sys_platform == "win32"
+Provides-Extra: test
+Requires-Dist: pytest; extra == "test"
+
+Spam
+====
+
+Spam is a library for making spam.
+'''
+
+WHEEL_RECORD = b'''spam/__init__.py,sha256=abc,0
+"spam/data, with comma.txt",sha256=abc,0
+spam-1.0.data/scripts/spam-tool,sha256=abc,0
+spam-1.0.data/purelib/eggs/__init__.py,sha256=abc,0
+spam-1.0.dist-info/METADATA,sha256=abc,0
+spam-1.0.dist-info/RECORD,,
+'''
+
+PYPROJECT_TOML = b'''[build-system]
+requires = ["poetry-core"]
+build-backend = "poetry.core.masonry.api"
+
+[tool.poetry]
+name = "spam"
+version = "1.0"
+description = "Spam"
+homepage = "https://spam.org"
+
+[tool.poetry.dependencies]
+python = "^3.6"
+six = "^1.10"
+
+[tool.poetry.scripts]
+spam = "spam:main"
+'''
+
+
+def make_wheel(tmpdir, files):
+    wheel = str(tmpdir.join('spam-1.0-py3-none-any.whl'))
+    with zipfile.ZipFile(wheel, 'w') as whl:
+        for name, content in files:
+            whl.writestr(name, content)
+    return wheel
+
+
+def make_sdist(tmpdir, files):
+    sdist = str(tmpdir.join('spam-1.0.tar.gz'))
+    with tarfile.open(sdist, 'w:gz') as tar:
+        for name, content in files:
+            info = tarfile.TarInfo('spam-1.0/' + name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+    return sdist
+
 
 class TestMetadataExtractor(object):
     td_dir = '{0}/test_data/'.format(tests_dir)
@@ -35,6 +128,10 @@ class TestMetadataExtractor(object):
                 'isholiday', self.nc, '0.1'),
         ]
 
+    def teardown_method(self, method):
+        for extractor in self.e:
+            extractor.cleanup()
+
     @pytest.mark.parametrize(('b_version', 'what', 'expected'), [
         ('2', 'install_requires', ['jinja2', 'jsonschema', 'six',
                                    'py2-ipaddress']),
@@ -44,8 +141,9 @@ class TestMetadataExtractor(object):
         extractor = me.SetupPyMetadataExtractor(
             '{0}netjsonconfig-0.5.1.tar.gz'.format(self.td_dir),
             'netjsonconfig', self.nc, '0.5.1', base_python_version=b_version)
+        metadata = extractor.metadata
         if extractor.unsupported_version != b_version:
-            assert extractor.metadata.get(what) == expected
+            assert metadata.get(what) == expected
 
     @pytest.mark.parametrize(('lst', 'expected'), [
         ([['Requires', 'pyfoo', 'spam', 'spam']],
@@ -257,6 +355,9 @@ class TestPyPIMetadataExtension(object):
             '{0}pytest-2.2.3.zip'.format(self.td_dir), 'pytest',
             self.nc, '2.2.3')
 
+    def teardown_method(self, method):
+        self.e.cleanup()
+
     @pytest.mark.parametrize(('what', 'expected'), [
         ('description',
          'cross-project testing tool for Python.Platforms: Linux, Win32, '
@@ -272,6 +373,14 @@ class TestPyPIMetadataExtension(object):
         data = self.e.extract_data(self.client)
         assert getattr(data, what) == expected
 
+    def test_extract_downloaded(self):
+        client = flexmock(release_data=self.client.release_data)
+        client.should_receive('release_urls').never()
+        data = self.e.extract_data(client, {'md5': 'abc', 'sha256': 'def'})
+        assert data.md5 == 'abc'
+        assert data.source0 == ('https://files.pythonhosted.org/packages/'
+                                'source/p/pytest/pytest-2.2.3.zip')
+
 
 class TestSetupPyMetadataExtractor(object):
     td_dir = '{0}/test_data/'.format(tests_dir)
@@ -287,6 +396,10 @@ class TestSetupPyMetadataExtractor(object):
             self.e.append(me.SetupPyMetadataExtractor('{0}{1}'.format(
                 self.td_dir, archive), name, self.nc, version[:5]))
 
+    def teardown_method(self, method):
+        for extractor in self.e:
+            extractor.cleanup()
+
     @pytest.mark.parametrize(('i', 'what', 'expected'), [
         (0, 'runtime_deps', [['Requires', 'python-six', '{name}']]),
         (0, 'build_deps', [['BuildRequires', 'python2-devel', '{name}'],
@@ -353,6 +466,296 @@ class TestSetupPyMetadataExtractor(object):
         assert data.data['doc_license'] == license
         assert data.data['doc_files'] == other
 
+    @pytest.mark.parametrize(('i', 'included', 'excluded'), [
+        (1, 'pytest-2.2.3/setup.py', 'pytest-2.2.3/doc/index.txt'),
+        (1, 'pytest-2.2.3/_pytest/__init__.py', 'pytest-2.2.3/doc/Makefile'),
+        (1, 'pytest-2.2.3/pytest.egg-info/SOURCES.txt',
+         'pytest-2.2.3/doc/_static/sphinxdoc.css'),
+    ])
+    def test_setup_py_members(self, i, included, excluded):
+        with self.e[i].archive:
+            members = [m.name for m in self.e[i].setup_py_members]
+        assert included in members
+        assert excluded not in members
+
+    def test_setup_py_members_sdist(self, tmpdir):
+        sdist = make_sdist(tmpdir, [
+            ('setup.py', SETUP_PY), ('spam/__init__.py', b''),
+            ('docs/index.rst', b'Spam\n'), ('tests/data/eggs.json', b'{}')])
+        e = me.SetupPyMetadataExtractor(sdist, 'spam', self.nc, '1.0')
+        with e.archive:
+            members = [m.name for m in e.setup_py_members]
+        assert sorted(members) == ['spam-1.0/setup.py',
+                                   'spam-1.0/spam/__init__.py']
+
+    def test_selective_extraction_fallback(self):
+        flexmock(me.SetupPyMetadataExtractor, static_metadata=None)
+        flexmock(me.SetupPyMetadataExtractor).should_receive(
+            '_run_extract_dist').and_return(None).and_return(
+                {'spam': 'eggs'}).twice()
+        flexmock(Archive).should_call('extract_all').twice()
+        e = me.SetupPyMetadataExtractor('{0}{1}'.format(
+            self.td_dir, 'plumbum-0.9.0.tar.gz'), 'plumbum', self.nc, '0.9.0')
+        assert e.metadata == {'spam': 'eggs'}
+
+    @pytest.mark.parametrize(('archive', 'name', 'version'), [
+        ('plumbum-0.9.0.tar.gz', 'plumbum', '0.9.0'),
+        ('isholiday-0.1.tar.gz', 'isholiday', '0.1'),
+        ('utest-0.1.0.tar.gz', 'utest', '0.1.0'),
+    ])
+    def test_static_metadata(self, archive, name, version):
+        flexmock(me.SetupPyMetadataExtractor).should_receive(
+            '_run_extract_dist').never()
+        e = me.SetupPyMetadataExtractor('{0}{1}'.format(
+            self.td_dir, archive), name, self.nc, version)
+        temp_dir = tempfile.mkdtemp()
+        try:
+            with e.archive:
+                e.archive.extract_all(directory=temp_dir)
+            runner = SubprocessModuleRunner(
+                e.get_setup_py(temp_dir),
+                *settings.EXTRACT_DIST_COMMAND_ARGS + ['--stdout'])
+            runner.run(sys.executable)
+        finally:
+            shutil.rmtree(temp_dir)
+        for key, value in runner.results.items():
+            if isinstance(value, list):
+                assert sorted(e.metadata[key]) == sorted(value)
+            else:
+                assert e.metadata[key] == value
+
+    @pytest.mark.skipif(tomllib is None,
+                        reason='tomllib or tomli is not available')
+    def test_static_metadata_without_setup_py(self, tmpdir):
+        sdist = make_sdist(tmpdir, [('pyproject.toml', PYPROJECT_TOML),
+                                    ('README.md', b'Spam'),
+                                    ('spam/__init__.py', b'')])
+        flexmock(me.SetupPyMetadataExtractor).should_receive(
+            'extract_metadata').never()
+        e = me.SetupPyMetadataExtractor(sdist, 'spam', self.nc, '1.0')
+        assert e.metadata['install_requires'] == ['six>=1.10,<2']
+        assert e.metadata['packages'] == ['spam']
+        assert e.metadata['url'] == 'https://spam.org'
+        assert e.scripts == ['spam']
+
+    def test_static_metadata_setup_py_over_setup_cfg(self, tmpdir):
+        sdist = make_sdist(tmpdir, [
+            ('setup.py', b"from setuptools import setup\n"
+                         b"setup(name='spam', version='1.0',\n"
+                         b"      description='from setup.py',\n"
+                         b"      install_requires=['fromsetuppy'],\n"
+                         b"      tests_require=[], py_modules=['eggs'])\n"),
+            ('setup.cfg', b"[metadata]\n"
+                          b"description = from setup.cfg\n"
+                          b"url = https://spam.org\n"
+                          b"[options]\n"
+                          b"install_requires = fromsetupcfg\n"
+                          b"tests_require = pytest\n"),
+            ('eggs.py', b'')])
+        flexmock(me.SetupPyMetadataExtractor).should_receive(
+            'extract_metadata').never()
+        e = me.SetupPyMetadataExtractor(sdist, 'spam', self.nc, '1.0')
+        temp_dir = str(tmpdir.join('extracted'))
+        with e.archive:
+            e.archive.extract_all(directory=temp_dir)
+        runner = SubprocessModuleRunner(
+            e.get_setup_py(temp_dir),
+            *settings.EXTRACT_DIST_COMMAND_ARGS + ['--stdout'])
+        runner.run(sys.executable)
+        for key, expected in [('description', 'from setup.py'),
+                              ('install_requires', ['fromsetuppy']),
+                              ('tests_require', ['pytest']),
+                              ('url', 'https://spam.org')]:
+            assert e.metadata[key] == runner.results[key] == expected
+
+    @pytest.mark.skipif(tomllib is None,
+                        reason='tomllib or tomli is not available')
+    def test_static_metadata_other_backend_dynamic(self, tmpdir):
+        sdist = make_sdist(tmpdir, [
+            ('pyproject.toml', b'[build-system]\n'
+                               b'requires = ["hatchling"]\n'
+                               b'build-backend = "hatchling.build"\n'
+                               b'[project]\n'
+                               b'name = "spam"\n'
+                               b'version = "1.0"\n'
+                               b'dynamic = ["dependencies"]\n'),
+            ('spam/__init__.py', b'')])
+        wheel = make_wheel(tmpdir, [
+            ('spam/__init__.py', b''),
+            ('spam-1.0.dist-info/METADATA', WHEEL_METADATA),
+            ('spam-1.0.dist-info/RECORD', WHEEL_RECORD)])
+        e = me.SetupPyMetadataExtractor(sdist, 'spam', self.nc, '1.0')
+        with e.archive:
+            assert e.static_metadata is None
+        # metadata are read from the wheel the build backend builds
+        e._built_wheel = wheel
+        assert 'six>=1.10' in e.metadata['install_requires']
+        assert e.metadata['url'] == 'https://spam.org'
+        assert e.metadata['packages'] == ['eggs', 'spam']
+
+    def test_static_metadata_pkg_info(self, tmpdir):
+        sdist = make_sdist(tmpdir, [
+            ('PKG-INFO', PKG_INFO),
+            ('setup.py', SETUP_PY),
+            ('spam.egg-info/PKG-INFO', PKG_INFO),
+            ('spam.egg-info/top_level.txt', b'spam\n'),
+            ('spam.egg-info/SOURCES.txt', b'setup.py\nspam/__init__.py\n'),
+            ('spam.egg-info/entry_points.txt',
+             b'[console_scripts]\nspam = spam:main\n'),
+            ('spam/__init__.py', b'')])
+        flexmock(me.SetupPyMetadataExtractor).should_receive(
+            'extract_metadata').never()
+        e = me.SetupPyMetadataExtractor(sdist, 'spam', self.nc, '1.0')
+        assert e.metadata['install_requires'] == ['six>=1.10']
+        assert e.metadata['tests_require'] == ['pytest']
+        assert e.metadata['packages'] == ['spam']
+        assert e.scripts == ['spam']
+
+    def test_static_metadata_pkg_info_dynamic(self, tmpdir):
+        sdist = make_sdist(tmpdir, [
+            ('PKG-INFO', PKG_INFO + b'Dynamic: Requires-Dist\n'),
+            ('setup.py', SETUP_PY),
+            ('spam/__init__.py', b'')])
+        flexmock(me.SetupPyMetadataExtractor).should_receive(
+            'extract_metadata').and_return({}).once()
+        me.SetupPyMetadataExtractor(sdist, 'spam', self.nc, '1.0').metadata
+
+    def test_static_metadata_pkg_info_dynamic_requires(self, tmpdir):
+        sdist = make_sdist(tmpdir, [
+            ('PKG-INFO', PKG_INFO + b'Dynamic: Requires-Dist\n'),
+            ('setup.py', b"from setuptools import setup\n"
+                         b"setup(name='spam', version='1.0',\n"
+                         b"      install_requires=['six'],\n"
+                         b"      extras_require={'eggs': ['eggs']},\n"
+                         b"      py_modules=['ham'])\n"),
+            ('ham.py', b'')])
+        flexmock(me.SetupPyMetadataExtractor).should_receive(
+            'extract_metadata').never()
+        e = me.SetupPyMetadataExtractor(sdist, 'spam', self.nc, '1.0')
+        temp_dir = str(tmpdir.join('extracted'))
+        with e.archive:
+            e.archive.extract_all(directory=temp_dir)
+        runner = SubprocessModuleRunner(
+            e.get_setup_py(temp_dir),
+            *settings.EXTRACT_DIST_COMMAND_ARGS + ['--stdout'])
+        runner.run(sys.executable)
+        assert e.metadata['install_requires'] == \
+            runner.results['install_requires'] == ['six', 'eggs']
+
+    def test_extraction_cache(self, tmpdir):
+        cache = ExtractionCache(str(tmpdir))
+        path = '{0}{1}'.format(self.td_dir, 'plumbum-0.9.0.tar.gz')
+        data = me.SetupPyMetadataExtractor(
+            path, 'plumbum', self.nc, '0.9.0', venv=False,
+            cache=cache).extract_data()
+        flexmock(Archive).should_receive('open').never()
+        cached = me.SetupPyMetadataExtractor(
+            path, 'plumbum', self.nc, '0.9.0', rpm_name='python-plumbum2',
+            venv=False, cache=cache).extract_data()
+        assert (cached.pkg_name, cached.srcname) == ('python-plumbum2',
+                                                     'plumbum2')
+        for field in ('pkg_name', 'srcname'):
+            del data.data[field], cached.data[field]
+        assert cached.data == data.data
+
+    def test_extraction_cache_key(self, tmpdir):
+        cache = ExtractionCache(str(tmpdir))
+        path = '{0}{1}'.format(self.td_dir, 'plumbum-0.9.0.tar.gz')
+        keys = [me.SetupPyMetadataExtractor(
+            path, name, self.nc, '0.9.0', venv=False, cache=cache).cache_key
+            for name in ('plumbum', 'Plumbum')]
+        # data such as packages fall back to the name of the package
+        assert keys[0] != keys[1]
+        digest = extraction_cache.file_sha256(path)
+        flexmock(extraction_cache).should_call('file_sha256').once()
+        e = me.SetupPyMetadataExtractor(path, 'plumbum', self.nc, '0.9.0',
+                                        venv=False, cache=cache)
+        e.extract_data()
+        assert cache.get(e.cache_key) is not None
+        assert e.cache_key == keys[0]
+        # digest computed by the getter is not computed again
+        flexmock(extraction_cache).should_call('file_sha256').never()
+        e = me.SetupPyMetadataExtractor(
+            path, 'plumbum', self.nc, '0.9.0', venv=False, cache=cache,
+            sha256=digest)
+        assert e.cache_key == keys[0]
+
+    def test_extraction_cache_name_convertor(self, tmpdir):
+        cache = ExtractionCache(str(tmpdir))
+        path = '{0}{1}'.format(self.td_dir, 'plumbum-0.9.0.tar.gz')
+        me.SetupPyMetadataExtractor(
+            path, 'plumbum', self.nc, '0.9.0', venv=False,
+            base_python_version='3', cache=cache).extract_data()
+        # names converted by other convertor are not used
+        data = me.SetupPyMetadataExtractor(
+            path, 'plumbum', AutoProvidesNameConvertor('fedora'), '0.9.0',
+            venv=False, base_python_version='3', cache=cache).extract_data()
+        assert data.build_deps[1][1] == 'python3dist(setuptools)'
+
+    def test_static_metadata_incomplete(self):
+        # setup() is called from main() function in pytest's setup.py
+        with self.e[1].archive:
+            assert self.e[1].static_metadata is None
+
+    def test_extraction_stages(self):
+        e = self.e[1]
+        e.wheel_layout = True
+        observed = []
+        archive_data = e.archive_data
+
+        def recording_archive_data():
+            data = archive_data()
+            observed.append(('archive', e.workspace.source_tree_complete))
+            return data
+
+        def layout_data(installable):
+            observed.append(('layout', e.workspace.source_tree_complete))
+
+        flexmock(e).should_receive('archive_data').replace_with(
+            recording_archive_data)
+        flexmock(e).should_receive('layout_data').replace_with(layout_data)
+        graph = StageGraph()
+        e.add_extraction_stages(graph)
+        assert [(stage.name, list(stage.requires))
+                for stage in graph.stages] == [('archive', []),
+                                               ('layout', ['archive'])]
+        graph.run()
+        # setup.py runs in the source tree with the files it needs only
+        assert observed == [('archive', False), ('layout', True)]
+
+    def test_wheel_layout(self, tmpdir):
+        wheel = make_wheel(tmpdir, [
+            ('utest/__init__.py', b''),
+            ('utest-0.1.0.dist-info/METADATA', b''),
+            ('utest-0.1.0.dist-info/RECORD',
+             b'utest/__init__.py,,\nutest-0.1.0.dist-info/RECORD,,\n')])
+
+        def build_wheel(source_dir, wheel_dir, python):
+            # the wheel is built from the extracted source tree
+            assert os.path.isfile(os.path.join(source_dir, 'setup.py'))
+            return wheel
+        flexmock(me.file_layout).should_receive('build_wheel').replace_with(
+            build_wheel).once()
+        flexmock(me.virtualenv).should_receive('VirtualEnv').never()
+        extractor = me.SetupPyMetadataExtractor(
+            '{0}utest-0.1.0.tar.gz'.format(self.td_dir), 'utest', self.nc,
+            '0.1.0', wheel_layout=True)
+        data = extractor.extract_data()
+        assert extractor.built_wheel == wheel
+        extractor.cleanup()
+        # the same data installation to virtualenv gives
+        assert (data.packages, data.py_modules, data.scripts,
+                data.has_pth) == (['utest'], [], [], False)
+
+    def test_wheel_layout_build_failure(self):
+        flexmock(me.file_layout).should_receive('build_wheel').and_return(
+            None).once()
+        flexmock(me.virtualenv).should_receive('VirtualEnv').and_raise(
+            me.exc.VirtualenvFailException('spam')).once()
+        self.e[3].wheel_layout = True
+        self.e[3].extract_data()
+        assert self.e[3].built_wheel is None
+
 
 class TestWheelMetadataExtractor(object):
     td_dir = '{0}/test_data/'.format(tests_dir)
@@ -368,6 +771,10 @@ class TestWheelMetadataExtractor(object):
             self.e.append(me.WheelMetadataExtractor('{0}{1}'.format(
                 self.td_dir, archive), name, self.nc, version, venv=False))
 
+    def teardown_method(self, method):
+        for extractor in self.e:
+            extractor.cleanup()
+
     @pytest.mark.parametrize(('i', 'what', 'expected'), [
         (0, 'runtime_deps', [['Requires', 'python-certifi', '{name} == 2015.11.20'],
                              ['Requires', 'python-setuptools', '{name}']]),
@@ -379,7 +786,7 @@ class TestWheelMetadataExtractor(object):
 
         (0, 'py_modules', ['_markerlib', 'pkg_resources', 'setuptools']),
         (0, 'packages', ['setuptools']),
-        (0, 'scripts', []),
+        (0, 'scripts', ['easy_install', 'easy_install-3.5']),
         (0, 'home_page', 'https://bitbucket.org/pypa/setuptools'),
         (0, 'summary', 'Easily download, build, install, upgrade, and uninstall Python packages'),
         (0, 'license', 'TODO:'),
@@ -395,8 +802,8 @@ class TestWheelMetadataExtractor(object):
                            ['BuildRequires', 'python-setuptools', '{name}']]),
         (1, 'py_modules', ['py2exe']),
         (1, 'packages', ['py2exe']),
-        (1, 'scripts', ['build_exe-script.py', 'build_exe.exe']),
-        (1, 'home_page', 'TODO:'),
+        (1, 'scripts', ['build_exe', 'build_exe-script.py', 'build_exe.exe']),
+        (1, 'home_page', 'http://www.py2exe.org/'),
         (1, 'summary', 'Build standalone executables for Windows (python 3 version)'),
         (1, 'license', 'MIT/X11'),
         (1, 'has_pth', False),
@@ -412,6 +819,53 @@ class TestWheelMetadataExtractor(object):
         data = self.e[i].extract_data()
         assert getattr(data, what) == expected
 
+    def test_extract_without_json_metadata(self, tmpdir):
+        wheel = make_wheel(tmpdir, [
+            ('spam/__init__.py', b''),
+            ('spam-1.0.dist-info/METADATA', WHEEL_METADATA),
+            ('spam-1.0.dist-info/entry_points.txt',
+             b'[console_scripts]\nspam = spam:main\n'),
+            ('spam-1.0.dist-info/RECORD', WHEEL_RECORD)])
+        data = me.WheelMetadataExtractor(
+            wheel, 'spam', self.nc, '1.0', venv=False).extract_data()
+        assert data.runtime_deps == [
+            ['Requires', 'python-six', '{name} >= 1.10'],
+            ['Requires', 'python-setuptools', '{name}']]
+        assert data.build_deps == [
+            ['BuildRequires', 'python2-devel', '{name}'],
+            ['BuildRequires', 'python-pytest', '{name}'],
+            ['BuildRequires', 'python-six', '{name} >= 1.10'],
+            ['BuildRequires', 'python-setuptools', '{name}']]
+        assert data.py_modules == ['eggs', 'spam']
+        assert data.scripts == ['spam', 'spam-tool']
+        assert data.home_page == 'https://spam.org'
+        assert data.summary == 'Spam'
+        assert data.license == 'MIT'
+        assert data.has_test_suite
+        assert data.python_versions == ['3']
+        assert data.doc_files == []
+
+    @pytest.mark.parametrize(('i', 'expected'), [
+        (0, {'packages': ['_markerlib', 'pkg_resources', 'setuptools'],
+             'py_modules': ['easy_install'],
+             'scripts': ['easy_install', 'easy_install-3.5'],
+             'has_pth': False}),
+        # setuptools' wrappers of entry points are not installed
+        (1, {'packages': ['py2exe'], 'py_modules': ['zipextimporter'],
+             'scripts': ['build_exe'], 'has_pth': False}),
+    ])
+    def test_wheel_layout_data(self, i, expected):
+        assert self.e[i].wheel_layout_data == expected
+
+    def test_wheel_files_parsed_once(self):
+        archive = self.e[0].archive
+        flexmock(archive).should_call('get_content_of_file').times(3)
+        with archive:
+            for _ in range(2):
+                archive.wheel_metadata
+                archive.wheel_entry_points
+                archive.record
+
     @pytest.mark.parametrize(("input", "expected"), [
        ([], ""),
        (['License :: OSI Approved :: Python Software Foundation License'],
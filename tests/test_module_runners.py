@@ -0,0 +1,87 @@
+import json
+import sys
+
+import pytest
+from flexmock import flexmock
+
+from pyp2rpm import module_runners
+from pyp2rpm.module_runners import (ExtractDistWorkerPool,
+                                    SubprocessModuleRunner,
+                                    WorkerModuleRunner)
+from pyp2rpm.exceptions import WorkerError
+from pyp2rpm import settings
+
+SETUP_PY = '''from setuptools import setup
+
+setup(name='spam', version='0.1', py_modules=['spam'],
+      install_requires=['eggs'])
+'''
+
+
+@pytest.fixture
+def setup_py(tmpdir):
+    tmpdir.join('spam.py').write('')
+    script = tmpdir.join('setup.py')
+    script.write(SETUP_PY)
+    return str(script)
+
+
+@pytest.fixture
+def pool():
+    pool = ExtractDistWorkerPool()
+    yield pool
+    pool.close()
+
+
+class TestExtractDistWorker(object):
+
+    def test_run(self, setup_py, pool):
+        response = pool.get(sys.executable).run(
+            setup_py, settings.EXTRACT_DIST_COMMAND_ARGS + ['--stdout'])
+        assert response['returncode'] == 0
+        metadata = json.loads(response['stdout'].split(
+            "extracted json data:\n")[-1].split("\n")[0])
+        assert metadata['install_requires'] == ['eggs']
+
+    def test_run_failing_script(self, tmpdir, pool):
+        script = tmpdir.join('setup.py')
+        script.write('raise RuntimeError("spam")\n')
+        response = pool.get(sys.executable).run(str(script), [])
+        assert response['returncode'] == 1
+        assert 'RuntimeError: spam' in response['stderr']
+        # the worker survives failures of the scripts it runs
+        assert pool.get(sys.executable).alive
+
+    def test_pool_reuses_worker(self, pool):
+        worker = pool.get(sys.executable)
+        assert pool.get(sys.executable) is worker
+
+    def test_pool_restarts_dead_worker(self, pool):
+        worker = pool.get(sys.executable)
+        worker.proc.kill()
+        worker.proc.wait()
+        assert pool.get(sys.executable) is not worker
+
+    def test_missing_interpreter(self, pool):
+        with pytest.raises(WorkerError):
+            pool.get('/nonexistent/python')
+
+
+class TestWorkerModuleRunner(object):
+
+    def test_results_match_subprocess(self, setup_py, pool):
+        flexmock(module_runners, worker_pool=pool)
+        args = settings.EXTRACT_DIST_COMMAND_ARGS + ['--stdout']
+        worker_runner = WorkerModuleRunner(setup_py, *args)
+        worker_runner.run(sys.executable)
+        subprocess_runner = SubprocessModuleRunner(setup_py, *args)
+        subprocess_runner.run(sys.executable)
+        assert worker_runner.results == subprocess_runner.results
+
+    def test_fallback_to_subprocess(self, setup_py, pool):
+        flexmock(module_runners, worker_pool=pool)
+        flexmock(pool).should_receive('get').and_raise(
+            WorkerError, 'Worker is not responding')
+        flexmock(SubprocessModuleRunner).should_receive('run').with_args(
+            sys.executable).once()
+        WorkerModuleRunner(setup_py, '--stdout').run(sys.executable)
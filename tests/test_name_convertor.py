@@ -1,14 +1,23 @@
+import os
+import shutil
+
 import pytest
+from flexmock import flexmock
 
 from pyp2rpm.name_convertor import (NameConvertor, DandifiedNameConvertor,
-                                    AutoProvidesNameConvertor, NameVariants)
-from pyp2rpm import settings
+                                    AutoProvidesNameConvertor, NameVariants,
+                                    canonical_form, dnf_revisions)
+from pyp2rpm import repodata, settings
+from pyp2rpm.repo_index import (NameIndex, repository_names,
+                                repository_provides)
 
 try:
     import dnf
 except ImportError:
     dnf = None
 
+tests_dir = os.path.split(os.path.abspath(__file__))[0]
+
 
 class TestUtils(object):
 
@@ -78,6 +87,107 @@ class TestDandifiedNameConvertor(object):
         assert self.dnc.rpm_name(pypi_name, version) == expected
 
 
+class TestRepositoryDandifiedNameConvertor(object):
+
+    @pytest.fixture(autouse=True)
+    def dnc(self, tmpdir):
+        names = repository_names(['{0}/test_data/repo'.format(tests_dir)],
+                                 str(tmpdir))
+        self.dnc = DandifiedNameConvertor('fedora', names)
+
+    @pytest.mark.parametrize(('pypi_name', 'version', 'expected'), [
+        ('Babel', '2', 'babel'),
+        ('Babel', '3', 'python3-babel'),
+        ('MarkupSafe', '2', 'python2-MarkupSafe'),
+        ('MarkupSafe', '3', 'python3-markupsafe'),
+        ('Jinja2', '3', 'python3-jinja2'),
+        ('Sphinx', '3', 'python3-sphinx'),
+        ('Cython', '3', 'python3-Cython'),
+        ('pytest', '3', 'python3-pytest'),
+        ('oslosphinx', '3', 'python3-oslo-sphinx'),
+        ('mock', '3', 'python3-mock'),
+        ('pyflakes', '3', 'pyflakes'),
+        ('zope.interface', '3', 'python3-zope-interface'),
+        ('spam', '3', 'python-spam'),
+    ])
+    def test_rpm_name(self, pypi_name, version, expected):
+        assert self.dnc.rpm_name(pypi_name, version) == expected
+
+    def test_rpm_name_pkg_name(self):
+        assert self.dnc.rpm_name('Babel', '3', True) == 'python-Babel'
+
+    @pytest.mark.parametrize(('name', 'expected'), [
+        ('python3-dateutil2', ['python3-dateutil']),
+        ('python3-pyflake', ['pyflakes']),
+        ('python3-spam', []),
+    ])
+    def test_similar(self, name, expected):
+        assert self.dnc.similar(name) == expected
+
+    def test_unresolvable(self):
+        assert self.dnc.unresolvable(
+            ['python3-dateutil2', 'python3-devel', 'spam',
+             'python%{python3_pkgversion}-eggs', 'spam']) == [
+            'python3-dateutil2', 'spam']
+
+    @pytest.mark.parametrize(('pypi_name', 'version'), [
+        ('Foo_Bar', '3'),
+        ('foo-bar', '3'),
+        ('Foo_Bar', ''),
+        ('pyfoo', '3'),
+        ('PyFoo', '2'),
+        ('foo', '3'),
+        ('python-foo', '3'),
+        ('foo-python', '2'),
+        ('eggs', '3'),
+    ])
+    def test_rpm_name_same_as_scan(self, tmpdir, pypi_name, version):
+        names = ['foo-bar', 'foo_bar', 'Foo_Bar', 'python3-foo-bar',
+                 'python3-Foo_Bar', 'python-foobar', 'foobar-python3',
+                 'pyfoo', 'py3foo', 'python3-foo', 'python2-Foo',
+                 'foo', 'Foo', 'foo-python', 'foo-python2', 'eggs']
+        index = NameIndex.build(str(tmpdir.join('names.idx')), names, {})
+        dnc = DandifiedNameConvertor('fedora', index)
+
+        def scan():
+            # matching over all the names the dnf query used to select
+            converted = NameConvertor.rpm_name(dnc, pypi_name, version)
+            python_names = [n for n in sorted(names) if any(
+                s in n for s in ['python', 'py', pypi_name,
+                                 canonical_form(pypi_name)])]
+            if converted in python_names:
+                return converted
+            base_name = dnc.base_name(pypi_name)
+            variants = [NameVariants(base_name, version),
+                        NameVariants(base_name, '')]
+            if base_name.startswith('py'):
+                variants.append(NameVariants(base_name[2:], version))
+            for n in python_names:
+                for variant in variants:
+                    variant.find_match(n)
+            if len(variants) == 3:
+                variants[0].merge(variants[2])
+            return variants[0].merge(variants[1]).best_matching or converted
+
+        assert dnc.rpm_name(pypi_name, version) == scan()
+
+    def test_rpm_name_repository_order(self):
+        # the last of names with the same canonical form in order of the
+        # repositories wins, like it did in order of the dnf query
+        dnc = DandifiedNameConvertor('fedora', ['python3-foo-bar',
+                                                'python3-Foo-bar'])
+        assert dnc.rpm_name('Foo_bar', '3') == 'python3-Foo-bar'
+        dnc = DandifiedNameConvertor('fedora', ['python3-Foo-bar',
+                                                'python3-foo-bar'])
+        assert dnc.rpm_name('Foo_bar', '3') == 'python3-foo-bar'
+
+    def test_rpm_name_case_sensitive_substrings(self):
+        # dnf matched the substrings case-sensitively, FOO never matched foo
+        dnc = DandifiedNameConvertor('fedora', ['FOO'])
+        assert dnc.rpm_name('foo', '3') == NameConvertor('fedora').rpm_name(
+            'foo', '3')
+
+
 class TestNameVariants(object):
 
     def setup_method(self, method):
@@ -131,3 +241,58 @@ class TestAutoProvidesNameConvertor(object):
             assert self.anc.rpm_name(input, py_ver) == expected
         else:
             assert self.anc.rpm_name(input) == expected
+
+    def test_unresolvable(self, tmpdir):
+        names = ['python3dist(babel)', 'python3dist(spam)', 'python3-devel',
+                 'python3.9dist(zope-interface)', 'python2dist(babel)',
+                 'python3dist(spam)']
+        assert self.anc.unresolvable(names) == []
+        anc = AutoProvidesNameConvertor('fedora', repository_provides(
+            ['{0}/test_data/repo'.format(tests_dir)], str(tmpdir)))
+        assert anc.unresolvable(names) == ['python2dist(babel)',
+                                           'python3dist(spam)']
+
+
+class TestDnfRevisions(object):
+
+    def base(self, cachedir, *repos):
+        return flexmock(conf=flexmock(cachedir=cachedir),
+                        repos=flexmock(iter_enabled=lambda: list(repos)))
+
+    def cache_repo(self, cachedir, name):
+        shutil.copytree('{0}/test_data/repo'.format(tests_dir),
+                        str(cachedir.join(name)))
+        return os.stat(repodata.repomd_path(str(cachedir.join(name))))
+
+    def test_revisions(self, tmpdir):
+        stat = self.cache_repo(tmpdir, 'fedora-0123456789abcdef')
+        revision = repodata.repomd_revision(
+            '{0}/test_data/repo'.format(tests_dir))
+        fedora = flexmock(id='fedora', metadata_expire=-1)
+        assert dnf_revisions(self.base(str(tmpdir), fedora),
+                             stat.st_mtime) == {'fedora': revision}
+
+    def test_revisions_other_repo_same_prefix(self, tmpdir):
+        stat = self.cache_repo(tmpdir,
+                               'fedora-cisco-openh264-0123456789abcdef')
+        fedora = flexmock(id='fedora', metadata_expire=-1)
+        assert dnf_revisions(self.base(str(tmpdir), fedora),
+                             stat.st_mtime) is None
+
+    @pytest.mark.parametrize(('metadata_expire', 'age', 'expired'), [
+        (-1, 10 ** 9, False),
+        (172800, 3600, False),
+        (172800, 172801, True),
+        (0, 1, True),
+    ])
+    def test_revisions_expired(self, tmpdir, metadata_expire, age, expired):
+        stat = self.cache_repo(tmpdir, 'fedora-0123456789abcdef')
+        fedora = flexmock(id='fedora', metadata_expire=metadata_expire)
+        revisions = dnf_revisions(self.base(str(tmpdir), fedora),
+                                  stat.st_mtime + age)
+        assert (revisions is None) == expired
+
+    def test_revisions_not_cached(self, tmpdir):
+        fedora = flexmock(id='fedora', metadata_expire=-1)
+        assert dnf_revisions(self.base(str(tmpdir.join('none')), fedora)) \
+            is None
@@ -50,3 +50,10 @@ class TestPackageData(object):
         pd = PackageData('spam', init, 'python-spam', 'spam')
         pd.set_from(update_data, update=True)
         assert pd.data[key] == expected
+
+    def test_changelog_date_packager(self):
+        pd = PackageData('spam', 'spam', 'python-spam', 'spam')
+        assert pd.changelog_date_packager.endswith('>')
+        pd.changelog_date_packager = u'Sun Oct 18 2026 Spam <spam@eggs.com>'
+        assert pd.changelog_date_packager == (
+            u'Sun Oct 18 2026 Spam <spam@eggs.com>')
@@ -1,6 +1,9 @@
+import hashlib
 import json
 import os
 import tempfile
+import threading
+import time
 import shutil
 
 import pytest
@@ -8,8 +11,10 @@ import pytest
 from flexmock import flexmock
 
 from pyp2rpm.convertor import PyPIClient
-from pyp2rpm.package_getters import LocalFileGetter, PypiDownloader, get_url
+from pyp2rpm.package_getters import (LocalFileGetter, PypiDownloader, get_url,
+                                     get_digests, prefetch)
 from pyp2rpm.exceptions import MissingUrlException, NoSuchPackageException
+from pyp2rpm.source_store import SourceStore
 
 tests_dir = os.path.split(os.path.abspath(__file__))[0]
 
@@ -106,6 +111,138 @@ class TestPypiFileGetter(object):
         assert d.version == expected_ver
 
 
+class TestSourceStore(object):
+    content = b'spam'
+    digests = {'md5': hashlib.md5(content).hexdigest(),
+               'sha256': hashlib.sha256(content).hexdigest()}
+
+    def client(self, downloads=1):
+        client = flexmock(
+            package_releases=lambda n, hidden: ['1'],
+            release_data=lambda n, v: {'name': 'spam'},
+            release_urls=lambda n, v: [{'url': 'https://spam/spam-1.tar.gz',
+                                        'md5_digest': self.digests['md5'],
+                                        'digests': self.digests}])
+
+        def download(url, filename, digests):
+            with open(filename, 'wb') as f:
+                f.write(self.content)
+            return digests
+        client.should_receive('download').replace_with(download).times(
+            downloads)
+        return client
+
+    def test_pypi_downloader(self, tmpdir):
+        store = SourceStore(str(tmpdir.join('store')))
+        client = self.client()
+        for save_dir in ('SOURCES', 'eggs'):
+            d = PypiDownloader(client, 'spam', save_dir=str(
+                tmpdir.join(save_dir)), store=store)
+            assert d.get() == str(tmpdir.join(save_dir, 'spam-1.tar.gz'))
+            assert d.digests == self.digests
+            assert d.sha256 == self.digests['sha256']
+            assert tmpdir.join(save_dir, 'spam-1.tar.gz').read(
+                mode='rb') == self.content
+
+    def test_local_file_getter(self, tmpdir):
+        store = SourceStore(str(tmpdir.join('store')))
+        tmpdir.join('spam-1.tar.gz').write(self.content, mode='wb')
+        getter = LocalFileGetter(str(tmpdir.join('spam-1.tar.gz')),
+                                 str(tmpdir.join('SOURCES')), store)
+        assert getter.get() == str(tmpdir.join('SOURCES', 'spam-1.tar.gz'))
+        assert getter.sha256 == self.digests['sha256']
+        assert getter.digests == {}
+        # PyPI download of the same file is not needed then
+        result = prefetch(self.client(downloads=0), [('spam', '1')],
+                          save_dir=str(tmpdir.join('eggs')), store=store)
+        assert result[('spam', '1')][2] == str(tmpdir.join(
+            'eggs', 'spam-1.tar.gz'))
+        assert tmpdir.join('eggs', 'spam-1.tar.gz').read(
+            mode='rb') == self.content
+
+
+@pytest.mark.parametrize(('url', 'expected'), [
+    ('https://spam/spam-1.tar.gz', {'md5': 'a', 'sha256': 'b'}),
+    ('https://spam/spam-1.zip', {'md5': 'd'}),
+    ('https://spam/spam-2.tar.gz', {}),
+])
+def test_get_digests(url, expected):
+    client = flexmock(release_urls=lambda n, v: [
+        {'url': 'https://spam/spam-1.tar.gz', 'md5_digest': 'a',
+         'digests': {'md5': 'a', 'sha256': 'b', 'blake2b_256': 'c'}},
+        {'url': 'https://spam/spam-1.zip', 'md5_digest': 'd'},
+    ])
+    assert get_digests(client, 'spam', '1', url) == expected
+
+
+class TestPrefetch(object):
+
+    class SlowPyPIClient(PyPIClient):
+        """Counts requests running at the same time."""
+
+        def __init__(self):
+            super(TestPrefetch.SlowPyPIClient, self).__init__()
+            self.lock = threading.Lock()
+            self.running = self.max_running = 0
+
+        def get_json(self, name, version):
+            with self.lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            time.sleep(0.05)
+            with self.lock:
+                self.running -= 1
+            if name != 'spam':
+                return self.no_such_package
+            return {'info': {'name': 'spam'},
+                    'releases': ['1', '2', '3rc1'],
+                    'urls': [{'url': 'https://spam/spam-{0}.tar.gz'.format(
+                        version), 'md5_digest': 'spam'}]}
+
+        def download(self, url, filename, digests=None):
+            with open(filename, 'w') as f:
+                f.write(url)
+            return digests
+
+    def test_prefetch(self):
+        client = self.SlowPyPIClient()
+        packages = [('spam', None), ('spam', '1'), ('eggs', None)] * 4
+        assert prefetch(client, packages, workers=3) == {
+            ('spam', None): ('2', 'https://spam/spam-2.tar.gz', None),
+            ('spam', '1'): ('1', 'https://spam/spam-1.tar.gz', None)}
+        assert 1 < client.max_running <= 3
+
+    def test_prefetch_download(self, tmpdir):
+        save_dir = str(tmpdir.join('SOURCES'))
+        result = prefetch(self.SlowPyPIClient(), [('spam', '1')],
+                          save_dir=save_dir)
+        local_file = os.path.join(save_dir, 'spam-1.tar.gz')
+        assert result[('spam', '1')][2] == local_file
+        with open(local_file) as f:
+            assert f.read() == 'https://spam/spam-1.tar.gz'
+
+    def test_prefetch_download_once(self, tmpdir):
+        client = self.SlowPyPIClient()
+        downloads = []
+
+        def download(url, filename, digests=None):
+            with client.lock:
+                downloads.append(filename)
+            time.sleep(0.05)
+            with open(filename, 'w') as f:
+                f.write(url)
+            return digests
+
+        client.download = download
+        save_dir = str(tmpdir.join('SOURCES'))
+        result = prefetch(client, [('spam', None), ('spam', '2')] * 3,
+                          save_dir=save_dir, workers=4)
+        local_file = os.path.join(save_dir, 'spam-2.tar.gz')
+        assert result[('spam', None)][2] == result[('spam', '2')][2] == \
+            local_file
+        assert downloads == [local_file]
+
+
 class TestLocalFileGetter(object):
     td_dir = '{0}/test_data/'.format(tests_dir)
 
@@ -167,6 +304,11 @@ class TestLocalFileGetter(object):
         assert os.path.exists(self.l[0].get())
         os.unlink(in_tmp_dir)
 
+    def test_get_wheel_in_place(self):
+        assert self.l[3].get() == os.path.join(
+            self.td_dir, 'setuptools-19.6-py2.py3-none-any.whl')
+        assert not hasattr(self.l[3], 'temp_dir')
+
     def test_get_to_same_location(self):
         tmpdir = tempfile.gettempdir()
         self.l[1].save_dir = self.td_dir
@@ -0,0 +1,47 @@
+import json
+import os
+
+import pytest
+
+from pyp2rpm.pypi_json import parse_project_json
+
+tests_dir = os.path.split(os.path.abspath(__file__))[0]
+
+
+class TestParseProjectJson(object):
+
+    def test_django(self):
+        with open('{0}/test_data/django.json'.format(tests_dir)) as f:
+            text = f.read()
+        expected = json.loads(text)
+        data = parse_project_json(text)
+        assert sorted(data) == ['info', 'releases', 'urls']
+        assert data['info'] == expected['info']
+        assert data['urls'] == expected['urls']
+        assert data['releases'] == list(expected['releases'])
+
+    @pytest.mark.parametrize(('text', 'expected'), [
+        ('{}', {'info': {}, 'urls': [], 'releases': []}),
+        (' { "releases" : { } , "info" : { "name" : "spam" } } \n',
+         {'info': {'name': 'spam'}, 'urls': [], 'releases': []}),
+        ('{"releases": {"0.1": [{"url": "{[\\"]}"}], "0.2": []},'
+         ' "last_serial": 1, "urls": [{"url": "spam"}]}',
+         {'info': {}, 'urls': [{'url': 'spam'}],
+          'releases': ['0.1', '0.2']}),
+        ('{"releases": null, "info": {}}',
+         {'info': {}, 'urls': [], 'releases': []}),
+    ])
+    def test_parse(self, text, expected):
+        assert parse_project_json(text) == expected
+
+    @pytest.mark.parametrize('text', [
+        '',
+        '[]',
+        '{"info": {}',
+        '{"info": {}, "releases": {"0.1": [}}',
+        '{"info" {}}',
+        '{"info": {}} {}',
+    ])
+    def test_invalid(self, text):
+        with pytest.raises(ValueError):
+            parse_project_json(text)
@@ -0,0 +1,155 @@
+import os
+import shutil
+
+import pytest
+
+from pyp2rpm.repo_index import (NameIndex, ProvidesIndex, TrigramIndex,
+                                repository_names, repository_provides,
+                                trigrams)
+
+tests_dir = os.path.split(os.path.abspath(__file__))[0]
+
+NAMES = ['python3-spam', 'bash', 'python3-eggs', 'bash', u'python3-\u017eluva']
+
+
+class TestNameIndex(object):
+
+    @pytest.fixture
+    def index(self, tmpdir):
+        return NameIndex.build(str(tmpdir.join('names.idx')), NAMES,
+                               {'repo': '1'})
+
+    def test_build(self, index):
+        assert list(index) == sorted(set(NAMES))
+        assert len(index) == 4
+        assert index[3] == u'python3-\u017eluva'
+        assert index.revisions == {'repo': '1'}
+        assert NameIndex(index.path).revisions == {'repo': '1'}
+
+    @pytest.mark.parametrize(('name', 'expected'), [
+        ('bash', True),
+        ('python3-eggs', True),
+        (u'python3-\u017eluva', True),
+        ('python3-spa', False),
+        ('a', False),
+        ('zsh', False),
+    ])
+    def test_contains(self, index, name, expected):
+        assert (name in index) is expected
+
+    def test_empty(self, tmpdir):
+        index = NameIndex.build(str(tmpdir.join('names.idx')), [], {})
+        assert list(index) == []
+        assert 'bash' not in index
+
+    def test_invalid(self, tmpdir, index):
+        with open(index.path, 'rb') as f:
+            content = f.read()
+        tmpdir.join('truncated.idx').write(content[:-1], mode='wb')
+        tmpdir.join('spam.idx').write(b'spam\n', mode='wb')
+        for name in ('truncated.idx', 'spam.idx'):
+            with pytest.raises(ValueError):
+                NameIndex(str(tmpdir.join(name)))
+
+
+def test_repository_names(tmpdir):
+    repo_dir = str(tmpdir.join('repo'))
+    shutil.copytree('{0}/test_data/repo'.format(tests_dir), repo_dir)
+    index_dir = str(tmpdir.join('index'))
+    names = repository_names([repo_dir], index_dir)
+    assert 'python3-sphinx' in names
+    assert len(names) == 16
+    # the index is reused while the metadata are the same
+    path = names.path
+    os.utime(path, (0, 0))
+    assert repository_names([repo_dir], index_dir).path == path
+    assert os.stat(path).st_mtime == 0
+    # and rebuilt when they change
+    repomd = os.path.join(repo_dir, 'repodata', 'repomd.xml')
+    with open(repomd) as f:
+        content = f.read()
+    with open(repomd, 'w') as f:
+        f.write(content.replace('1618000000', '1618000001'))
+    names = repository_names([repo_dir], index_dir)
+    assert names.path == path
+    assert names.revisions == {repo_dir: '1618000001'}
+    assert os.stat(path).st_mtime != 0
+
+
+class TestTrigramIndex(object):
+
+    @pytest.fixture
+    def index(self):
+        return TrigramIndex(['python3-dateutil', 'python2-dateutil', 'bash',
+                             'python3-date', 'python3-eggs'],
+                            key=lambda name: name.split('-')[-1])
+
+    def test_trigrams(self):
+        assert trigrams('ab') == set([' ab', 'ab '])
+        assert trigrams('') == set()
+
+    def test_similar(self, index):
+        assert len(index) == 5
+        assert index.similar('dateutil2', threshold=0) == [
+            ('python2-dateutil', 0.7),
+            ('python3-dateutil', 0.7),
+            ('python3-date', 0.3)]
+
+    def test_similar_limit_threshold(self, index):
+        assert index.similar('dateutil2', limit=1) == [
+            ('python2-dateutil', 0.7)]
+        assert index.similar('dateutil2', threshold=0.5) == [
+            ('python2-dateutil', 0.7),
+            ('python3-dateutil', 0.7)]
+        assert index.similar('xyz') == []
+
+
+class TestProvidesIndex(object):
+
+    @pytest.fixture
+    def index(self, tmpdir):
+        return ProvidesIndex.build(str(tmpdir.join('provides.idx')), [
+            ('python3dist(spam)', 'python3-spam'),
+            ('python3dist(spam)', 'python3-spam'),
+            ('python3dist(spam)', 'python3-spam-compat'),
+            ('python3dist(eggs)', 'python3-eggs'),
+        ], {'repo': '1'})
+
+    def test_build(self, index):
+        assert len(index) == 2
+        assert index.revisions == {'repo': '1'}
+        assert ProvidesIndex(index.path).revisions == {'repo': '1'}
+
+    @pytest.mark.parametrize(('provide', 'expected'), [
+        ('python3dist(spam)', ['python3-spam', 'python3-spam-compat']),
+        ('python3dist(eggs)', ['python3-eggs']),
+        ('python2dist(spam)', []),
+    ])
+    def test_packages(self, index, provide, expected):
+        assert index.packages(provide) == expected
+        assert (provide in index) is bool(expected)
+
+    def test_provided(self, index):
+        provides = ['python3dist(spam)', 'python2dist(spam)',
+                    'python3dist(spam)'] + [
+            'python3dist(spam{0})'.format(i) for i in range(1000)]
+        assert index.provided(provides) == set(['python3dist(spam)'])
+        assert index.provided([]) == set()
+
+    def test_invalid(self, tmpdir):
+        tmpdir.join('spam.idx').write(b'spam' * 1000, mode='wb')
+        with pytest.raises(ValueError):
+            ProvidesIndex(str(tmpdir.join('spam.idx')))
+        with pytest.raises(IOError):
+            ProvidesIndex(str(tmpdir.join('eggs.idx')))
+
+
+def test_repository_provides(tmpdir):
+    repo_dir = '{0}/test_data/repo'.format(tests_dir)
+    provides = repository_provides([repo_dir], str(tmpdir))
+    assert provides.packages('python3dist(markupsafe)') == [
+        'python3-markupsafe']
+    assert 'python3.9dist(pyflakes)' in provides
+    assert 'python3-devel' not in provides
+    assert len(provides) == 24
+    assert repository_provides([repo_dir], str(tmpdir)).path == provides.path
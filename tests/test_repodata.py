@@ -0,0 +1,151 @@
+import bz2
+import os
+import shutil
+import sqlite3
+
+import pytest
+from flexmock import flexmock
+
+from pyp2rpm import repodata
+from pyp2rpm.repodata import (metadata_path, package_names, packages,
+                              python_provides, repomd_revision, xml_packages)
+
+tests_dir = os.path.split(os.path.abspath(__file__))[0]
+repo_dir = '{0}/test_data/repo'.format(tests_dir)
+
+
+def test_repomd_revision(tmpdir):
+    assert repomd_revision(repo_dir) == '1618000000'
+    assert repomd_revision(str(tmpdir)) is None
+
+
+@pytest.mark.parametrize('revision', ['<revision/>', '<revision> </revision>'])
+def test_repomd_revision_empty(tmpdir, revision):
+    shutil.copytree(os.path.join(repo_dir, 'repodata'),
+                    str(tmpdir.join('repodata')))
+    repomd = tmpdir.join('repodata', 'repomd.xml')
+    repomd.write(repomd.read().replace('<revision>1618000000</revision>',
+                                       revision))
+    assert repomd_revision(str(tmpdir)) == str(repomd.mtime())
+
+
+def test_metadata_path():
+    path = metadata_path(repo_dir, 'primary')
+    assert path.startswith(os.path.join(repo_dir, 'repodata', ''))
+    assert path.endswith('-primary.xml.gz')
+    assert metadata_path(repo_dir, 'filelists') is None
+
+
+def test_package_names(tmpdir):
+    names = list(package_names(repo_dir))
+    assert len(names) == 17
+    assert names[:3] == ['bash', 'babel', 'python3-babel']
+    assert names.count('python3-markupsafe') == 2
+    shutil.copytree(os.path.join(repo_dir, 'repodata'),
+                    str(tmpdir.join('repodata')))
+    os.remove(metadata_path(str(tmpdir), 'primary'))
+    with pytest.raises(IOError):
+        list(package_names(str(tmpdir)))
+    with pytest.raises(IOError):
+        list(package_names(str(tmpdir.join('spam'))))
+
+
+@pytest.fixture
+def sqlite_repo(tmpdir):
+    """Copy of the test repository with its packages listed in sqlite
+    database only.
+    """
+    shutil.copytree(os.path.join(repo_dir, 'repodata'),
+                    str(tmpdir.join('repodata')))
+    primary = metadata_path(str(tmpdir), 'primary')
+    connection = sqlite3.connect(str(tmpdir.join('primary.sqlite')))
+    connection.executescript("""
+        CREATE TABLE packages (pkgKey INTEGER PRIMARY KEY, name TEXT,
+                               arch TEXT);
+        CREATE TABLE provides (name TEXT, flags TEXT, epoch TEXT,
+                               version TEXT, release TEXT, pkgKey INTEGER);
+    """)
+    for key, (name, provides) in enumerate(xml_packages(primary)):
+        connection.execute('INSERT INTO packages VALUES (?, ?, ?)',
+                           (key, name, 'noarch'))
+        for provide in [name] + provides:
+            connection.execute(
+                'INSERT INTO provides VALUES (?, ?, ?, ?, ?, ?)',
+                (provide, 'EQ', '0', '1.0', '1', key))
+    connection.commit()
+    connection.close()
+    with open(str(tmpdir.join('primary.sqlite')), 'rb') as f:
+        tmpdir.join('repodata', 'primary.sqlite.bz2').write(
+            bz2.compress(f.read()), mode='wb')
+    repomd = tmpdir.join('repodata', 'repomd.xml')
+    repomd.write(repomd.read().replace('</repomd>', (
+        '  <data type="primary_db">\n'
+        '    <location href="repodata/primary.sqlite.bz2"/>\n'
+        '  </data>\n</repomd>')))
+    os.remove(primary)
+    return str(tmpdir)
+
+
+def test_python_provides():
+    provides = list(python_provides(repo_dir))
+    assert len(provides) == 26
+    assert provides[:2] == [('python3dist(babel)', 'python3-babel'),
+                            ('python3.9dist(babel)', 'python3-babel')]
+    assert ('python3dist(pyflakes)', 'pyflakes') in provides
+
+
+def test_packages_sqlite(sqlite_repo):
+    assert list(packages(sqlite_repo)) == list(packages(repo_dir))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64 * 1024])
+def test_xml_packages_chunks(chunk_size):
+    path = metadata_path(repo_dir, 'primary')
+    assert list(xml_packages(path, chunk_size)) == list(xml_packages(path))
+    assert list(xml_packages(path))[:3] == [
+        ('bash', []), ('babel', []),
+        ('python3-babel', ['python3dist(babel)', 'python3.9dist(babel)'])]
+
+
+@pytest.mark.parametrize(('content', 'expected'), [
+    (b'<metadata xmlns="http://linux.duke.edu/metadata/common"/>', []),
+    (b'<metadata xmlns="http://linux.duke.edu/metadata/common" '
+     b'xmlns:r="http://linux.duke.edu/metadata/rpm"><package>'
+     b'<name>python3-sp&amp;m</name><format><r:requires>'
+     b'<r:entry name="python3dist(eggs)"/></r:requires><r:provides>'
+     b'<r:entry name="python3dist(sp&amp;m)"/><r:entry name="spam"/>'
+     b'</r:provides></format></package><package><name>eggs</name>'
+     b'</package></metadata>',
+     [('python3-sp&m', ['python3dist(sp&m)']), ('eggs', [])]),
+])
+def test_xml_packages(tmpdir, content, expected):
+    tmpdir.join('primary.xml').write(content, mode='wb')
+    assert list(xml_packages(str(tmpdir.join('primary.xml')))) == expected
+
+
+def test_xml_packages_invalid(tmpdir):
+    tmpdir.join('primary.xml').write(b'<metadata><package>', mode='wb')
+    with pytest.raises(ValueError):
+        list(xml_packages(str(tmpdir.join('primary.xml'))))
+
+
+def test_python_provides_broken_sqlite(sqlite_repo):
+    with open(metadata_path(sqlite_repo, 'primary_db'), 'wb') as f:
+        f.write(bz2.compress(b'spam' * 1000))
+    with pytest.raises(IOError):
+        list(python_provides(sqlite_repo))
+
+
+def test_packages_sqlite_fails_midway():
+    def failing_packages(path):
+        yield 'bash', []
+        raise sqlite3.DatabaseError('database disk image is malformed')
+
+    flexmock(repodata).should_receive('metadata_path').with_args(
+        repo_dir, 'primary_db').and_return('primary.sqlite.bz2')
+    flexmock(repodata).should_call('metadata_path').with_args(
+        repo_dir, 'primary')
+    flexmock(repodata).should_receive('sqlite_packages').replace_with(
+        failing_packages)
+    assert list(packages(repo_dir)) == list(xml_packages(metadata_path(
+        repo_dir, 'primary')))
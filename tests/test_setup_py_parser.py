@@ -0,0 +1,136 @@
+import warnings
+
+import pytest
+
+from pyp2rpm.setup_py_parser import (SetupPyParser, requirements_list,
+                                     metadata_from_setup_kwargs)
+
+FILES = {
+    'README.rst': b'Spam\n====\r\nEggs\n',
+    'requirements.txt': b'six\n# comment\n\nrequests>=2.0  # http\n',
+    'spam/__init__.py': b'',
+    'spam/ham/__init__.py': b'',
+    'spam/data/file.txt': b'',
+    'tests/__init__.py': b'',
+    'src/eggs/__init__.py': b'',
+}
+
+
+def parser(source):
+    return SetupPyParser(source, FILES.get, list(FILES))
+
+
+class TestSetupPyParser(object):
+
+    @pytest.mark.parametrize(('source', 'expected'), [
+        ('from setuptools import setup\nsetup(name="spam", '
+         'install_requires=["six"], license="MIT")',
+         {'install_requires': ['six'], 'license': 'MIT'}),
+        ('import setuptools\nREQS = ["six"]\nsetuptools.setup('
+         'install_requires=REQS + ["ham"])',
+         {'install_requires': ['six', 'ham']}),
+        ('from distutils.core import setup\nkw = dict(license="MIT")\n'
+         'setup(**kw)', {'license': 'MIT'}),
+        ('from setuptools import setup\nsetup(long_description='
+         'open("README.rst").read())',
+         {'long_description': 'Spam\n====\nEggs\n'}),
+        ('import os\nfrom setuptools import setup\n'
+         'here = os.path.abspath(os.path.dirname(__file__))\n'
+         'with open(os.path.join(here, "README.rst")) as f:\n'
+         '    README = f.read()\nsetup(long_description=README)',
+         {'long_description': 'Spam\n====\nEggs\n'}),
+        ('from pathlib import Path\nfrom setuptools import setup\n'
+         'setup(long_description=(Path(__file__).parent / '
+         '"README.rst").read_text(encoding="utf-8"))',
+         {'long_description': 'Spam\n====\nEggs\n'}),
+        ('import io\nfrom setuptools import setup\n'
+         'def read(*names, **kwargs):\n    return None\n'
+         'def requirements(fname):\n    """Read requirements."""\n'
+         '    with io.open(fname, encoding="utf-8") as f:\n'
+         '        return f.read().splitlines()\n'
+         'setup(install_requires=requirements("requirements.txt"))',
+         {'install_requires': ['six', '# comment', '',
+                               'requests>=2.0  # http']}),
+        ('from setuptools import setup, find_packages\n'
+         'setup(packages=find_packages(exclude=["tests"]), url="x",\n'
+         '      cmdclass=get_cmdclass(), version=get_version())',
+         {'packages': ['spam', 'spam.ham'], 'url': 'x'}),
+        ('from setuptools import setup, find_packages\n'
+         'setup(packages=find_packages("src"))', {'packages': ['eggs']}),
+        ('from setuptools import setup\nif __name__ == "__main__":\n'
+         '    setup(scripts=["bin/spam"])', {'scripts': ['bin/spam']}),
+    ])
+    def test_setup_kwargs(self, source, expected):
+        p = parser(source)
+        assert p.setup_kwargs == expected
+        assert p.complete
+
+    @pytest.mark.parametrize(('source', 'unresolved'), [
+        ('from setuptools import setup\nreqs = ["six"]\n'
+         'if PY2:\n    reqs.append("ham")\nsetup(install_requires=reqs)',
+         ['install_requires']),
+        ('from setuptools import setup\nreqs = ["six"]\n'
+         'reqs += ["ham"]\nsetup(install_requires=reqs)',
+         ['install_requires']),
+        ('from setuptools import setup\ntry:\n    kw = {}\n'
+         'except ImportError:\n    kw = {"license": "MIT"}\nsetup(**kw)',
+         ['**kwargs']),
+        ('from setuptools import setup\ndef main():\n    setup()\nmain()',
+         ['setup() call']),
+        ('from setuptools import setup\n'
+         'setup(long_description=open("MISSING").read())',
+         ['long_description']),
+        ('from setuptools import setup\n'
+         'setup(install_requires=[l for l in open("requirements.txt")])',
+         ['install_requires']),
+        ('print "python 2 only"', ['setup.py syntax']),
+        ('from setuptools import setup\ndef get_license():\n    42\n'
+         '    return "MIT"\nsetup(license=get_license())', ['license']),
+    ])
+    def test_unresolved(self, source, unresolved):
+        p = parser(source)
+        p.setup_kwargs
+        assert p.unresolved == unresolved
+        assert not p.complete
+
+    def test_docstring_no_deprecation_warning(self):
+        p = parser('from setuptools import setup\ndef get_license():\n'
+                   '    """Returns license."""\n    return "MIT"\n'
+                   'setup(license=get_license())')
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            assert p.setup_kwargs == {'license': 'MIT'}
+
+
+@pytest.mark.parametrize(('requires', 'expected'), [
+    (None, []),
+    ('six\n\n# comment\nham  # inline comment', ['six', 'ham']),
+    (['six', ''], ['six']),
+])
+def test_requirements_list(requires, expected):
+    assert requirements_list(requires) == expected
+
+
+def test_metadata_from_setup_kwargs():
+    metadata = metadata_from_setup_kwargs({
+        'install_requires': ['six'],
+        'extras_require': {'doc': ['sphinx'], 'tls': ['pyopenssl']},
+        'packages': ('spam',),
+        'entry_points': '[console_scripts]\nspam = spam:main',
+        'test_suite': 'spam.tests',
+    })
+    assert metadata == {
+        'setup_requires': ['sphinx'],
+        'tests_require': [],
+        'install_requires': ['six', 'pyopenssl'],
+        'packages': ['spam'],
+        'py_modules': [],
+        'scripts': [],
+        'url': 'None',
+        'long_description': 'None',
+        'description': 'None',
+        'license': 'None',
+        'classifiers': [],
+        'entry_points': None,
+        'test_suite': True,
+    }
@@ -0,0 +1,91 @@
+import hashlib
+import os
+import time
+
+import pytest
+
+from pyp2rpm.source_store import SourceStore, place
+
+CONTENT = b'spam' * 1000
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+
+
+@pytest.fixture
+def store(tmpdir):
+    return SourceStore(str(tmpdir.join('store')), max_size=10 * len(CONTENT))
+
+
+@pytest.fixture
+def source(tmpdir):
+    source = tmpdir.join('spam-1.tar.gz')
+    source.write(CONTENT, mode='wb')
+    return str(source)
+
+
+def test_place(tmpdir, source):
+    target = str(tmpdir.mkdir('SOURCES').join('spam-1.tar.gz'))
+    place(source, target)
+    with open(target, 'rb') as f:
+        assert f.read() == CONTENT
+    # placing the file again to the same location keeps it
+    place(target, target)
+    assert os.listdir(os.path.dirname(target)) == ['spam-1.tar.gz']
+
+
+def test_place_replaces_target(tmpdir, source):
+    target = tmpdir.mkdir('SOURCES').join('spam-1.tar.gz')
+    target.write(b'eggs', mode='wb')
+    place(source, str(target))
+    assert target.read(mode='rb') == CONTENT
+
+
+class TestSourceStore(object):
+
+    def test_add_get_to(self, tmpdir, store, source):
+        target = str(tmpdir.mkdir('SOURCES').join('spam-1.tar.gz'))
+        assert not store.get_to(DIGEST, target)
+        store.add(source, DIGEST)
+        assert store.get_to(DIGEST, target)
+        with open(target, 'rb') as f:
+            assert f.read() == CONTENT
+
+    @pytest.mark.parametrize(('digest', 'filename'), [
+        (None, 'spam-1.tar.gz'),
+        (hashlib.sha256(b'eggs').hexdigest(), 'spam-1.tar.gz'),
+        (DIGEST, 'spam-1.zip'),
+    ])
+    def test_get_to_missing(self, tmpdir, store, source, digest, filename):
+        store.add(source, DIGEST)
+        target = str(tmpdir.mkdir('SOURCES').join(filename))
+        assert not store.get_to(digest, target)
+        assert not os.path.exists(target)
+
+    def test_damaged_entry(self, tmpdir, store, source):
+        store.add(source, DIGEST)
+        path = store.path(DIGEST, 'spam-1.tar.gz')
+        os.remove(path)
+        with open(path, 'wb') as f:
+            f.write(b'eggs')
+        assert not store.get_to(DIGEST, str(tmpdir.join('eggs-1.tar.gz')))
+        assert not store.get_to(DIGEST, str(tmpdir.join('spam-1.tar.gz')))
+        assert not os.path.exists(os.path.dirname(path))
+
+    def test_evict(self, tmpdir, store):
+        store.max_size = 100 * len(CONTENT)
+        digests = []
+        for i in range(12):
+            source = tmpdir.join('spam-{0}.tar.gz'.format(i))
+            source.write(CONTENT + str(i).encode(), mode='wb')
+            digests.append(hashlib.sha256(
+                CONTENT + str(i).encode()).hexdigest())
+            store.add(str(source), digests[i])
+            os.utime(os.path.dirname(store.path(digests[i], '')),
+                     (time.time() - 100 + i, time.time() - 100 + i))
+        # the first entry is used, the next ones are evicted
+        assert store.get_to(digests[0], str(tmpdir.join('spam-0.tar.gz')))
+        store.max_size = 10 * len(CONTENT)
+        store.evict()
+        remaining = [entry[2] for entry in store.entries()]
+        assert len(remaining) == 9
+        assert os.path.dirname(store.path(digests[0], '')) in remaining
+        assert os.path.dirname(store.path(digests[1], '')) not in remaining
@@ -0,0 +1,62 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from pyp2rpm.stages import StageGraph
+
+
+class TestStageGraph(object):
+
+    def test_results_of_requirements_are_passed(self):
+        graph = StageGraph()
+        graph.add('spam', lambda: 'spam')
+        graph.add('eggs', lambda: 'eggs')
+        graph.add('ham', lambda eggs, spam: eggs + spam,
+                  requires=['eggs', 'spam'])
+        assert graph.run() == {'spam': 'spam', 'eggs': 'eggs',
+                               'ham': 'eggsspam'}
+
+    def test_unknown_requirement(self):
+        graph = StageGraph()
+        with pytest.raises(ValueError):
+            graph.add('ham', lambda spam: spam, requires=['spam'])
+
+    def test_independent_stages_run_together(self):
+        barrier = threading.Event()
+        graph = StageGraph(workers=2)
+        # each of the stages waits for the other one
+        graph.add('spam', lambda: barrier.wait(5) or barrier.set())
+        graph.add('eggs', lambda: barrier.set() or barrier.wait(5))
+        start = time.time()
+        graph.run()
+        assert time.time() - start < 5
+
+    def test_single_worker_runs_in_sequence(self):
+        order = []
+        graph = StageGraph(workers=1)
+        for name in ['spam', 'eggs', 'ham']:
+            graph.add(name, lambda name=name: order.append(name))
+        graph.run()
+        assert order == ['spam', 'eggs', 'ham']
+
+    def test_failure(self):
+        started = []
+
+        def fail():
+            raise RuntimeError('spam')
+
+        graph = StageGraph()
+        graph.add('spam', fail)
+        graph.add('eggs', lambda spam: started.append('eggs'),
+                  requires=['spam'])
+        with pytest.raises(RuntimeError):
+            graph.run()
+        assert started == []
+
+    def test_system_exit_is_reraised(self):
+        graph = StageGraph()
+        graph.add('spam', lambda: sys.exit(1))
+        with pytest.raises(SystemExit):
+            graph.run()
@@ -1,3 +1,4 @@
+import glob
 import os
 import pytest
 import shutil
@@ -5,10 +6,10 @@ import sys
 import tempfile
 from flexmock import flexmock
 try:
+    import pyp2rpm.virtualenv as virtualenv
     from pyp2rpm.virtualenv import (DirsContent,
                                     VirtualEnv,
-                                    site_packages_filter,
-                                    scripts_filter)
+                                    VenvPool)
 except ImportError:
     VirtualEnv = None
 from pyp2rpm.name_convertor import NameConvertor
@@ -19,31 +20,6 @@ pytestmark = pytest.mark.skipif(VirtualEnv is None,
 
 tests_dir = os.path.split(os.path.abspath(__file__))[0]
 
-class TestUtils(object):
-
-    @pytest.mark.parametrize(('input', 'expected'), [
-        (['foo', 'foo-1.0.0.dist-info'], set(['foo'])),
-        (['foo', 'foo-1.0.0.dist-info', 'foo2'], set(['foo', 'foo2'])),
-        (['foo', 'foo-1.0.0.dist-info', 'foo2-1.0.0-py2.7.egg-info'],
-         set(['foo'])),
-        (['foo', 'foo2-1.0.0-py2.7.egg-info'],
-         set(['foo'])),
-        ([], set()),
-    ])
-    def test_site_packages_filter(self, input, expected):
-        assert site_packages_filter(input) == expected
-
-    @pytest.mark.parametrize(('input', 'expected'), [
-        (['script', 'script2'], ['script', 'script2']),
-        (['script.py', 'script2'], ['script.py', 'script2']),
-        (['script.pyc', 'script2'], ['script2']),
-        (['script.pyc'], []),
-        ([], []),
-    ])
-    def test_scripts_filter(self, input, expected):
-        assert scripts_filter(input) == expected
-
-
 class TestDirsContent(object):
 
     @pytest.mark.parametrize(('before', 'after', 'expected'), [
@@ -120,3 +96,97 @@ class TestVirtualEnv(object):
                  self.venv.data['py_modules'],
                  self.venv.data['scripts'],
                  self.venv.data['has_pth']) == expected)
+
+
+def fake_venv(path, python):
+    os.makedirs(path + '/bin')
+    os.makedirs(path + '/lib/python3.6/site-packages/pip')
+    os.symlink(sys.executable, path + '/bin/python')
+
+
+class TestVenvPool(object):
+
+    def setup_method(self, method):
+        self.temp_dir = tempfile.mkdtemp()
+        self.pool = VenvPool('python3', self.temp_dir + '/pool', size=1)
+        flexmock(virtualenv).should_receive('create_venv').replace_with(
+            fake_venv)
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.temp_dir)
+
+    def get(self, name):
+        snapshot = self.pool.get('{0}/{1}'.format(self.temp_dir, name))
+        if self.pool.refill_thread:
+            self.pool.refill_thread.join()
+        return snapshot
+
+    def test_get(self):
+        flexmock(virtualenv).should_receive('create_venv').replace_with(
+            fake_venv).once()
+        snapshot = self.get('first')
+        assert (snapshot.bindir, snapshot.lib_sitepackages) == (
+            set(['python']), set(['pip']))
+        assert os.path.exists(self.temp_dir + '/first/bin/python')
+        assert len(self.pool.ready_clones) == 1
+        # the ready clone is taken
+        flexmock(self.pool).should_receive('clone').never()
+        flexmock(self.pool).should_receive('refill').once()
+        self.get('second')
+        assert self.pool.ready_clones == []
+        assert os.path.exists(self.temp_dir + '/second/bin/python')
+
+    def test_refill(self):
+        self.get('first')
+        assert self.pool.refill_thread.daemon
+        # left by a refill interrupted by exit of other process
+        stale = self.pool.mkdtemp().replace(
+            '.work-{0}-'.format(os.getpid()), '.work-999999999-')
+        os.makedirs(stale + '/venv/bin')
+        running = self.pool.mkdtemp()
+        self.get('second')
+        assert not os.path.exists(stale)
+        assert os.path.exists(running)
+        assert len(self.pool.ready_clones) == 1
+        assert os.listdir(self.pool.ready_clones[0]) == os.listdir(
+            self.pool.golden)
+
+    def test_broken_golden_recreated(self):
+        self.get('first')
+        os.remove(self.pool.golden + '/bin/python')
+        os.symlink(self.temp_dir + '/missing', self.pool.golden +
+                   '/bin/python')
+        self.get('second')
+        assert self.pool.golden_usable
+        assert os.path.exists(self.temp_dir + '/second/bin/python')
+
+
+class TestVenvPoolInstall(object):
+
+    def setup_method(self, method):
+        self.temp_dir = tempfile.mkdtemp()
+        self.pool = VenvPool('python3', self.temp_dir + '/pool', size=1)
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.temp_dir)
+
+    def site_packages(self, path):
+        return os.listdir(glob.glob(
+            path + '/lib/python*.*/site-packages/')[0])
+
+    @pytest.mark.webtest
+    def test_install_to_clone(self):
+        os.makedirs(self.temp_dir + '/first')
+        os.makedirs(self.temp_dir + '/second')
+        VirtualEnv('spam', self.temp_dir + '/first',
+                   NameConvertor(DEFAULT_DISTRO), '3', self.pool)
+        self.pool.refill_thread.join()
+        # the ready clone is used as it is
+        flexmock(virtualenv).should_receive('create_venv').never()
+        venv = VirtualEnv('{0}/test_data/utest-0.1.0.tar.gz'.format(
+            tests_dir), self.temp_dir + '/second',
+            NameConvertor(DEFAULT_DISTRO), '3', self.pool)
+        assert venv.get_venv_data['packages'] == ['utest']
+        assert 'utest' in self.site_packages(self.temp_dir + '/second/venv')
+        for path in [self.pool.golden, self.temp_dir + '/first/venv']:
+            assert 'utest' not in self.site_packages(path)
@@ -0,0 +1,54 @@
+import os
+
+from flexmock import flexmock
+
+from pyp2rpm.archive import Archive
+from pyp2rpm.workspace import Workspace
+
+tests_dir = os.path.split(os.path.abspath(__file__))[0]
+td_dir = '{0}/test_data/'.format(tests_dir)
+
+
+class TestWorkspace(object):
+
+    def setup_method(self, method):
+        self.workspace = Workspace()
+
+    def teardown_method(self, method):
+        self.workspace.cleanup()
+
+    def test_archive_opened_once(self):
+        flexmock(Archive).should_call('open').once()
+        archive = self.workspace.archive('{0}utest-0.1.0.tar.gz'.format(
+            td_dir))
+        assert archive.handle
+        with archive:
+            pass
+        assert self.workspace.archive('{0}utest-0.1.0.tar.gz'.format(
+            td_dir)) is archive
+        assert archive.handle
+
+    def test_source_tree(self):
+        archive = self.workspace.archive('{0}utest-0.1.0.tar.gz'.format(
+            td_dir))
+        setup_py = [m.info for m in archive.index.files
+                    if m.basename == 'setup.py']
+        directory = self.workspace.source_tree(archive, setup_py)
+        assert os.listdir(os.path.join(directory, 'utest-0.1.0')) == [
+            'setup.py']
+        assert self.workspace.source_tree(archive) == directory
+        assert os.path.isdir(os.path.join(directory, 'utest-0.1.0', 'utest'))
+        # whole archive is extracted only once
+        flexmock(archive).should_receive('extract_all').never()
+        self.workspace.source_tree(archive)
+        self.workspace.source_tree(archive, setup_py)
+
+    def test_cleanup(self):
+        archive = self.workspace.archive('{0}utest-0.1.0.tar.gz'.format(
+            td_dir))
+        directory = self.workspace.source_tree(archive)
+        with self.workspace:
+            pass
+        assert archive.handle is None
+        assert not os.path.exists(directory)
+        assert self.workspace.archives == {}